@@ -0,0 +1,76 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+from benchmarks.inputs import PROFILES
+from benchmarks.runner import compare_reports, run_benchmarks, run_worker
+from benchmarks.startup import measure_startup
+
+
+def main():
+	parser = argparse.ArgumentParser(prog='python -m benchmarks', description='Offline benchmarks for the ffmpeg-mcp services.')
+	commands = parser.add_subparsers(dest='command', required=True)
+
+	run = commands.add_parser('run', help='Run the benchmark matrix and write a JSON report.')
+	run.add_argument('--output', '-o', default='benchmark_results.json')
+	run.add_argument('--profile', choices=sorted(PROFILES), default='quick')
+	run.add_argument('--repeat', type=int, default=3)
+	run.add_argument('--filter', dest='name_filter', help='Only run cases whose name contains this string, e.g. "make_gif/".')
+	run.add_argument(
+		'--work-dir', default=os.path.join(tempfile.gettempdir(), 'ffmpeg-mcp-bench'), help='Where generated inputs are cached.'
+	)
+	run.add_argument('--keep-outputs', action='store_true', help='Keep the files produced by the services.')
+
+	compare = commands.add_parser('compare', help='Flag regressions between two reports; exits 1 if there are any.')
+	compare.add_argument('baseline')
+	compare.add_argument('current')
+	compare.add_argument(
+		'--threshold', type=float, default=0.1, help='Relative slowdown that counts as a regression (default 0.1 = 10%%).'
+	)
+	compare.add_argument('--min-delta', type=float, default=0.05, help='Ignore slowdowns smaller than this many seconds.')
+
+	startup = commands.add_parser('startup', help='Measure the cold import time of the server; exits 1 if over budget.')
+	startup.add_argument('--repeat', type=int, default=5)
+	startup.add_argument('--budget', type=float, help='Maximum median import time in seconds.')
+	startup.add_argument('--output', '-o', help='Also write the measurement as JSON.')
+
+	worker = commands.add_parser('worker', help=argparse.SUPPRESS)
+	worker.add_argument('case')
+	worker.add_argument('--result-file', required=True)
+	worker.add_argument('--keep-outputs', action='store_true')
+
+	args = parser.parse_args()
+
+	if args.command == 'run':
+		run_benchmarks(args.output, args.profile, args.work_dir, args.repeat, args.name_filter, args.keep_outputs)
+
+	elif args.command == 'compare':
+		rows = compare_reports(args.baseline, args.current, args.threshold, args.min_delta)
+		regressions = [row for row in rows if row['regression']]
+		for row in rows:
+			wall = row.get('wall_seconds')
+			ratio = f'{wall["ratio"]}x' if wall and wall['ratio'] is not None else '-'
+			print(f'{"REGRESSION" if row["regression"] else "ok":<10} {ratio:>8}  {row["name"]}  {"; ".join(row["reasons"])}')
+		print(f'{len(regressions)} regression(s) in {len(rows)} compared case(s)')
+		sys.exit(1 if regressions else 0)
+
+	elif args.command == 'startup':
+		report = measure_startup(args.repeat)
+		print(json.dumps(report, indent=2))
+		if args.output:
+			with open(args.output, 'w', encoding='utf-8') as f:
+				json.dump(report, f, indent=2)
+		if args.budget is not None and report['import_seconds'] > args.budget:
+			print(f'Startup {report["import_seconds"]:.3f}s exceeds the {args.budget:.3f}s budget', file=sys.stderr)
+			sys.exit(1)
+
+	elif args.command == 'worker':
+		result = run_worker(json.loads(args.case), args.keep_outputs)
+		with open(args.result_file, 'w', encoding='utf-8') as f:
+			json.dump(result, f)
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,55 @@
+def build_cases(inputs: dict) -> list[dict]:
+	"""
+	Expand the parameter matrix: every service, with each of its parameter sets, on every input.
+
+	Multi-input services (normalization, concatenation, trim + concat) get the input three times,
+	so every case stays comparable across runs of the same profile.
+
+	Returns:
+	    list[dict]: Cases with a unique `name`, the `service` to call, the `input` name and its `kwargs`.
+	"""
+	cases = []
+	for input_name, path in inputs['videos'].items():
+		width, height = (int(value) for value in input_name.split('_')[0].split('x'))
+		clips = [path, path, path]
+		# Distinct ranges: ffmpeg-python merges identical input nodes, which would break the graph.
+		trims = [{'path': path, 'start_time': 0.5 * index, 'end_time': 0.5 * index + 2.0} for index in range(1, 4)]
+		matrix = [
+			('extract_frames', 'one_per_second', {'input_video_path': path}),
+			('extract_frames', '10_frames', {'input_video_path': path, 'number_of_frames': 10}),
+			('clip_video', 'copy', {'input_video_path': path, 'start_timestamp': 1.0, 'duration': 3.0}),
+			('clip_video', 'smart_cut', {'input_video_path': path, 'start_timestamp': 1.1, 'duration': 3.0, 'smart_cut': True}),
+			('clip_video_batch', '3_ranges', {'input_video_path': path, 'ranges': [(0.0, 1.0), (1.0, 1.5), (2.5, 1.0)]}),
+			('crop_video', 'half', {'input_video_path': path, 'width': width // 2, 'height': height // 2}),
+			('make_gif', 'default', {'input_video_path': path}),
+			('make_gif', 'diff_bayer', {'input_video_path': path, 'stats_mode': 'diff', 'dither': 'bayer'}),
+			('scale_video', '1080p', {'input_video_path': path, 'resolution': '1080p'}),
+			('scale_video', '1080p_chunked', {'input_video_path': path, 'resolution': '1080p', 'chunked': True}),
+			('extract_audio', 'default', {'input_video_path': path}),
+			('extract_audio', 'copy_all_tracks', {'input_video_path': path, 'mode': 'copy', 'tracks': 'all'}),
+			(
+				'overlay_image',
+				'bottom_right',
+				{'input_video_path': path, 'overlay_image_path': inputs['overlay_image'], 'positioning': 'bottom_right'},
+			),
+			(
+				'overlay_image',
+				'window_only_1s',
+				{
+					'input_video_path': path,
+					'overlay_image_path': inputs['overlay_image'],
+					'start_time': 1.0,
+					'duration': 1.0,
+					'window_only': True,
+				},
+			),
+			('overlay_image_batch', '3_videos', {'input_video_paths': clips, 'overlay_image_path': inputs['overlay_image']}),
+			('overlays_video', 'bottom_right', {'input_video_path': path, 'overlay_video_path': inputs['overlay_video']}),
+			('get_normalized_clips', '720p', {'input_video_clips': clips}),
+			('concat_clips_with_transition', 'fade_1s', {'input_video_clips': clips, 'transition_duration': 1}),
+			('trim_and_concat_operation', 'reencode', {'inputs': trims, 'allow_stream_copy': False}),
+			('trim_and_concat_operation', 'stream_copy', {'inputs': trims, 'allow_stream_copy': True}),
+		]
+		for service, variant, kwargs in matrix:
+			cases.append({'name': f'{service}/{variant}/{input_name}', 'service': service, 'input': input_name, 'kwargs': kwargs})
+	return cases
@@ -0,0 +1,63 @@
+import os
+
+import ffmpeg
+
+from utils.ffmpeg_runner import run_ffmpeg
+
+# Synthetic input matrices. Every input is testsrc2 video with a sine tone, so runs are
+# reproducible on any machine without shipping media files.
+PROFILES = {
+	'quick': {'resolutions': [(640, 360)], 'durations': [5], 'codecs': ['libx264']},
+	'full': {
+		'resolutions': [(640, 360), (1280, 720), (1920, 1080), (720, 1280)],
+		'durations': [5, 20],
+		'codecs': ['libx264', 'mpeg4'],
+	},
+}
+
+FRAME_RATE = 30
+
+
+def input_name(width: int, height: int, duration: int, codec: str) -> str:
+	return f'{width}x{height}_{duration}s_{codec}'
+
+
+def generate_video(output_path: str, width: int, height: int, duration: float, codec: str = 'libx264'):
+	"""Render a testsrc2 + sine test video, unless it already exists."""
+	if os.path.isfile(output_path):
+		return output_path
+	video = ffmpeg.input(f'testsrc2=size={width}x{height}:rate={FRAME_RATE}:duration={duration}', f='lavfi')
+	audio = ffmpeg.input(f'sine=frequency=440:sample_rate=48000:duration={duration}', f='lavfi')
+	temp_path = f'{output_path}.partial.mp4'
+	run_ffmpeg(
+		ffmpeg.output(video, audio, temp_path, vcodec=codec, pix_fmt='yuv420p', g=2 * FRAME_RATE, acodec='aac', shortest=None),
+		duration=duration,
+	)
+	os.replace(temp_path, output_path)
+	return output_path
+
+
+def generate_inputs(work_dir: str, profile: str) -> dict:
+	"""
+	Create (or reuse) the synthetic inputs of a profile in `work_dir`.
+
+	Returns:
+	    dict: `videos` (input name → path), `overlay_image` and `overlay_video` asset paths.
+	"""
+	os.makedirs(work_dir, exist_ok=True)
+	spec = PROFILES[profile]
+
+	videos = {}
+	for width, height in spec['resolutions']:
+		for duration in spec['durations']:
+			for codec in spec['codecs']:
+				name = input_name(width, height, duration, codec)
+				videos[name] = generate_video(os.path.join(work_dir, f'{name}.mp4'), width, height, duration, codec)
+
+	overlay_image = os.path.join(work_dir, 'overlay.png')
+	if not os.path.isfile(overlay_image):
+		run_ffmpeg(ffmpeg.input('testsrc2=size=200x200', f='lavfi').output(overlay_image, vframes=1))
+
+	overlay_video = generate_video(os.path.join(work_dir, 'overlay_320x180_3s.mp4'), 320, 180, 3)
+
+	return {'videos': videos, 'overlay_image': overlay_image, 'overlay_video': overlay_video}
@@ -0,0 +1,215 @@
+import datetime
+import json
+import os
+import platform
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.cases import build_cases
+from benchmarks.inputs import generate_inputs
+from utils.metrics import is_error_result, max_rss_kb
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Persistent caches would turn repeated runs into cache hits; every run starts cold.
+CACHE_ENV_VARS = ('FFMPEG_MCP_PROBE_CACHE_DIR', 'FFMPEG_MCP_RESULT_CACHE_DIR')
+
+# Where a worker writes its outputs and its on-disk state (palettes, overlay assets, scratch files).
+ARTIFACT_DIR_ENV_VAR = 'FFMPEG_MCP_ARTIFACT_DIR'
+
+
+def _result_artifacts(result, artifact_dir: str) -> list[str]:
+	"""
+	Collect the output files named by a tool result, whatever its shape: a path, a list, a dict with
+	an `output_path`, or any of those serialized as JSON (as batch tools return them).
+
+	Only files inside `artifact_dir` count, so an input path echoed back by a result is never removed.
+	"""
+	if isinstance(result, str):
+		if os.path.lexists(result):
+			inside = os.path.commonpath([os.path.realpath(result), os.path.realpath(artifact_dir)]) == os.path.realpath(artifact_dir)
+			return [result] if inside else []
+		try:
+			return _result_artifacts(json.loads(result), artifact_dir)
+		except ValueError:
+			return []
+	if isinstance(result, dict):
+		return [
+			path
+			for key, value in result.items()
+			if key == 'output_path' or isinstance(value, (dict, list))
+			for path in _result_artifacts(value, artifact_dir)
+		]
+	if isinstance(result, list):
+		return [path for item in result for path in _result_artifacts(item, artifact_dir)]
+	return []
+
+
+def run_worker(case: dict, keep_outputs: bool = False) -> dict:
+	"""
+	Run one case in the current (fresh) process and measure it.
+
+	Child CPU time and peak RSS come from `getrusage(RUSAGE_CHILDREN)`, i.e. every ffmpeg/ffprobe
+	process the service started and waited for; the worker's own peak RSS is reported separately.
+
+	The worker must be pointed at an empty artifact directory through `FFMPEG_MCP_ARTIFACT_DIR`, so
+	palettes and other on-disk caches start cold and the outputs it removes are its own.
+	"""
+	artifact_dir = os.environ.get(ARTIFACT_DIR_ENV_VAR)
+	if not artifact_dir:
+		raise RuntimeError(f'The benchmark worker needs {ARTIFACT_DIR_ENV_VAR} set to a scratch directory')
+
+	import ffmpeg_mcp.services as services
+
+	service = getattr(services, case['service'])
+	children_before = resource.getrusage(resource.RUSAGE_CHILDREN)
+	started = time.perf_counter()
+	try:
+		result = service(**case['kwargs'])
+		error = result if is_error_result(result) else None
+	except Exception as e:
+		result, error = None, f'{type(e).__name__}: {e}'
+	wall_seconds = time.perf_counter() - started
+	children_after = resource.getrusage(resource.RUSAGE_CHILDREN)
+
+	artifacts = _result_artifacts(result, artifact_dir)
+	output_bytes = sum(os.path.getsize(path) for path in artifacts if os.path.isfile(path))
+	if not keep_outputs:
+		for path in artifacts:
+			os.remove(path)
+
+	return {
+		'ok': error is None,
+		'error': error,
+		'wall_seconds': round(wall_seconds, 4),
+		'child_cpu_seconds': round(
+			(children_after.ru_utime - children_before.ru_utime) + (children_after.ru_stime - children_before.ru_stime), 4
+		),
+		'child_peak_rss_mb': round(max_rss_kb(children_after) / 1024, 1),
+		'worker_peak_rss_mb': round(max_rss_kb(resource.getrusage(resource.RUSAGE_SELF)) / 1024, 1),
+		'output_bytes': output_bytes,
+	}
+
+
+def _run_case_in_subprocess(case: dict, work_dir: str, keep_outputs: bool) -> dict:
+	"""
+	Run a case in a new interpreter so rusage, memory and in-process caches are isolated.
+
+	The worker gets a fresh artifact directory under `work_dir`, removed afterwards unless
+	`keep_outputs` (its path is then reported as `artifact_dir`).
+	"""
+	artifact_dir = tempfile.mkdtemp(prefix='artifacts-', dir=work_dir)
+	env = {key: value for key, value in os.environ.items() if key not in CACHE_ENV_VARS}
+	env[ARTIFACT_DIR_ENV_VAR] = artifact_dir
+	with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as f:
+		result_file = f.name
+	try:
+		command = [sys.executable, '-m', 'benchmarks', 'worker', json.dumps(case), '--result-file', result_file]
+		if keep_outputs:
+			command.append('--keep-outputs')
+		process = subprocess.run(command, cwd=REPO_ROOT, env=env, stdin=subprocess.DEVNULL, capture_output=True)
+		if process.returncode != 0:
+			result = {'ok': False, 'error': process.stderr.decode('utf-8', errors='replace')[-2000:]}
+		else:
+			with open(result_file, encoding='utf-8') as f:
+				result = json.load(f)
+	finally:
+		os.remove(result_file)
+		if not keep_outputs:
+			shutil.rmtree(artifact_dir, ignore_errors=True)
+	if keep_outputs:
+		result['artifact_dir'] = artifact_dir
+	return result
+
+
+def _ffmpeg_version() -> str:
+	try:
+		output = subprocess.run(['ffmpeg', '-version'], capture_output=True, text=True).stdout
+		return output.splitlines()[0] if output else 'unknown'
+	except OSError:
+		return 'unknown'
+
+
+def run_benchmarks(
+	output_path: str, profile: str, work_dir: str, repeat: int = 3, name_filter: str | None = None, keep_outputs: bool = False
+):
+	"""
+	Generate the profile's inputs, run every case `repeat` times and write the results as JSON.
+
+	Per case the median wall and child CPU time over the runs and the maximum peak RSS are
+	reported, next to the individual runs.
+	"""
+	print(f'Generating {profile} inputs in {work_dir}...', file=sys.stderr)
+	cases = build_cases(generate_inputs(work_dir, profile))
+	if name_filter:
+		cases = [case for case in cases if name_filter in case['name']]
+
+	results = []
+	for index, case in enumerate(cases, start=1):
+		runs = [_run_case_in_subprocess(case, work_dir, keep_outputs) for _ in range(repeat)]
+		succeeded = [run for run in runs if run['ok']]
+		summary = {'name': case['name'], 'service': case['service'], 'input': case['input'], 'ok': len(succeeded) == len(runs)}
+		if succeeded:
+			summary.update(
+				wall_seconds=round(statistics.median(run['wall_seconds'] for run in succeeded), 4),
+				child_cpu_seconds=round(statistics.median(run['child_cpu_seconds'] for run in succeeded), 4),
+				child_peak_rss_mb=max(run['child_peak_rss_mb'] for run in succeeded),
+				worker_peak_rss_mb=max(run['worker_peak_rss_mb'] for run in succeeded),
+			)
+		summary['runs'] = runs
+		results.append(summary)
+
+		status = f'{summary["wall_seconds"]:.3f}s wall, {summary["child_cpu_seconds"]:.3f}s cpu' if succeeded else 'FAILED'
+		print(f'[{index}/{len(cases)}] {case["name"]}: {status}', file=sys.stderr)
+
+	report = {
+		'created_at': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+		'profile': profile,
+		'repeat': repeat,
+		'host': {'platform': platform.platform(), 'python': platform.python_version(), 'cpu_count': os.cpu_count()},
+		'ffmpeg': _ffmpeg_version(),
+		'results': results,
+	}
+	with open(output_path, 'w', encoding='utf-8') as f:
+		json.dump(report, f, indent=2)
+	print(f'Wrote {len(results)} results to {output_path}', file=sys.stderr)
+	return report
+
+
+def compare_reports(baseline_path: str, current_path: str, threshold: float = 0.1, min_delta: float = 0.05) -> list[dict]:
+	"""
+	Compare two benchmark reports case by case.
+
+	A case regresses when its median wall or child CPU time grew by more than `threshold`
+	(relative) and `min_delta` seconds (absolute, to ignore noise on very fast cases), or when it
+	succeeded in the baseline but fails now.
+
+	Returns:
+	    list[dict]: One row per case present in both reports, with the ratios and a `regression` flag.
+	"""
+	with open(baseline_path, encoding='utf-8') as f:
+		baseline = {result['name']: result for result in json.load(f)['results']}
+	with open(current_path, encoding='utf-8') as f:
+		current = {result['name']: result for result in json.load(f)['results']}
+
+	rows = []
+	for name in sorted(baseline.keys() & current.keys()):
+		before, after = baseline[name], current[name]
+		row = {'name': name, 'regression': False, 'reasons': []}
+		if before['ok'] and not after['ok']:
+			row['regression'] = True
+			row['reasons'].append('now failing')
+		if before['ok'] and after['ok']:
+			for metric in ('wall_seconds', 'child_cpu_seconds'):
+				old, new = before[metric], after[metric]
+				row[metric] = {'baseline': old, 'current': new, 'ratio': round(new / old, 3) if old else None}
+				if new - old > min_delta and new > old * (1 + threshold):
+					row['regression'] = True
+					row['reasons'].append(f'{metric} {old:.3f} → {new:.3f}')
+		rows.append(row)
+	return rows
@@ -0,0 +1,63 @@
+import statistics
+import subprocess
+import sys
+
+from benchmarks.runner import REPO_ROOT
+
+# What an MCP client pays per session before the server can answer: interpreter start, every
+# import and the tool registrations in `ffmpeg_mcp.main`.
+STARTUP_MODULE = 'ffmpeg_mcp.main'
+
+
+def _parse_importtime(stderr: str) -> dict:
+	"""Map each module to its (self, cumulative) import time in seconds from `python -X importtime` output."""
+	modules = {}
+	for line in stderr.splitlines():
+		if not line.startswith('import time:') or 'self [us]' in line:
+			continue
+		self_us, cumulative_us, name = (part.strip() for part in line[len('import time:') :].split('|'))
+		modules[name] = (int(self_us) / 1e6, int(cumulative_us) / 1e6)
+	return modules
+
+
+def _measure_once() -> dict:
+	"""Import the server in a fresh interpreter and time it."""
+	process = subprocess.run(
+		[sys.executable, '-X', 'importtime', '-c', f'import {STARTUP_MODULE}'],
+		cwd=REPO_ROOT,
+		stdin=subprocess.DEVNULL,
+		capture_output=True,
+		text=True,
+	)
+	if process.returncode != 0:
+		raise RuntimeError(f'Importing {STARTUP_MODULE} failed:\n{process.stderr[-2000:]}')
+	modules = _parse_importtime(process.stderr)
+
+	by_package = {}
+	for name, (self_seconds, _) in modules.items():
+		package = name.split('.')[0]
+		by_package[package] = by_package.get(package, 0.0) + self_seconds
+
+	return {'import_seconds': modules[STARTUP_MODULE][1], 'by_package': by_package}
+
+
+def measure_startup(repeat: int = 5, top: int = 10) -> dict:
+	"""
+	Measure the cold import time of the server over `repeat` fresh interpreters.
+
+	Returns:
+	    dict: Median and maximum import time, and the median self time of the `top` most expensive
+	    top-level packages.
+	"""
+	runs = [_measure_once() for _ in range(repeat)]
+	packages = {package for run in runs for package in run['by_package']}
+	package_medians = {package: statistics.median(run['by_package'].get(package, 0.0) for run in runs) for package in packages}
+	heaviest = sorted(package_medians.items(), key=lambda item: item[1], reverse=True)[:top]
+
+	return {
+		'module': STARTUP_MODULE,
+		'repeat': repeat,
+		'import_seconds': round(statistics.median(run['import_seconds'] for run in runs), 4),
+		'import_seconds_max': round(max(run['import_seconds'] for run in runs), 4),
+		'heaviest_packages': {package: round(seconds, 4) for package, seconds in heaviest},
+	}
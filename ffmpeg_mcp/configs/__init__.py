@@ -1,3 +1,4 @@
+from ffmpeg_mcp.configs import settings
 from ffmpeg_mcp.configs.logging_config import setup_logging
 
-__all__ = ['setup_logging']
+__all__ = ['setup_logging', 'settings']
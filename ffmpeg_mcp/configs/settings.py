@@ -0,0 +1,73 @@
+import os
+
+# How the server is served: 'stdio' (one server process per client session, the default) or
+# 'http' (streamable HTTP: one deployment serving many clients, optionally with several workers).
+TRANSPORT = os.getenv('FFMPEG_MCP_TRANSPORT', 'stdio')
+HTTP_HOST = os.getenv('FFMPEG_MCP_HTTP_HOST', '127.0.0.1')
+HTTP_PORT = int(os.getenv('FFMPEG_MCP_HTTP_PORT', '8000'))
+HTTP_PATH = os.getenv('FFMPEG_MCP_HTTP_PATH', '/mcp')
+HTTP_WORKERS = int(os.getenv('FFMPEG_MCP_HTTP_WORKERS', '1'))
+
+# Root of every artifact the tools produce. Over HTTP, every worker writes here, so point it at
+# storage shared by all workers (and readable by the clients that consume the returned paths).
+PROCESSED_ELEMENTS_DIR = os.getenv('FFMPEG_MCP_ARTIFACT_DIR') or os.path.join(
+	os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'processed_elements'
+)
+
+# Over HTTP, probe results, memoized results and background jobs are persisted in the artifact
+# area by default, so every worker process sees them.
+_SHARED_STATE_DIR = os.path.join(PROCESSED_ELEMENTS_DIR, 'state') if TRANSPORT == 'http' else None
+
+# Probe cache: number of ffprobe results kept in memory, and an optional directory
+# where results are persisted as JSON sidecars so they survive server restarts.
+PROBE_CACHE_SIZE = int(os.getenv('FFMPEG_MCP_PROBE_CACHE_SIZE', '256'))
+PROBE_CACHE_DIR = os.getenv('FFMPEG_MCP_PROBE_CACHE_DIR') or (_SHARED_STATE_DIR and os.path.join(_SHARED_STATE_DIR, 'probes'))
+
+# Maximum number of tool calls executing ffmpeg work at the same time; further calls queue.
+MAX_CONCURRENT_TOOLS = int(os.getenv('FFMPEG_MCP_MAX_CONCURRENT_TOOLS', '4'))
+
+# Process-wide CPU budget shared by every ffmpeg process, and the threads each process asks for.
+# ffmpeg processes beyond the budget queue instead of oversubscribing the machine.
+# Each HTTP worker process has its own budget, so by default the machine's cores are split between them.
+CPU_BUDGET = int(os.getenv('FFMPEG_MCP_CPU_BUDGET') or max(1, (os.cpu_count() or 4) // (HTTP_WORKERS if TRANSPORT == 'http' else 1)))
+THREADS_PER_JOB = int(os.getenv('FFMPEG_MCP_THREADS_PER_JOB') or max(1, CPU_BUDGET // 2))
+
+# Chunked re-encodes (`chunked=True`): maximum number of keyframe-aligned chunks encoded in
+# parallel, and the shortest chunk worth a process of its own (in seconds).
+CHUNKED_ENCODE_SEGMENTS = int(os.getenv('FFMPEG_MCP_CHUNKED_ENCODE_SEGMENTS') or CPU_BUDGET)
+CHUNKED_ENCODE_MIN_SECONDS = float(os.getenv('FFMPEG_MCP_CHUNKED_ENCODE_MIN_SECONDS', '10'))
+
+# Videos watermarked at the same time by `overlay_image_batch`. Their ffmpeg processes still queue
+# on the CPU budget; the default keeps every worker's process running without waiting.
+OVERLAY_BATCH_WORKERS = int(os.getenv('FFMPEG_MCP_OVERLAY_BATCH_WORKERS') or max(1, CPU_BUDGET // THREADS_PER_JOB))
+
+# Encode profiles: measured libx264 speed of this host per preset and resolution, used to pick a
+# preset for an `encode_target`. One JSON file per hostname, so the directory can be shared.
+ENCODE_PROFILE_DIR = os.getenv('FFMPEG_MCP_ENCODE_PROFILE_DIR') or os.path.join(PROCESSED_ELEMENTS_DIR, 'state', 'encode_profiles')
+# Frames of the synthetic clip encoded for each preset/resolution measurement.
+ENCODE_CALIBRATION_FRAMES = int(os.getenv('FFMPEG_MCP_ENCODE_CALIBRATION_FRAMES', '60'))
+
+# Number of background jobs remembered for `get_job_status` / `get_job_result`.
+MAX_RETAINED_JOBS = int(os.getenv('FFMPEG_MCP_MAX_RETAINED_JOBS', '200'))
+# Optional directory where job states and results are persisted, so a job started by one worker
+# process can be queried through any other.
+JOB_STORE_DIR = os.getenv('FFMPEG_MCP_JOB_STORE_DIR') or (_SHARED_STATE_DIR and os.path.join(_SHARED_STATE_DIR, 'jobs'))
+
+# Parent directory of the per-call scratch workspaces. Point it at a tmpfs mount to keep
+# intermediates off disk; results are still moved atomically into PROCESSED_ELEMENTS_DIR.
+SCRATCH_DIR = os.getenv('FFMPEG_MCP_SCRATCH_DIR') or os.path.join(PROCESSED_ELEMENTS_DIR, 'scratch')
+
+# Result memoization: identical tool calls on an unchanged input return the existing artifact.
+RESULT_CACHE_SIZE = int(os.getenv('FFMPEG_MCP_RESULT_CACHE_SIZE', '1024'))
+RESULT_CACHE_DIR = os.getenv('FFMPEG_MCP_RESULT_CACHE_DIR') or (_SHARED_STATE_DIR and os.path.join(_SHARED_STATE_DIR, 'results'))
+
+# Palettes cached on disk by `make_gif`; beyond this many, the least recently used are deleted.
+PALETTE_CACHE_SIZE = int(os.getenv('FFMPEG_MCP_PALETTE_CACHE_SIZE', '256'))
+
+# Pre-rendered overlay images cached on disk by `overlay_image`; beyond this many, the least recently used are deleted.
+OVERLAY_ASSET_CACHE_SIZE = int(os.getenv('FFMPEG_MCP_OVERLAY_ASSET_CACHE_SIZE', '64'))
+
+# Limits of `extract_frames(output='inline')`: frames returned, and total JPEG bytes. Inline frames
+# travel inside the tool response, so larger extractions must be written to files instead.
+INLINE_FRAMES_MAX = int(os.getenv('FFMPEG_MCP_INLINE_FRAMES_MAX', '50'))
+INLINE_FRAMES_MAX_BYTES = int(os.getenv('FFMPEG_MCP_INLINE_FRAMES_MAX_BYTES') or 8 * 1024 * 1024)
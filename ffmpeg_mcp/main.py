@@ -1,50 +1,118 @@
 import logging
 import os
+import shutil
 
 from fastmcp import FastMCP
+from starlette.requests import Request
+from starlette.responses import JSONResponse
 
-from ffmpeg_mcp.configs import setup_logging
+from ffmpeg_mcp.configs import settings, setup_logging
 from ffmpeg_mcp.services import (
+	calibrate_encoder,
 	clip_video,
+	clip_video_batch,
 	concat_clips_with_transition,
 	crop_video,
 	extract_audio,
 	extract_frames,
+	get_job_result,
+	get_job_status,
 	get_normalized_clips,
+	get_scheduler_status,
+	get_server_metrics,
 	get_video_metadata,
+	list_jobs,
 	make_gif,
 	overlay_image,
+	overlay_image_batch,
 	overlays_video,
+	run_edit_pipeline,
 	scale_video,
 	trim_and_concat_operation,
 )
+from utils import async_tool
+from utils.cpu_scheduler import cpu_scheduler
+from utils.metrics import instrument_tool
 
 setup_logging()
 logger = logging.getLogger(__name__)
 
 mcp = FastMCP(name='ffmpeg-mcp', version='0.1.0')
 
-CURR_PATH = os.path.dirname(os.path.abspath(__file__))
-PROCESSED_ELEMENTS = os.path.join(CURR_PATH, 'processed_elements')
+mcp.tool(name_or_fn=async_tool(extract_frames))
+mcp.tool(name_or_fn=async_tool(extract_audio))
+mcp.tool(name_or_fn=async_tool(clip_video))
+mcp.tool(name_or_fn=async_tool(clip_video_batch, allow_background=True))
+mcp.tool(name_or_fn=async_tool(crop_video, allow_background=True))
+mcp.tool(name_or_fn=async_tool(make_gif))
+mcp.tool(name_or_fn=async_tool(concat_clips_with_transition, allow_background=True))
+mcp.tool(name_or_fn=async_tool(get_normalized_clips, allow_background=True))
+mcp.tool(name_or_fn=async_tool(overlay_image, allow_background=True))
+mcp.tool(name_or_fn=async_tool(overlay_image_batch, allow_background=True))
+mcp.tool(name_or_fn=async_tool(overlays_video, allow_background=True))
+mcp.tool(name_or_fn=async_tool(trim_and_concat_operation, allow_background=True))
+mcp.tool(name_or_fn=async_tool(scale_video, allow_background=True))
+mcp.tool(name_or_fn=async_tool(run_edit_pipeline, allow_background=True))
+mcp.tool(name_or_fn=async_tool(get_video_metadata))
+mcp.tool(name_or_fn=instrument_tool(get_job_status))
+mcp.tool(name_or_fn=instrument_tool(get_job_result))
+mcp.tool(name_or_fn=instrument_tool(list_jobs))
+mcp.tool(name_or_fn=instrument_tool(get_scheduler_status))
+mcp.tool(name_or_fn=instrument_tool(get_server_metrics))
+mcp.tool(name_or_fn=async_tool(calibrate_encoder, allow_background=True))
 
-mcp.tool(name_or_fn=extract_frames)
-mcp.tool(name_or_fn=extract_audio)
-mcp.tool(name_or_fn=clip_video)
-mcp.tool(name_or_fn=crop_video)
-mcp.tool(name_or_fn=make_gif)
-mcp.tool(name_or_fn=concat_clips_with_transition)
-mcp.tool(name_or_fn=get_normalized_clips)
-mcp.tool(name_or_fn=overlay_image)
-mcp.tool(name_or_fn=overlays_video)
-mcp.tool(name_or_fn=trim_and_concat_operation)
-mcp.tool(name_or_fn=scale_video)
-mcp.tool(name_or_fn=get_video_metadata)
+
+@mcp.custom_route('/healthz', methods=['GET'])
+async def healthz(request: Request) -> JSONResponse:
+	"""Liveness: the worker process is up and serving requests."""
+	return JSONResponse({'status': 'ok', 'pid': os.getpid()})
+
+
+@mcp.custom_route('/readyz', methods=['GET'])
+async def readyz(request: Request) -> JSONResponse:
+	"""Readiness: ffmpeg/ffprobe are available and the artifact area is writable; 503 otherwise."""
+	checks = {'ffmpeg': shutil.which('ffmpeg') is not None, 'ffprobe': shutil.which('ffprobe') is not None}
+	try:
+		os.makedirs(settings.PROCESSED_ELEMENTS_DIR, exist_ok=True)
+		checks['artifact_dir_writable'] = os.access(settings.PROCESSED_ELEMENTS_DIR, os.W_OK)
+	except OSError:
+		checks['artifact_dir_writable'] = False
+	ready = all(checks.values())
+	return JSONResponse(
+		{'status': 'ready' if ready else 'not_ready', 'pid': os.getpid(), 'checks': checks, 'scheduler': cpu_scheduler.stats()},
+		status_code=200 if ready else 503,
+	)
+
+
+def create_http_app():
+	"""
+	Build the ASGI app serving the tools over streamable HTTP; uvicorn calls it in every worker process.
+
+	Requests are stateless (no server-side MCP session), so a load balancer can send any request
+	to any worker or replica. State that must outlive a request, such as artifacts, caches and
+	background jobs, lives in the shared artifact area.
+	"""
+	return mcp.http_app(path=settings.HTTP_PATH, stateless_http=True)
 
 
 def main():
-	os.makedirs(PROCESSED_ELEMENTS, exist_ok=True)
-	logger.info('Server running...')
-	mcp.run(transport='stdio')
+	if settings.TRANSPORT == 'stdio':
+		logger.info('Server running...')
+		mcp.run(transport='stdio')
+	elif settings.TRANSPORT == 'http':
+		import uvicorn
+
+		logger.info(
+			f'Serving over streamable HTTP at http://{settings.HTTP_HOST}:{settings.HTTP_PORT}{settings.HTTP_PATH} '
+			f'with {settings.HTTP_WORKERS} worker(s), artifacts in {settings.PROCESSED_ELEMENTS_DIR}'
+		)
+		# Several workers need an import string, so each worker process builds its own app.
+		app = 'ffmpeg_mcp.main:create_http_app' if settings.HTTP_WORKERS > 1 else create_http_app()
+		uvicorn.run(
+			app, factory=settings.HTTP_WORKERS > 1, host=settings.HTTP_HOST, port=settings.HTTP_PORT, workers=settings.HTTP_WORKERS
+		)
+	else:
+		raise ValueError(f'Unknown FFMPEG_MCP_TRANSPORT {settings.TRANSPORT!r}; expected "stdio" or "http"')
 
 
 if __name__ == '__main__':
@@ -1,27 +1,40 @@
-from ffmpeg_mcp.services.clip_video import clip_video
+from ffmpeg_mcp.services.calibrate_encoder import calibrate_encoder
+from ffmpeg_mcp.services.clip_video import clip_video, clip_video_batch
 from ffmpeg_mcp.services.concat_clips_with_transition import concat_clips_with_transition
 from ffmpeg_mcp.services.crop_video import crop_video
+from ffmpeg_mcp.services.edit_pipeline import run_edit_pipeline
 from ffmpeg_mcp.services.extract_audio import extract_audio
 from ffmpeg_mcp.services.extract_frames import extract_frames
 from ffmpeg_mcp.services.get_video_metadata import get_video_metadata
+from ffmpeg_mcp.services.jobs import get_job_result, get_job_status, get_scheduler_status, list_jobs
 from ffmpeg_mcp.services.make_gif import make_gif
 from ffmpeg_mcp.services.normalize_video_clips import get_normalized_clips
-from ffmpeg_mcp.services.overlay_image import overlay_image
+from ffmpeg_mcp.services.overlay_image import overlay_image, overlay_image_batch
 from ffmpeg_mcp.services.overlays_video import overlays_video
 from ffmpeg_mcp.services.scale_video import scale_video
+from ffmpeg_mcp.services.server_metrics import get_server_metrics
 from ffmpeg_mcp.services.trim_and_concatenate_video import trim_and_concat_operation
 
 __all__ = [
 	'clip_video',
+	'clip_video_batch',
 	'crop_video',
 	'extract_audio',
 	'extract_frames',
 	'get_video_metadata',
 	'make_gif',
 	'overlay_image',
+	'overlay_image_batch',
 	'overlays_video',
 	'trim_and_concat_operation',
 	'concat_clips_with_transition',
 	'get_normalized_clips',
 	'scale_video',
+	'run_edit_pipeline',
+	'get_job_status',
+	'get_job_result',
+	'list_jobs',
+	'get_scheduler_status',
+	'get_server_metrics',
+	'calibrate_encoder',
 ]
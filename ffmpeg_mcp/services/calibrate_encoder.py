@@ -0,0 +1,33 @@
+import json
+import logging
+
+import ffmpeg
+
+from ffmpeg_mcp.configs import setup_logging
+from ffmpeg_mcp.exceptions import build_exception_message
+from utils.encode_profiles import calibrate, get_profile
+
+setup_logging()
+logger = logging.getLogger(__name__)
+
+
+def calibrate_encoder(force: bool = False) -> str:
+	"""
+	Show this host's encode profile: the measured libx264 speed (fps) of every preset per resolution.
+
+	Tools accepting an `encode_target` use it to pick the slowest preset that still meets the target.
+	They never benchmark the host themselves: until this tool has run once on a host, their
+	`encode_target` is ignored. The host is benchmarked on a synthetic clip while no other ffmpeg
+	process runs, and the stored profile is reused afterwards.
+
+	Params:
+	    force (bool): Benchmark the host again even if a stored profile exists. Defaults to False.
+
+	Returns:
+	    str: JSON with the host the profile was measured on and `fps[preset][resolution]`.
+	"""
+	try:
+		profile = None if force else get_profile()
+		return json.dumps(profile or calibrate(), indent=2)
+	except ffmpeg._run.Error as e:
+		return build_exception_message(error_type=ffmpeg._run.Error, message=f'Calibration failed: {e.stderr.decode("utf-8")}')
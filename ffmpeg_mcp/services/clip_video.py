@@ -1,41 +1,83 @@
-import json
+import contextvars
 import logging
 import os
+from concurrent.futures import ThreadPoolExecutor
 from uuid import uuid4
 
 import ffmpeg
 
-from ffmpeg_mcp.configs import setup_logging
+from ffmpeg_mcp.configs import settings, setup_logging
 from ffmpeg_mcp.exceptions import build_exception_message
-from ffmpeg_mcp.services import get_video_metadata
-from utils import validate_input_video_path
+from utils import get_video_stream, memoize_result, probe_media, stream_frame_rate, validate_input_video_path
+from utils.encode_profiles import check_encode_target, preset_options
+from utils.ffmpeg_runner import run_ffmpeg
+from utils.gop_splice import can_splice, plan_smart_cut, render_spliced
 
 setup_logging()
 logger = logging.getLogger(__name__)
 
 
-CURR_PATH = os.path.dirname(os.path.abspath(__file__))
-CLIPS_ROOT_DIR = os.path.join(CURR_PATH, '..', 'processed_elements', 'video_clips')
+CLIPS_ROOT_DIR = os.path.join(settings.PROCESSED_ELEMENTS_DIR, 'video_clips')
 
-os.makedirs(CLIPS_ROOT_DIR, exist_ok=True)
+# Clips stream-copied by one ffmpeg process in `clip_video_batch`; each clip opens its own demuxer on the source.
+# Re-encoded clips get a process each, so the CPU scheduler can budget their encoders.
+MAX_CLIPS_PER_RUN = 32
+
+
+def default_stream_specs(metadata: dict) -> list[str]:
+	"""
+	Stream specifiers of the streams ffmpeg picks for an output without `-map` (as `clip_video` writes):
+	the video stream with the largest frame and the audio stream with the most channels, preferring
+	streams marked as default and, on ties, the first one.
+	"""
+	specs = []
+	for codec_type, size in (
+		('video', lambda s: (s.get('width') or 0) * (s.get('height') or 0)),
+		('audio', lambda s: s.get('channels') or 0),
+	):
+		candidates = [
+			(index, stream)
+			for index, stream in enumerate(s for s in metadata.get('streams', []) if s.get('codec_type') == codec_type)
+			if not stream.get('disposition', {}).get('attached_pic')
+		]
+		if candidates:
+			index, _ = max(candidates, key=lambda item: (bool(item[1].get('disposition', {}).get('default')), size(item[1]), -item[0]))
+			specs.append(f'{codec_type[0]}:{index}')
+	return specs
+
+
+def reencoded_seconds(segments: list[tuple[float, float, bool]]) -> float:
+	"""Seconds of a smart cut plan (see `plan_smart_cut`) that are re-encoded rather than stream-copied."""
+	return sum(end - start for start, end, reencode in segments if reencode)
 
 
 @validate_input_video_path
-def clip_video(input_video_path: str, start_timestamp: float = 0.0, duration: float = 5.0):
+@memoize_result
+def clip_video(
+	input_video_path: str, start_timestamp: float = 0.0, duration: float = 5.0, smart_cut: bool = False, encode_target: str | None = None
+):
 	"""
 	Generate a video clip from the given video file using ffmpeg-python.
 
+	By default the clip is stream-copied, so it starts on the keyframe at or before `start_timestamp`.
+	With `smart_cut`, the cut is frame-accurate: only the partial GOPs at the head and tail are
+	re-encoded (with the source's codec, profile and pixel format) and the GOPs in between are still
+	stream-copied. Sources whose codec cannot be spliced are re-encoded in full instead.
+
 	Args:
 	    input_video_path (str): Path to the source video file.
 	    start_timestamp (float, optional): Start time in seconds. Defaults to 0.0.
 	    duration (float, optional): Clip length in seconds. Defaults to 5.0.
+	    smart_cut (bool, optional): Cut exactly at `start_timestamp`, re-encoding only partial GOPs. Defaults to False.
+	    encode_target (str | None, optional): Speed target used to pick the x264 preset of the re-encoded parts on this
+	        host: '<N>s' to finish within N seconds or 'realtime x<K>' to encode at K times playback speed. Defaults to
+	        None (preset 'medium'). Requires calibrate_encoder to have run on this host.
 
 	Returns:
 	    str: Path to the generated clip, or an exception message string on failure.
 	"""
 	logger.info('Starting video clipping...')
-	video_metadata = get_video_metadata(input_video_path)
-	metadata = json.loads(video_metadata)
+	metadata = probe_media(input_video_path)
 	streams = metadata.get('streams', [])
 
 	if not streams:
@@ -47,16 +89,37 @@ def clip_video(input_video_path: str, start_timestamp: float = 0.0, duration: fl
 	if start_timestamp + duration > total_duration:
 		return build_exception_message(error_type=ValueError, message='Clip duration exceeds total duration.')
 
+	try:
+		check_encode_target(encode_target)
+	except ValueError as e:
+		return build_exception_message(error_type=ValueError, message=str(e))
+	video_stream = get_video_stream(metadata) or {}
+	width, height, frame_rate = video_stream.get('width', 0), video_stream.get('height', 0), stream_frame_rate(video_stream)
+
 	clip_file_name = f'{os.path.splitext(os.path.basename(input_video_path))[0]}_clip_{uuid4()}.mp4'
 	clip_file_path = os.path.join(CLIPS_ROOT_DIR, clip_file_name)
+	os.makedirs(CLIPS_ROOT_DIR, exist_ok=True)
 
 	try:
-		(
-			ffmpeg.input(input_video_path, ss=start_timestamp, t=duration)
-			.output(clip_file_path, c='copy')
-			.overwrite_output()
-			.run(quiet=True)
-		)
+		if not smart_cut:
+			run_ffmpeg(ffmpeg.input(input_video_path, ss=start_timestamp, t=duration).output(clip_file_path, c='copy'), duration=duration)
+		elif can_splice(metadata):
+			segments = plan_smart_cut(input_video_path, start_timestamp, start_timestamp + duration)
+			presets = preset_options(encode_target, width, height, reencoded_seconds(segments), frame_rate)
+			render_spliced(input_video_path, metadata, segments, clip_file_path, encoder_overrides=presets)
+		else:
+			logger.info('Codec cannot be spliced; re-encoding the whole clip')
+			run_ffmpeg(
+				ffmpeg.input(input_video_path, ss=start_timestamp, t=duration).output(
+					clip_file_path,
+					vcodec='libx264',
+					acodec='aac',
+					crf=18,
+					**preset_options(encode_target, width, height, duration, frame_rate, default='medium'),
+					movflags='+faststart',
+				),
+				duration=duration,
+			)
 		logger.info('Finished video clipping...')
 		return clip_file_path
 
@@ -66,6 +129,114 @@ def clip_video(input_video_path: str, start_timestamp: float = 0.0, duration: fl
 		return build_exception_message(error_type=Exception, message=f'Unexpected error: {str(e)}')
 
 
+@validate_input_video_path
+@memoize_result
+def clip_video_batch(
+	input_video_path: str, ranges: list[tuple[float, float]], smart_cut: bool = False, encode_target: str | None = None
+) -> str | list[str]:
+	"""
+	Cut many clips from one video, e.g. highlights from a long recording, in a single ffmpeg run.
+
+	The source is probed and validated once, and all stream-copied clips are written by one ffmpeg
+	process (one seeking demuxer and one output per clip, up to 32 clips per process), so the
+	per-clip cost is close to zero. Each clip is exactly what `clip_video` would produce for the same
+	range, with the same streams: stream-copied from the keyframe at or before its start, or
+	frame-accurate with `smart_cut`. Clips that must be re-encoded in full get a process each,
+	scheduled on the shared CPU budget.
+
+	Args:
+	    input_video_path (str): Path to the source video file.
+	    ranges (list[tuple[float, float]]): (start_timestamp, duration) of each clip, in seconds.
+	    smart_cut (bool, optional): Cut exactly at each start, re-encoding only partial GOPs. Defaults to False.
+	    encode_target (str | None, optional): Speed target used to pick the x264 preset of each clip's re-encoded parts
+	        on this host, applied to each clip separately: '<N>s' to finish within N seconds or 'realtime x<K>' to encode
+	        at K times playback speed. Defaults to None (preset 'medium'). Requires calibrate_encoder to have run on this host.
+
+	Returns:
+	    str | list[str]: Paths of the clips in the order of `ranges`, or an exception message string on failure.
+	"""
+	if not ranges:
+		return build_exception_message(error_type=ValueError, message='Provide at least one (start_timestamp, duration) range')
+
+	metadata = probe_media(input_video_path)
+	streams = metadata.get('streams', [])
+	if not streams:
+		return build_exception_message(error_type=ValueError, message='No video streams found in the file.')
+	total_duration = float(streams[0].get('duration') or metadata['format']['duration'])
+
+	try:
+		ranges = [(float(start), float(duration)) for start, duration in ranges]
+	except (TypeError, ValueError):
+		return build_exception_message(error_type=ValueError, message='Each range must be a (start_timestamp, duration) pair')
+	for index, (start, duration) in enumerate(ranges, start=1):
+		if start < 0 or duration <= 0:
+			return build_exception_message(error_type=ValueError, message=f'Range {index}: start must be >= 0 and duration > 0')
+		if start + duration > total_duration:
+			return build_exception_message(error_type=ValueError, message=f'Range {index}: Clip duration exceeds total duration.')
+
+	try:
+		check_encode_target(encode_target)
+	except ValueError as e:
+		return build_exception_message(error_type=ValueError, message=str(e))
+	video_stream = get_video_stream(metadata) or {}
+	width, height, frame_rate = video_stream.get('width', 0), video_stream.get('height', 0), stream_frame_rate(video_stream)
+
+	base_name = os.path.splitext(os.path.basename(input_video_path))[0]
+	clip_paths = [os.path.join(CLIPS_ROOT_DIR, f'{base_name}_clip_{uuid4()}.mp4') for _ in ranges]
+	os.makedirs(CLIPS_ROOT_DIR, exist_ok=True)
+	logger.info(f'Cutting {len(ranges)} clips from {input_video_path}...')
+
+	try:
+		if smart_cut and can_splice(metadata):
+			# Splicing needs a few processes per clip; the probe and keyframe index are still shared.
+			for (start, duration), clip_path in zip(ranges, clip_paths):
+				segments = plan_smart_cut(input_video_path, start, start + duration)
+				presets = preset_options(encode_target, width, height, reencoded_seconds(segments), frame_rate)
+				render_spliced(input_video_path, metadata, segments, clip_path, encoder_overrides=presets)
+		elif smart_cut:
+			logger.info('Codec cannot be spliced; re-encoding the whole clips')
+
+			def reencode(start, duration, clip_path):
+				run_ffmpeg(
+					ffmpeg.input(input_video_path, ss=start, t=duration).output(
+						clip_path,
+						vcodec='libx264',
+						acodec='aac',
+						crf=18,
+						**preset_options(encode_target, width, height, duration, frame_rate, default='medium'),
+						movflags='+faststart',
+					),
+					duration=duration,
+				)
+
+			# Each task runs in a copy of the caller's context, so progress and metrics stay attributed to the tool call.
+			with ThreadPoolExecutor(max_workers=min(len(ranges), settings.CPU_BUDGET)) as executor:
+				futures = [
+					executor.submit(contextvars.copy_context().run, reencode, start, duration, clip_path)
+					for (start, duration), clip_path in zip(ranges, clip_paths)
+				]
+				for future in futures:
+					future.result()
+		else:
+			stream_specs = default_stream_specs(metadata)
+			jobs = list(zip(ranges, clip_paths))
+			for offset in range(0, len(jobs), MAX_CLIPS_PER_RUN):
+				chunk = jobs[offset : offset + MAX_CLIPS_PER_RUN]
+				outputs = []
+				for (start, duration), clip_path in chunk:
+					source = ffmpeg.input(input_video_path, ss=start, t=duration)
+					outputs.append(ffmpeg.output(*(source[spec] for spec in stream_specs), clip_path, c='copy'))
+				run_ffmpeg(ffmpeg.merge_outputs(*outputs), duration=max(duration for (_, duration), _ in chunk))
+
+		logger.info(f'Finished cutting {len(clip_paths)} clips')
+		return clip_paths
+
+	except ffmpeg._run.Error as e:
+		return build_exception_message(error_type=ffmpeg._run.Error, message=f'FFmpeg command failed: {e.stderr.decode("utf-8")}')
+	except Exception as e:
+		return build_exception_message(error_type=Exception, message=f'Unexpected error: {str(e)}')
+
+
 # if __name__ == '__main__':
 # 	path = '/Users/student/Downloads/IMG_4766.MOV'
 # 	paths = clip_video(input_video_path=path, start_timestamp=0.0, duration=2.0)
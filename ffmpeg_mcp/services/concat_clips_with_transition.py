@@ -1,32 +1,27 @@
-import json
 import logging
 import os
-import shutil
 from typing import List
+from uuid import uuid4
 
 import ffmpeg
 
-from ffmpeg_mcp.configs import setup_logging
+from ffmpeg_mcp.configs import settings, setup_logging
 from ffmpeg_mcp.exceptions import build_exception_message
-from ffmpeg_mcp.services import get_video_metadata
-from ffmpeg_mcp.services.normalize_video_clips import get_normalized_clips
-from utils import calculate_video_offset
+from ffmpeg_mcp.services.normalize_video_clips import normalize_clips_to_dir
+from utils import probe_media, scratch_workspace
+from utils.encode_profiles import check_encode_target, preset_options
+from utils.ffmpeg_runner import run_ffmpeg
 
-base_dir = os.path.dirname(os.path.abspath(__file__))
-video_clip_path = os.path.join(base_dir, '..', 'processed_elements', 'normalized_video_clips')
-
-final_output_path = os.path.abspath(
-	os.path.join(base_dir, '..', 'processed_elements', 'concatenated_video', 'output_concatenated_video.mp4')
-)
-
-os.makedirs(os.path.dirname(final_output_path), exist_ok=True)
+concatenated_video_path = os.path.join(settings.PROCESSED_ELEMENTS_DIR, 'concatenated_video')
 
 
 setup_logging()
 logger = logging.getLogger(__name__)
 
 
-def concat_clips_with_transition(input_video_clips: List[str], transition_type: str = 'fade', transition_duration: float = 2) -> str:
+def concat_clips_with_transition(
+	input_video_clips: List[str], transition_type: str = 'fade', transition_duration: float = 2, encode_target: str | None = None
+) -> str:
 	"""
 	Concatenate multiple video clips with transitions.
 
@@ -51,65 +46,72 @@ def concat_clips_with_transition(input_video_clips: List[str], transition_type:
 	        - coverleft, coverright, coverup, coverdown
 	    transition_duration (float, optional):
 	        Duration of the transition effect in seconds.
+	    encode_target (str | None, optional):
+	        Speed target used to pick the x264 preset on this host: '<N>s' to finish within N seconds or
+	        'realtime x<K>' to encode at K times playback speed. It applies to each clip normalization and
+	        to the final encode separately. Requires calibrate_encoder to have run on this host.
 
 	Returns:
 	    str:
 	        The absolute path to the final concatenated video with transitions applied.
 	"""
 
-	output_video_path = os.path.join(base_dir, '..', 'processed_elements', 'Intermediate_files', 'final_edited_video.mp4')
-	os.makedirs(output_video_path, exist_ok=True)
-
 	if len(input_video_clips) < 2:
 		return build_exception_message(error_type=ValueError, message='Please provide at least two clips')
-
-	get_normalized_clips(input_video_clips=input_video_clips)
-
-	video_list = sorted([os.path.join(video_clip_path, f) for f in os.listdir(video_clip_path) if f.endswith('.mp4')])
-	for i in range(1, len(video_list)):
-		clip_1 = video_list[0] if i == 1 else output_video_path
-		clip_2 = video_list[i]
-
-		metadata = get_video_metadata(input_video_path=clip_1)
-		clip_1_duration = json.loads(metadata)['format']['duration']
-		metadata = get_video_metadata(input_video_path=clip_2)
-		clip_2_duration = json.loads(metadata)['format']['duration']
-
-		logger.info(f'clip_1 ({i - 1}) duration: {clip_1_duration}s, clip_2 ({i}) duration: {clip_2_duration}s')
-
-		input1 = ffmpeg.input(clip_1)
-		input2 = ffmpeg.input(clip_2)
-
-		video1 = input1.video
-		video2 = input2.video
-		audio1 = input1.audio
-		audio2 = input2.audio
-
-		offset_duration = calculate_video_offset(input_video_path=clip_1, transition_duration=transition_duration)
-		logger.info(f'offeset duration for clips is {offset_duration}')
+	try:
+		check_encode_target(encode_target)
+	except ValueError as e:
+		return build_exception_message(error_type=ValueError, message=str(e))
+
+	final_output_path = os.path.join(concatenated_video_path, f'output_concatenated_video_{uuid4()}.mp4')
+
+	# Normalized clips and the encode live in a private workspace, so concurrent calls never collide
+	# and everything but the published result is removed when the block exits.
+	with scratch_workspace('concat') as workspace:
+		video_list = [
+			report['output_path'] for report in normalize_clips_to_dir(input_video_clips, workspace.root, encode_target=encode_target)
+		]
+		if len(video_list) < 2:
+			return build_exception_message(error_type=RuntimeError, message='Fewer than two clips could be normalized')
+
+		# Each xfade starts `transition_duration` before the end of everything joined so far,
+		# so the offsets are the running sum of (clip duration - transition duration).
+		offsets = []
+		running_offset = 0.0
+		for clip in video_list[:-1]:
+			clip_duration = float(probe_media(clip)['format']['duration'])
+			if clip_duration <= transition_duration:
+				return build_exception_message(
+					error_type=ValueError, message=f'Clip {clip} ({clip_duration}s) is shorter than the transition duration'
+				)
+			running_offset += clip_duration - transition_duration
+			offsets.append(running_offset)
+		total_duration = running_offset + float(probe_media(video_list[-1])['format']['duration'])
+		logger.info(f'xfade offsets for {len(video_list)} clips: {offsets}')
+
+		# Chain every transition into a single filtergraph so each clip is decoded and encoded exactly once.
+		# Clips that were already conforming keep their own time base; xfade needs them to match.
+		inputs = [ffmpeg.input(clip) for clip in video_list]
+		videos = [clip_input.video.filter('settb', 'AVTB') for clip_input in inputs]
+		video = videos[0]
+		audio = inputs[0].audio
+		for clip_input, clip_video, offset in zip(inputs[1:], videos[1:], offsets):
+			video = ffmpeg.filter([video, clip_video], 'xfade', transition=transition_type, duration=transition_duration, offset=offset)
+			audio = ffmpeg.filter([audio, clip_input.audio], 'acrossfade', duration=transition_duration)
+
+		output_video_path = workspace.path('final_edited_video.mp4')
 		try:
-			v = ffmpeg.filter([video1, video2], 'xfade', transition=transition_type, duration=transition_duration, offset=offset_duration)
-			a = ffmpeg.filter([audio1, audio2], 'acrossfade', duration=transition_duration)
-			temp_output = output_video_path.replace('.mp4', f'_step_{i}.mp4')
-			(ffmpeg.output(v, a, temp_output, safe=0).run(overwrite_output=True, quiet=True))
-			output_video_path = temp_output
+			# Clips are normalized to the default 1280x720 at 30 fps.
+			presets = preset_options(encode_target, 1280, 720, total_duration, 30)
+			run_ffmpeg(ffmpeg.output(video, audio, output_video_path, **presets), duration=total_duration)
 		except ffmpeg._run.Error as e:
-			build_exception_message(error_type=ffmpeg._run.Error, message=f'Error occured while concatenating video: {str(e)}')
+			return build_exception_message(
+				error_type=ffmpeg._run.Error, message=f'Error occured while concatenating video: {e.stderr.decode("utf-8")}'
+			)
 
-	if os.path.exists(output_video_path):
-		os.rename(output_video_path, final_output_path)
-		logger.info(f'Final concatenated video saved to: {final_output_path}')
-
-		# Clean up: remove normalized clips and intermediate files
-		if os.path.exists(video_clip_path):
-			shutil.rmtree(video_clip_path)
-			logger.info(f'Deleted normalized clips folder: {video_clip_path}')
-
-		intermediate_dir = os.path.join(base_dir, '..', 'processed_elements', 'Intermediate_files')
-		if os.path.exists(intermediate_dir):
-			shutil.rmtree(intermediate_dir)
-			logger.info(f'Deleted intermediate files folder: {intermediate_dir}')
+		if not os.path.exists(output_video_path):
+			return build_exception_message(error_type=RuntimeError, message=f'Output video not found {output_video_path}')
 
+		workspace.publish(output_video_path, final_output_path)
+		logger.info(f'Final concatenated video saved to: {final_output_path}')
 		return final_output_path
-	else:
-		return build_exception_message(error_type=RuntimeError, message=f'Output video not found {output_video_path}')
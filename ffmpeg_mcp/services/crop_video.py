@@ -1,22 +1,30 @@
-import json
 import logging
 import os
 from uuid import uuid4
 
 import ffmpeg
 
+from ffmpeg_mcp.configs import settings
 from ffmpeg_mcp.exceptions import build_exception_message
-from ffmpeg_mcp.services import get_video_metadata
+from utils import memoize_result, probe_media, stream_frame_rate
+from utils.encode_profiles import check_encode_target, preset_options
+from utils.ffmpeg_runner import run_ffmpeg
 
 logger = logging.getLogger(__name__)
 
-CURR_PATH = os.path.dirname(os.path.abspath(__file__))
-CROPPED_VIDEO_DIR = os.path.join(CURR_PATH, '..', 'processed_elements', 'cropped_videos')
+CROPPED_VIDEO_DIR = os.path.join(settings.PROCESSED_ELEMENTS_DIR, 'cropped_videos')
 
-os.makedirs(CROPPED_VIDEO_DIR, exist_ok=True)
 
-
-def crop_video(input_video_path: str, safe_crop: bool = False, height: int = 480, width: int = 640, x_offset: int = 0, y_offset: int = 0):
+@memoize_result
+def crop_video(
+	input_video_path: str,
+	safe_crop: bool = False,
+	height: int = 480,
+	width: int = 640,
+	x_offset: int = 0,
+	y_offset: int = 0,
+	encode_target: str | None = None,
+):
 	"""
 	Crop a video using ffmpeg-python.
 
@@ -27,18 +35,27 @@ def crop_video(input_video_path: str, safe_crop: bool = False, height: int = 480
 	    width: Output width (default: 640)
 	    x_offset: Top-left X coordinate of crop (default: 0)
 	    y_offset: Top-left Y coordinate of crop (default: 0)
+	    encode_target: Speed target used to pick the x264 preset on this host: '<N>s' to finish within
+	        N seconds or 'realtime x<K>' to encode at K times playback speed (default: None, encoder default).
+	        Requires calibrate_encoder to have run on this host.
 
 	Returns:
 	    str: Path to the cropped video.
 	"""
+	try:
+		check_encode_target(encode_target)
+	except ValueError as e:
+		return build_exception_message(error_type=ValueError, message=str(e))
+
 	logger.info('Starting video cropping...')
 	try:
 		cropped_video_file_name = f'{os.path.splitext(os.path.basename(input_video_path))[0]}_cropped_{uuid4()}.mp4'
 		cropped_video_path = os.path.join(CROPPED_VIDEO_DIR, cropped_video_file_name)
+		os.makedirs(CROPPED_VIDEO_DIR, exist_ok=True)
 
 		# Extract metadata
-		video_metadata = get_video_metadata(input_video_path)
-		metadata_streams = json.loads(video_metadata).get('streams', [])
+		metadata = probe_media(input_video_path)
+		metadata_streams = metadata.get('streams', [])
 		if not metadata_streams:
 			return build_exception_message(error_type=ValueError, message='No video streams found in the file.')
 
@@ -56,7 +73,13 @@ def crop_video(input_video_path: str, safe_crop: bool = False, height: int = 480
 		if safe_crop:
 			crop_filter += ':exact=1'
 
-		(ffmpeg.input(input_video_path).output(cropped_video_path, vf=crop_filter).run(overwrite_output=True))
+		duration = float(metadata['format']['duration'])
+		run_ffmpeg(
+			ffmpeg.input(input_video_path).output(
+				cropped_video_path, vf=crop_filter, **preset_options(encode_target, width, height, duration, stream_frame_rate(stream))
+			),
+			duration=duration,
+		)
 
 		logger.info('Finished video cropping...')
 		return cropped_video_path
@@ -0,0 +1,206 @@
+import logging
+import os
+from pathlib import Path
+from uuid import uuid4
+
+import ffmpeg
+
+from ffmpeg_mcp.configs import settings, setup_logging
+from ffmpeg_mcp.exceptions import build_exception_message
+from ffmpeg_mcp.services.overlay_image import OVERLAY_POSITIONS, apply_image_overlay
+from ffmpeg_mcp.services.scale_video import RESOLUTIONS
+from utils import (
+	get_audio_streams,
+	get_video_stream,
+	media_duration,
+	probe_media,
+	scratch_workspace,
+	stream_frame_rate,
+	validate_input_video_path,
+)
+from utils.encode_profiles import check_encode_target, preset_options
+from utils.ffmpeg_runner import run_ffmpeg
+from utils.filter_graph import apply_video_filters, plan_video_filters
+
+setup_logging()
+logger = logging.getLogger(__name__)
+
+PIPELINE_ROOT_DIR = os.path.join(settings.PROCESSED_ELEMENTS_DIR, 'edit_pipelines')
+
+# Parameters each step accepts; they mirror the standalone tools of the same name.
+STEP_PARAMS = {
+	'clip_video': {'start_timestamp', 'duration'},
+	'crop_video': {'safe_crop', 'height', 'width', 'x_offset', 'y_offset'},
+	'scale_video': {'resolution'},
+	'overlay_image': {'overlay_image_path', 'positioning', 'scale', 'opacity', 'start_time', 'duration'},
+}
+
+
+def _plan_steps(steps: list[dict], width: int, height: int, total_duration: float):
+	"""
+	Validate the steps against the video as it is at each point of the pipeline.
+
+	Clip steps narrow a single window of the source, so they become one input seek; every other
+	step becomes a filter. Times of overlay steps are relative to the timeline at that step, so the
+	window start in effect when they were declared is kept to shift them onto the final timeline.
+
+	Returns:
+	    tuple: (window start, window duration, list of (tool, params, window start at that step),
+	    (output width, output height)).
+
+	Raises:
+	    ValueError: If a step is unknown, malformed or incompatible with the video at that point.
+	"""
+	window_start, window_duration = 0.0, total_duration
+	filters = []
+
+	for index, step in enumerate(steps, start=1):
+		params = dict(step)
+		tool = params.pop('tool', None)
+		if tool not in STEP_PARAMS:
+			raise ValueError(f'Step {index}: unknown tool {tool!r}; expected one of {sorted(STEP_PARAMS)}')
+		unknown = set(params) - STEP_PARAMS[tool]
+		if unknown:
+			raise ValueError(f'Step {index}: unsupported parameters for {tool}: {sorted(unknown)}')
+
+		if tool == 'clip_video':
+			start, duration = float(params.get('start_timestamp', 0.0)), float(params.get('duration', 5.0))
+			if start < 0 or duration <= 0:
+				raise ValueError(f'Step {index}: start_timestamp must be >= 0 and duration > 0')
+			if start + duration > window_duration + 1e-6:
+				raise ValueError(f'Step {index}: Clip duration exceeds total duration.')
+			window_start += start
+			window_duration = duration
+
+		elif tool == 'crop_video':
+			params = {'safe_crop': False, 'height': 480, 'width': 640, 'x_offset': 0, 'y_offset': 0, **params}
+			if not params['safe_crop'] and (params['width'] > width or params['height'] > height):
+				raise ValueError(
+					f'Step {index}: Crop dimensions must be smaller than or equal to the {width}x{height} video at this step.'
+				)
+			width, height = params['width'], params['height']
+			filters.append((tool, params, window_start))
+
+		elif tool == 'scale_video':
+			params = {'resolution': '1080p', **params}
+			if params['resolution'] not in RESOLUTIONS:
+				raise ValueError(f'Step {index}: invalid resolution {params["resolution"]!r}; expected one of {sorted(RESOLUTIONS)}')
+			# The size going into the step lets a scale to the current size be left out.
+			params['input_size'] = (width, height)
+			width, height = RESOLUTIONS[params['resolution']]
+			filters.append((tool, params, window_start))
+
+		elif tool == 'overlay_image':
+			params = {'positioning': 'top_right', 'scale': (100, 100), 'opacity': None, 'start_time': 0.0, 'duration': None, **params}
+			if not params.get('overlay_image_path') or not Path(params['overlay_image_path']).exists():
+				raise ValueError(f'Step {index}: Overlay image not found at path {params.get("overlay_image_path")}')
+			if params['positioning'] not in OVERLAY_POSITIONS:
+				raise ValueError(f'Step {index}: Invalid positioning : {params["positioning"]}')
+			if params['start_time'] < 0.0:
+				raise ValueError(f'Step {index}: Start time must be greater than 0.0 seconds')
+			if params['duration'] is not None and (
+				params['duration'] <= 0.0 or params['start_time'] + params['duration'] > window_duration + 1e-6
+			):
+				raise ValueError(f'Step {index}: overlay duration must be > 0 and end within the video')
+			filters.append((tool, params, window_start))
+
+	return window_start, window_duration, filters, (width, height)
+
+
+@validate_input_video_path
+def run_edit_pipeline(input_video_path: str, steps: list[dict], keep_audio: bool = True, encode_target: str | None = None) -> str:
+	"""
+	Apply several edits to a video in one ffmpeg run: one decode, one filtergraph, one encode.
+
+	Each step is a dict with a `tool` key (`clip_video`, `crop_video`, `scale_video` or
+	`overlay_image`) and that tool's parameters (without the input/output paths), applied in order,
+	e.g. `[{"tool": "clip_video", "start_timestamp": 5, "duration": 10},
+	{"tool": "crop_video", "width": 1280, "height": 720},
+	{"tool": "overlay_image", "overlay_image_path": "/path/logo.png", "positioning": "bottom_right"}]`.
+	Times given in a step are relative to the video as it is at that step, exactly as if the
+	standalone tools had been chained, but no intermediate files are written and quality is only
+	lost once.
+
+	Params:
+	    input_video_path (str): Path to the source video.
+	    steps (list[dict]): Ordered edit steps.
+	    keep_audio (bool): Whether to keep the source audio (trimmed to the clipped range). Defaults to True.
+	    encode_target (str | None): Speed target used to pick the x264 preset on this host: '<N>s' to finish
+	        within N seconds or 'realtime x<K>' to encode at K times playback speed. Defaults to None (preset 'fast').
+	        Requires calibrate_encoder to have run on this host.
+
+	Returns:
+	    str: Path to the edited video, or an exception message string on failure.
+	"""
+	if not steps:
+		return build_exception_message(error_type=ValueError, message='Provide at least one step')
+
+	metadata = probe_media(input_video_path)
+	video_stream = get_video_stream(metadata)
+	if video_stream is None:
+		return build_exception_message(error_type=ValueError, message='No video streams found in the file.')
+
+	try:
+		check_encode_target(encode_target)
+		window_start, window_duration, filters, (output_width, output_height) = _plan_steps(
+			steps, video_stream['width'], video_stream['height'], media_duration(metadata)
+		)
+	except (ValueError, TypeError) as e:
+		return build_exception_message(error_type=ValueError, message=str(e))
+
+	logger.info(f'Running {len(steps)}-step edit pipeline on {input_video_path} ({window_start}s + {window_duration}s)')
+
+	source = ffmpeg.input(input_video_path, ss=window_start, t=window_duration)
+	video = source.video
+	for tool, params, step_window_start in filters:
+		if tool == 'crop_video':
+			exact = {'exact': 1} if params['safe_crop'] else {}
+			video = video.filter('crop', params['width'], params['height'], params['x_offset'], params['y_offset'], **exact)
+		elif tool == 'scale_video':
+			width, height = RESOLUTIONS[params['resolution']]
+			input_width, input_height = params['input_size']
+			video = apply_video_filters(video, plan_video_filters({'width': input_width, 'height': input_height}, width, height))
+		elif tool == 'overlay_image':
+			shift = step_window_start - window_start
+			video = apply_image_overlay(
+				video,
+				params['overlay_image_path'],
+				params['positioning'],
+				params['scale'],
+				params['opacity'],
+				params['start_time'] + shift,
+				params['duration'],
+			)
+
+	streams = [video]
+	if keep_audio and get_audio_streams(metadata):
+		streams.append(source.audio)
+
+	output_path = os.path.join(PIPELINE_ROOT_DIR, f'{os.path.splitext(os.path.basename(input_video_path))[0]}_edited_{uuid4()}.mp4')
+	try:
+		with scratch_workspace('pipeline') as workspace:
+			scratch_output = workspace.path('edited.mp4')
+			run_ffmpeg(
+				ffmpeg.output(
+					*streams,
+					scratch_output,
+					vcodec='libx264',
+					acodec='aac',
+					pix_fmt='yuv420p',
+					crf=23,
+					**preset_options(
+						encode_target, output_width, output_height, window_duration, stream_frame_rate(video_stream), default='fast'
+					),
+					audio_bitrate='128k',
+					movflags='+faststart',
+				),
+				duration=window_duration,
+			)
+			workspace.publish(scratch_output, output_path)
+		logger.info(f'Edit pipeline complete: {output_path}')
+		return output_path
+
+	except ffmpeg._run.Error as e:
+		return build_exception_message(error_type=ffmpeg._run.Error, message=f'FFmpeg command failed: {e.stderr.decode("utf-8")}')
+	except Exception as e:
+		return build_exception_message(error_type=Exception, message=f'Unexpected error: {str(e)}')
@@ -1,43 +1,115 @@
 import logging
 import os
+from typing import Literal
+from uuid import uuid4
 
 import ffmpeg
 
-from ffmpeg_mcp.configs import setup_logging
+from ffmpeg_mcp.configs import settings, setup_logging
 from ffmpeg_mcp.exceptions import build_exception_message
-from utils import validate_input_video_path
+from utils import get_audio_streams, media_duration, memoize_result, probe_media, scratch_workspace, validate_input_video_path
+from utils.ffmpeg_runner import run_ffmpeg
 
 setup_logging()
 logger = logging.getLogger(__name__)
 
-CURR_PATH = os.path.dirname(os.path.abspath(__file__))
-AUDIO_PATH = os.path.join(CURR_PATH, '..', 'processed_elements', 'audio')
+AUDIO_PATH = os.path.join(settings.PROCESSED_ELEMENTS_DIR, 'audio')
 
-os.makedirs(AUDIO_PATH, exist_ok=True)
+# Container (by file extension) that holds each codec as-is for `mode='copy'`; anything else goes to Matroska.
+COPY_CONTAINERS = {
+	'aac': 'm4a',
+	'alac': 'm4a',
+	'mp3': 'mp3',
+	'mp2': 'mp2',
+	'opus': 'opus',
+	'vorbis': 'ogg',
+	'flac': 'flac',
+	'ac3': 'ac3',
+	'eac3': 'eac3',
+	'pcm_s16le': 'wav',
+	'pcm_s24le': 'wav',
+	'pcm_f32le': 'wav',
+}
+
+
+def copy_extension(codec_name: str | None) -> str:
+	"""Return the file extension of a container that takes `codec_name` without re-encoding."""
+	return COPY_CONTAINERS.get(codec_name or '', 'mka')
 
 
 @validate_input_video_path
-def extract_audio(input_video_path: str):
+@memoize_result
+def extract_audio(
+	input_video_path: str,
+	mode: Literal['wav', 'copy'] = 'wav',
+	tracks: Literal['first', 'all'] | list[int] = 'first',
+):
 	"""
 	Function to extract audio from the given input video.
 
+	All requested tracks are written by a single ffmpeg run, so the input is demuxed once whatever
+	the number of tracks. Output names carry a unique id, so sources sharing a file name never
+	overwrite each other's audio.
+
 	Params:
 	    input_video_path (str): Path to the input video.
+	    mode (str): 'wav' decodes to 44.1 kHz stereo 16-bit WAV; 'copy' keeps the native codec (no decode,
+	        no resample) in a matching container, e.g. `.m4a` for AAC, `.opus` for Opus, `.mka` otherwise.
+	        Defaults to 'wav'.
+	    tracks (str | list[int]): 'first' for the first audio track, 'all' for every audio track, or the
+	        indices of the audio tracks to extract (0 = first audio track). Defaults to 'first'.
 
 	Returns:
-	    audio_file_path (str): Path to the audio file.
+	    audio_file_path (str): Path to the audio file when `tracks` is 'first'; otherwise a list with
+	    the path of every extracted track, in the requested order.
 	"""
 	logger.info('Starting audio extraction process...')
-	audio_file_name = f'{os.path.basename(input_video_path).split(".")[0]}.wav'
-	audio_file_path = os.path.join(AUDIO_PATH, audio_file_name)
-	try:
-		(
-			ffmpeg.input(input_video_path)
-			.output(audio_file_path, vn=None, acodec='pcm_s16le', ac=2, ar=44100)
-			.run(overwrite_output=True, capture_stdout=True, capture_stderr=True)
+	if mode not in ('wav', 'copy'):
+		return build_exception_message(error_type=ValueError, message=f"Invalid mode '{mode}': use 'wav' or 'copy'")
+
+	metadata = probe_media(input_video_path)
+	audio_streams = get_audio_streams(metadata)
+	if not audio_streams:
+		return build_exception_message(error_type=ValueError, message=f'No audio track in {input_video_path}')
+
+	if tracks == 'first':
+		indices = [0]
+	elif tracks == 'all':
+		indices = list(range(len(audio_streams)))
+	elif isinstance(tracks, (list, tuple)) and tracks and all(isinstance(index, int) for index in tracks):
+		indices = list(dict.fromkeys(tracks))
+		invalid = [index for index in indices if not 0 <= index < len(audio_streams)]
+		if invalid:
+			return build_exception_message(
+				error_type=ValueError,
+				message=f'Audio track(s) {invalid} out of range: {input_video_path} has {len(audio_streams)} audio track(s)',
+			)
+	else:
+		return build_exception_message(
+			error_type=ValueError, message="tracks must be 'first', 'all' or a non-empty list of track indices"
 		)
+
+	stem = os.path.splitext(os.path.basename(input_video_path))[0]
+	run_id = uuid4()
+	try:
+		with scratch_workspace('audio') as workspace:
+			source = ffmpeg.input(input_video_path)
+			outputs, audio_file_paths = [], []
+			for index in indices:
+				extension = 'wav' if mode == 'wav' else copy_extension(audio_streams[index].get('codec_name'))
+				audio_file_name = (
+					f'{stem}_audio_{run_id}.{extension}' if tracks == 'first' else f'{stem}_audio_{run_id}_track{index}.{extension}'
+				)
+				options = {'acodec': 'pcm_s16le', 'ac': 2, 'ar': 44100} if mode == 'wav' else {'acodec': 'copy'}
+				outputs.append(source[f'a:{index}'].output(workspace.path(audio_file_name), **options))
+				audio_file_paths.append(os.path.join(AUDIO_PATH, audio_file_name))
+
+			run_ffmpeg(ffmpeg.merge_outputs(*outputs), duration=media_duration(metadata))
+			for audio_file_path in audio_file_paths:
+				workspace.publish(workspace.path(os.path.basename(audio_file_path)), audio_file_path)
+
 		logger.info('Finished audio extraction process...')
-		return audio_file_path
+		return audio_file_paths[0] if tracks == 'first' else audio_file_paths
 	except ffmpeg._run.Error as e:
 		return build_exception_message(error_type=ffmpeg._run.Error, message=f'FFmpeg Command Failed: {e.stderr.decode("utf-8")}')
 	except Exception as e:
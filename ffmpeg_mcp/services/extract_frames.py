@@ -1,30 +1,47 @@
-import json
 import logging
+import math
 import os
 from pathlib import Path
-from typing import List, Optional
+from typing import List, Literal, Optional
 from uuid import uuid4
 
 import ffmpeg
+from fastmcp.utilities.types import Image
 
-from ffmpeg_mcp.configs import setup_logging
+from ffmpeg_mcp.configs import settings, setup_logging
 from ffmpeg_mcp.exceptions import build_exception_message
-from ffmpeg_mcp.services import get_video_metadata
-from utils import validate_input_video_path
+from utils import memoize_result, probe_media, stream_frame_rate, validate_input_video_path
+from utils.ffmpeg_runner import run_ffmpeg
 
 setup_logging()
 logger = logging.getLogger(__name__)
 
-CURR_PATH = os.path.dirname(os.path.abspath(__file__))
-FRAMES_ROOT_DIR = os.path.join(CURR_PATH, '..', 'processed_elements', 'frames')
+FRAMES_ROOT_DIR = os.path.join(settings.PROCESSED_ELEMENTS_DIR, 'frames')
 
-os.makedirs(FRAMES_ROOT_DIR, exist_ok=True)
+
+def _split_jpegs(data: bytes) -> list[bytes]:
+	"""Split concatenated JPEGs (ffmpeg's image2pipe output) at their end-of-image markers."""
+	# 0xFFD9 cannot occur inside entropy-coded data (0xFF bytes are stuffed there), and the
+	# mjpeg encoder writes no embedded thumbnails, so every marker ends a frame.
+	frames, start = [], 0
+	while (end := data.find(b'\xff\xd9', start)) != -1:
+		frames.append(data[start : end + 2])
+		start = end + 2
+	return frames
 
 
 @validate_input_video_path
-def extract_frames(input_video_path: str, number_of_frames: Optional[int] = None, timestamp_offset: Optional[int] = None) -> List[str]:
+@memoize_result
+def extract_frames(
+	input_video_path: str,
+	number_of_frames: Optional[int] = None,
+	timestamp_offset: Optional[int] = None,
+	output: Literal['files', 'inline'] = 'files',
+	max_width: int = 640,
+	quality: int = 75,
+) -> List[str] | List[Image]:
 	"""
-	Extract frames from a video file and save each frame with a unique UUID filename.
+	Extract frames from a video file in a single decode pass and save them under a unique UUID prefix.
 
 	Behavior:
 	    - If `number_of_frames` is provided, extracts that many frames evenly across the video.
@@ -33,85 +50,105 @@ def extract_frames(input_video_path: str, number_of_frames: Optional[int] = None
 	      at every given second interval.
 	    - If neither is provided, defaults to extracting one frame per second.
 	    - `number_of_frames` takes priority if both are provided.
+	    - With `output='inline'`, frames are piped out of ffmpeg as JPEGs (scaled down to at most
+	      `max_width` pixels wide, at the given `quality`) and returned as image content; nothing is
+	      written to disk. At most `INLINE_FRAMES_MAX` frames and `INLINE_FRAMES_MAX_BYTES` bytes are
+	      returned this way; larger extractions return an error asking for `output='files'`.
 
 	Params:
 	    input_video_path (str): Path to the input video file.
 	    number_of_frames (Optional[int]): Total number of frames to extract evenly across the video.
 	    timestamp_offset (Optional[int]): Time interval in seconds between frames.
+	    output (Literal['files', 'inline']): Save full-size frames and return their paths (default),
+	        or return the frames themselves as images.
+	    max_width (int): Inline only: maximum frame width in pixels; smaller frames are not upscaled. Defaults to 640.
+	    quality (int): Inline only: JPEG quality from 1 (smallest) to 100 (best). Defaults to 75.
 
 	Returns:
-	    List[str]: List of file paths for the extracted frames with UUID-based filenames.
+	    List[str] | List[Image]: File paths of the extracted frames with UUID-based filenames, or the
+	    frames as JPEG images, in timestamp order.
 	"""
+	if output not in ('files', 'inline'):
+		return build_exception_message(error_type=ValueError, message=f'Invalid output mode: {output}')
+	if output == 'inline' and (max_width < 16 or not 1 <= quality <= 100):
+		return build_exception_message(error_type=ValueError, message='max_width must be >= 16 and quality between 1 and 100')
+
 	logger.info('Starting frame extraction process...')
 	try:
-		video_basename = os.path.basename(input_video_path).split('.')[0]
-		output_dir = f'{os.path.join(FRAMES_ROOT_DIR, video_basename)}_frames'
-
-		os.makedirs(output_dir, exist_ok=True)
-
-		metadata = get_video_metadata(input_video_path)
-		metadata_streams = json.loads(metadata).get('streams', [])
+		metadata = probe_media(input_video_path)
+		metadata_streams = metadata.get('streams', [])
 		if not metadata_streams:
 			return build_exception_message(error_type=ValueError, message='No video streams found in the file.')
 
 		stream = metadata_streams[0]
-		total_duration = float(stream.get('duration') or json.loads(metadata)['format']['duration'])
-		fps = eval(stream['r_frame_rate'])
+		total_duration = float(stream.get('duration') or metadata['format']['duration'])
+		fps = stream_frame_rate(stream)
 		total_frames_available = int(total_duration * fps)
 
-		frame_files = []
-
 		# Case 1: number_of_frames provided → split total duration evenly
 		if number_of_frames is not None:
 			# Cap the frames to total available frames
 			number_of_frames = min(number_of_frames, total_frames_available)
 			interval = total_duration / number_of_frames
-			for i in range(number_of_frames):
-				timestamp = i * interval
-				unique_name = f'frame_{uuid4().hex}.jpg'
-				output_path = Path(output_dir) / unique_name
-				(
-					ffmpeg.input(input_video_path, ss=timestamp)
-					.output(str(output_path), vframes=1, qscale=2)
-					.overwrite_output()
-					.run(quiet=True)
-				)
-				frame_files.append(str(output_path))
+			frame_count = number_of_frames
 
 		# Case 2: timestamp_offset provided → extract frames at each offset
-		elif timestamp_offset is not None:
-			current_time = 0
-			while current_time < total_duration:
-				unique_name = f'frame_{uuid4().hex}.jpg'
-				output_path = Path(output_dir) / unique_name
-				(
-					ffmpeg.input(input_video_path, ss=current_time)
-					.output(str(output_path), vframes=1, qscale=2)
-					.overwrite_output()
-					.run(quiet=True)
-				)
-				frame_files.append(str(output_path))
-				current_time += timestamp_offset
-
 		# Case 3: neither provided → default extract every second
 		else:
-			current_time = 0
-			timestamp_offset = 1
-			while current_time < total_duration:
-				unique_name = f'frame_{uuid4().hex}.jpg'
-				output_path = Path(output_dir) / unique_name
-				(
-					ffmpeg.input(input_video_path, ss=current_time)
-					.output(str(output_path), vframes=1, qscale=2)
-					.overwrite_output()
-					.run(quiet=True)
+			interval = timestamp_offset if timestamp_offset is not None else 1
+			frame_count = math.ceil(total_duration / interval)
+
+		if output == 'inline' and frame_count > settings.INLINE_FRAMES_MAX:
+			return build_exception_message(
+				error_type=ValueError,
+				message=f'{frame_count} frames exceed the inline limit of {settings.INLINE_FRAMES_MAX}; '
+				"request fewer frames or use output='files'",
+			)
+
+		# One decode pass: select the first frame at or after every `i * interval` seconds, as seeking
+		# to each of those timestamps would (input seeking is relative to the container start time).
+		start_time = float(metadata['format'].get('start_time') or 0.0)
+		frames = ffmpeg.input(input_video_path).filter('select', f'gte(t-{start_time},selected_n*{interval})')
+
+		if output == 'inline':
+			# JPEG qscale runs from 2 (best) to 31 (smallest).
+			qscale = round(31 - (quality - 1) * 29 / 99)
+			jpegs, _ = run_ffmpeg(
+				frames.filter('scale', w=f'min(iw,{max_width})', h=-2).output(
+					'pipe:', vframes=frame_count, vsync='vfr', format='image2pipe', vcodec='mjpeg', **{'q:v': qscale}
+				),
+				capture_stdout=True,
+			)
+			if len(jpegs) > settings.INLINE_FRAMES_MAX_BYTES:
+				return build_exception_message(
+					error_type=ValueError,
+					message=f'{len(jpegs)} bytes of frames exceed the inline limit of {settings.INLINE_FRAMES_MAX_BYTES}; '
+					"lower max_width or quality, or use output='files'",
 				)
+			images = [Image(data=jpeg, format='jpeg') for jpeg in _split_jpegs(jpegs)]
+			logger.info(f'Finished frame extraction process: {len(images)} inline frames, {len(jpegs)} bytes')
+			return images
+
+		# The image2 muxer writes the frames out as a numbered sequence.
+		video_basename = os.path.basename(input_video_path).split('.')[0]
+		output_dir = f'{os.path.join(FRAMES_ROOT_DIR, video_basename)}_frames'
+		os.makedirs(output_dir, exist_ok=True)
+		frame_prefix = f'frame_{uuid4().hex}'
+		output_pattern = Path(output_dir) / f'{frame_prefix}_%06d.jpg'
+		run_ffmpeg(
+			frames.output(str(output_pattern), vframes=frame_count, vsync='vfr', qscale=2, start_number=0, format='image2'),
+			duration=total_duration,
+		)
+
+		frame_files = []
+		for i in range(frame_count):
+			output_path = Path(output_dir) / f'{frame_prefix}_{i:06d}.jpg'
+			if output_path.exists():
 				frame_files.append(str(output_path))
-				current_time += timestamp_offset
 
 		logger.info('Finished frame extraction process...')
 		return frame_files
 	except ffmpeg._run.Error as e:
-		return build_exception_message(error_type=e, message=f'FFmpeg Command Failed: {e.stderr.decode("utf-8")}')
+		return build_exception_message(error_type=ffmpeg._run.Error, message=f'FFmpeg Command Failed: {e.stderr.decode("utf-8")}')
 	except Exception as e:
 		return build_exception_message(error_type=Exception, message=f'An Unexpected error has occurred: {str(e)}')
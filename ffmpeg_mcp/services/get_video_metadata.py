@@ -5,6 +5,7 @@ import ffmpeg
 
 from ffmpeg_mcp.configs import setup_logging
 from ffmpeg_mcp.exceptions import build_exception_message
+from utils.probe_cache import probe_media
 
 setup_logging()
 logger = logging.getLogger(__name__)
@@ -13,6 +14,7 @@ logger = logging.getLogger(__name__)
 def get_video_metadata(input_video_path: str):
 	"""
 	Function to extract metadata of the given input video.
+	Results are served from the shared probe cache while the file is unchanged.
 
 	Params:
 		input_video_path (str): Path to the input video.
@@ -22,7 +24,7 @@ def get_video_metadata(input_video_path: str):
 	"""
 	try:
 		logger.info(f'Extracting metadata for {input_video_path}')
-		video_metadata = ffmpeg.probe(input_video_path)
+		video_metadata = probe_media(input_video_path)
 		logger.info('Metadata extracted...')
 		return json.dumps(video_metadata, indent=2)
 	except ffmpeg._run.Error as e:
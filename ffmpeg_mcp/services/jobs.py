@@ -0,0 +1,69 @@
+import json
+import logging
+
+from ffmpeg_mcp.configs import setup_logging
+from ffmpeg_mcp.exceptions import build_exception_message
+from utils.cpu_scheduler import cpu_scheduler
+from utils.job_manager import job_manager
+
+setup_logging()
+logger = logging.getLogger(__name__)
+
+
+def get_job_status(job_id: str) -> str:
+	"""
+	Get the status of a background job started with `run_in_background=True`.
+
+	Params:
+	    job_id (str): The job id returned when the job was started.
+
+	Returns:
+	    JSON with the job status (PENDING, RUNNING, COMPLETED or FAILED) and its progress:
+	    percent complete, encode fps and speed.
+	"""
+	job = job_manager.get(job_id)
+	if job is None:
+		return build_exception_message(error_type=KeyError, message=f'Unknown job id: {job_id}')
+	return json.dumps(job.to_dict(), indent=2)
+
+
+def get_job_result(job_id: str) -> str:
+	"""
+	Fetch the result of a finished background job.
+
+	Params:
+	    job_id (str): The job id returned when the job was started.
+
+	Returns:
+	    The tool's own return value once the job has completed, or an exception message
+	    if the job is unknown, still running, or failed.
+	"""
+	job = job_manager.get(job_id)
+	if job is None:
+		return build_exception_message(error_type=KeyError, message=f'Unknown job id: {job_id}')
+	if job.status == 'FAILED':
+		return build_exception_message(error_type=RuntimeError, message=f'Job {job_id} failed: {job.error}')
+	if job.status != 'COMPLETED':
+		return build_exception_message(error_type=RuntimeError, message=f'Job {job_id} is still {job.status.lower()}')
+	return job.result
+
+
+def list_jobs() -> str:
+	"""
+	List the background jobs known to the server.
+
+	Returns:
+	    JSON list with the status and progress of each job, oldest first.
+	"""
+	return json.dumps([job.to_dict() for job in job_manager.list()], indent=2)
+
+
+def get_scheduler_status() -> str:
+	"""
+	Report how the server's CPU budget is being used by ffmpeg processes.
+
+	Returns:
+	    JSON with the core budget, cores in use, utilization (0-1), running processes and the
+	    number of processes queued waiting for cores.
+	"""
+	return json.dumps(cpu_scheduler.stats(), indent=2)
@@ -1,52 +1,149 @@
 import logging
 import os
+import time
+from typing import Literal
 from uuid import uuid4
 
 import ffmpeg
 
-from ffmpeg_mcp.configs import setup_logging
+from ffmpeg_mcp.configs import settings, setup_logging
 from ffmpeg_mcp.exceptions import build_exception_message
-from utils import validate_input_video_path
+from utils import file_fingerprint, fingerprint_digest, memoize_result, publish_file, scratch_workspace, validate_input_video_path
+from utils.ffmpeg_runner import run_ffmpeg
 
 setup_logging()
 logger = logging.getLogger(__name__)
 
 
-CURR_PATH = os.path.dirname(os.path.abspath(__file__))
-GIF_ROOT_DIR = os.path.join(CURR_PATH, '..', 'processed_elements', 'gifs')
+GIF_ROOT_DIR = os.path.join(settings.PROCESSED_ELEMENTS_DIR, 'gifs')
 
-os.makedirs(GIF_ROOT_DIR, exist_ok=True)
+# Palettes depend only on the frames they are computed from, so they are shared across renders
+# that differ in dithering (or are simply repeated) and skip the palettegen pass.
+PALETTE_CACHE_DIR = os.path.join(settings.PROCESSED_ELEMENTS_DIR, 'gif_palettes')
+
+
+def palette_cache_path(input_video_path: str, start_timestamp: float, duration: float, fps: float, width: int, stats_mode: str) -> str:
+	"""Return where the palette for this source file, time range and frame sampling is cached."""
+	key = fingerprint_digest(
+		file_fingerprint(input_video_path), float(start_timestamp), float(duration), float(fps), int(width), stats_mode
+	)
+	return os.path.join(PALETTE_CACHE_DIR, f'{key}.png')
+
+
+def use_cached_palette(palette_path: str) -> bool:
+	"""Mark a cached palette as recently used by touching it; False if it is not cached."""
+	try:
+		os.utime(palette_path)
+		return True
+	except FileNotFoundError:
+		return False
+
+
+def evict_palettes(max_entries: int = settings.PALETTE_CACHE_SIZE):
+	"""Delete the least recently used cached palettes (oldest mtime) beyond `max_entries`."""
+	palettes = []
+	with os.scandir(PALETTE_CACHE_DIR) as entries:
+		for entry in entries:
+			try:
+				palettes.append((entry.stat().st_mtime_ns, entry.path))
+			except FileNotFoundError:
+				continue
+	palettes.sort(reverse=True)
+	for _, path in palettes[max_entries:]:
+		try:
+			os.remove(path)
+		except FileNotFoundError:
+			pass
 
 
 @validate_input_video_path
-def make_gif(input_video_path: str, start_timestamp: float = 0.0, duration: float = 2.0):
+@memoize_result
+def make_gif(
+	input_video_path: str,
+	start_timestamp: float = 0.0,
+	duration: float = 2.0,
+	fps: float = 10,
+	width: int = 480,
+	dither: Literal[
+		'bayer', 'heckbert', 'floyd_steinberg', 'sierra2', 'sierra2_4a', 'sierra3', 'burkes', 'atkinson', 'none'
+	] = 'sierra2_4a',
+	stats_mode: Literal['full', 'diff', 'single'] = 'full',
+):
 	"""
 	Make gif using video path provided by user.
 
+	The source is decoded once: the scaled frames are split between `palettegen`, which builds an
+	optimized 256-colour palette, and `paletteuse`, which maps the frames onto it. Palettes are cached
+	by source file, time range, fps, width and stats mode, so re-rendering (e.g. with another dither)
+	skips palette generation; the least recently used beyond `PALETTE_CACHE_SIZE` are deleted.
+
 	Args:
 	    input_video_path (str): Path to the source video file.
 	    start_timestamp (float, optional): Start time in seconds. Defaults to 0.0.
-	    duration (float, optional): Clip length in seconds. Defaults to 4.0.
+	    duration (float, optional): Clip length in seconds. Defaults to 2.0.
+	    fps (float, optional): Frame rate of the gif. Defaults to 10.
+	    width (int, optional): Width of the gif in pixels; height keeps the aspect ratio. Defaults to 480.
+	    dither (str, optional): Dithering used by `paletteuse`. Defaults to 'sierra2_4a'.
+	    stats_mode (str, optional): Pixels `palettegen` builds the palette from: 'full' (all frames),
+	        'diff' (only what changes, better for moving subjects on a static background) or 'single'
+	        (one palette per frame; not cached). Defaults to 'full'.
 
 	Returns:
-	    str: Path to the generated clip, or an exception message string on failure.
+	    dict: `output_path`, `output_bytes`, `render_seconds`, `palette_cached` (whether palette
+	    generation was skipped) and `cached` (True when an identical earlier call's gif is returned;
+	    `render_seconds` is then that call's), or an exception message string on failure.
 	"""
 	logger.info('Starting making gif...')
+	started = time.perf_counter()
 
 	gif_file_name = f'{os.path.splitext(os.path.basename(input_video_path))[0]}_gif_{uuid4()}.gif'
 	gif_file_path = os.path.join(GIF_ROOT_DIR, gif_file_name)
 
+	cached_palette = (
+		None if stats_mode == 'single' else palette_cache_path(input_video_path, start_timestamp, duration, fps, width, stats_mode)
+	)
+	palette_cached = cached_palette is not None and use_cached_palette(cached_palette)
+
 	try:
-		(
-			ffmpeg.input(input_video_path, ss=start_timestamp, t=duration)
-			.filter('fps', fps=10)
-			.filter('scale', 480, -1, flags='lanczos')
-			.output(gif_file_path, gifflags='+transdiff')
-			.overwrite_output()
-			.run(quiet=True)
-		)
-		logger.info('Finished making gif...')
-		return gif_file_path
+		with scratch_workspace('gif') as workspace:
+			frames = (
+				ffmpeg.input(input_video_path, ss=start_timestamp, t=duration)
+				.video.filter('fps', fps=fps)
+				.filter('scale', width, -1, flags='lanczos')
+			)
+			outputs = []
+			if palette_cached:
+				palette = ffmpeg.input(cached_palette).video
+			else:
+				split_frames = frames.split()
+				frames = split_frames[0]
+				palette = split_frames[1].filter('palettegen', stats_mode=stats_mode)
+				if cached_palette is not None:
+					split_palette = palette.split()
+					palette = split_palette[0]
+					new_palette_path = workspace.path('palette.png')
+					outputs.append(split_palette[1].output(new_palette_path, vframes=1))
+
+			gif = ffmpeg.filter([frames, palette], 'paletteuse', dither=dither, new=int(stats_mode == 'single'))
+			gif_temp_path = workspace.path('output.gif')
+			outputs.append(gif.output(gif_temp_path, gifflags='+transdiff'))
+
+			run_ffmpeg(ffmpeg.merge_outputs(*outputs), duration=duration)
+
+			if cached_palette is not None and not palette_cached:
+				publish_file(new_palette_path, cached_palette)
+				evict_palettes()
+			workspace.publish(gif_temp_path, gif_file_path)
+
+		render_seconds = round(time.perf_counter() - started, 3)
+		logger.info(f'Finished making gif in {render_seconds}s (palette {"reused" if palette_cached else "generated"})...')
+		return {
+			'output_path': gif_file_path,
+			'output_bytes': os.path.getsize(gif_file_path),
+			'render_seconds': render_seconds,
+			'palette_cached': palette_cached,
+			'cached': False,
+		}
 
 	except ffmpeg._run.Error as e:
 		return build_exception_message(error_type=ffmpeg._run.Error, message=f'FFmpeg command failed: {e.stderr.decode("utf-8")}')
@@ -1,23 +1,117 @@
+import contextvars
 import logging
 import os
 from concurrent.futures import ThreadPoolExecutor, as_completed
+from fractions import Fraction
+from uuid import uuid4
 
 import ffmpeg
-from tqdm import tqdm
 
-from ffmpeg_mcp.configs import setup_logging
+from ffmpeg_mcp.configs import settings, setup_logging
 from ffmpeg_mcp.exceptions import build_exception_message
+from utils import get_audio_streams, get_video_stream, parse_frame_rate, probe_media, scratch_workspace
+from utils.chunked_encode import encode_chunked
+from utils.encode_profiles import check_encode_target, preset_options
+from utils.ffmpeg_runner import run_ffmpeg
+from utils.filter_graph import plan_video_filters, video_filter_string
 
 setup_logging()
 logger = logging.getLogger(__name__)
 
-base_dir = os.path.dirname(os.path.abspath(__file__))
-video_clip_path = os.path.join(base_dir, '..', 'processed_elements', 'normalized_video_clips')
-os.makedirs(video_clip_path, exist_ok=True)
-max_workers = os.cpu_count() or 4
+video_clip_path = os.path.join(settings.PROCESSED_ELEMENTS_DIR, 'normalized_video_clips')
+# Clips are prepared concurrently; actual ffmpeg concurrency and threads are bounded by the CPU scheduler.
+max_workers = settings.CPU_BUDGET
 
+# How a clip was brought to the target format, as reported by `get_normalized_clips`.
+SYMLINK, REMUX, REENCODE = 'symlink', 'remux', 'reencode'
 
-def normalize_single_clip(clip, output_path, resolution, frame_rate, crf, audio_bitrate, preset):
+
+def choose_normalization(metadata: dict, resolution, frame_rate) -> str:
+	"""
+	Decide the cheapest way to normalize a clip from its probe data.
+
+	A clip already in the target format (one H.264 yuv420p video stream at the target resolution,
+	square pixels and a constant target frame rate, at most one AAC audio stream) does not need to be
+	re-encoded: it is symlinked if it is already a plain MP4, or stream-copied into one otherwise.
+
+	Returns:
+	    str: `SYMLINK`, `REMUX` or `REENCODE`.
+	"""
+	video = get_video_stream(metadata)
+	audio_streams = get_audio_streams(metadata)
+	if video is None:
+		return REENCODE
+
+	width, height = resolution
+	target_rate = Fraction(frame_rate)
+	conforms = (
+		video.get('codec_name') == 'h264'
+		and video.get('pix_fmt') == 'yuv420p'
+		and (video.get('width'), video.get('height')) == (width, height)
+		and video.get('sample_aspect_ratio') in (None, '1:1', '0:1')
+		and parse_frame_rate(video.get('r_frame_rate')) == target_rate
+		# A variable frame rate source has the right nominal rate but a different average one.
+		and abs(parse_frame_rate(video.get('avg_frame_rate')) - target_rate) <= target_rate * Fraction(1, 200)
+		and len(audio_streams) <= 1
+		and all(stream.get('codec_name') == 'aac' for stream in audio_streams)
+	)
+	if not conforms:
+		return REENCODE
+
+	format_info = metadata.get('format', {})
+	is_plain_mp4 = 'mp4' in format_info.get('format_name', '').split(',') and format_info.get('filename', '').lower().endswith('.mp4')
+	if is_plain_mp4 and len(metadata.get('streams', [])) == 1 + len(audio_streams):
+		return SYMLINK
+	return REMUX
+
+
+def remux_clip(clip, output_path):
+	"""Stream-copy the video and audio of an already conforming clip into an MP4 container."""
+	metadata = probe_media(clip)
+	clip_input = ffmpeg.input(clip)
+	streams = [clip_input['v:0'], clip_input['a:0']] if get_audio_streams(metadata) else [clip_input['v:0']]
+	try:
+		run_ffmpeg(
+			ffmpeg.output(*streams, output_path, c='copy', movflags='+faststart', format='mp4'),
+			duration=float(metadata['format']['duration']),
+		)
+		logger.info(f'Remuxed conforming clip {clip} → {output_path}')
+		return output_path
+	except ffmpeg._run.Error as e:
+		logger.error(f'Error remuxing {clip}: {e.stderr.decode()}')
+		return build_exception_message(error_type=ffmpeg._run.Error, message='Error remuxing.')
+
+
+def prepare_clip(
+	clip, output_path, resolution, frame_rate, crf, audio_bitrate, preset, chunked=False, encode_target=None
+) -> tuple[str, str]:
+	"""
+	Bring one clip to the target format the cheapest way possible.
+
+	Returns:
+	    tuple[str, str | None]: The result of the chosen step (output path, or an exception message) and the
+	    method used (`SYMLINK`, `REMUX` or `REENCODE`; None when the clip could not be probed).
+	"""
+	try:
+		method = choose_normalization(probe_media(clip), resolution, frame_rate)
+	except (OSError, ffmpeg._run.Error) as e:
+		logger.error(f'Skipping {clip}: it could not be probed ({e})')
+		return build_exception_message(error_type=type(e), message=f'Could not probe {clip}'), None
+	if method == SYMLINK:
+		try:
+			os.symlink(os.path.realpath(clip), output_path)
+			logger.info(f'{clip} already conforms; linked as {output_path}')
+			return output_path, method
+		except OSError as e:
+			# Creating symlinks needs extra privileges on Windows; a stream copy gives the same clip.
+			logger.warning(f'Could not link {clip} ({e}); remuxing it instead')
+			method = REMUX
+	if method == REMUX:
+		return remux_clip(clip, output_path), method
+	return normalize_single_clip(clip, output_path, resolution, frame_rate, crf, audio_bitrate, preset, chunked, encode_target), method
+
+
+def normalize_single_clip(clip, output_path, resolution, frame_rate, crf, audio_bitrate, preset, chunked=False, encode_target=None):
 	"""
 	Normalize a single video clip by adjusting resolution, frame rate, codec, and compression parameters.
 
@@ -29,43 +123,123 @@ def normalize_single_clip(clip, output_path, resolution, frame_rate, crf, audio_
 	    crf (int): Constant Rate Factor for quality control (lower is higher quality; typical 18–28).
 	    audio_bitrate (str): Target audio bitrate, e.g., '128k'.
 	    preset (str): Encoding speed vs. compression efficiency preset (e.g., 'fast', 'slow').
+	    chunked (bool): Encode keyframe-aligned chunks of the clip in parallel processes (see `encode_chunked`).
+	    encode_target (str | None): Speed target ('<N>s' or 'realtime x<K>'); when set, it picks the preset instead of `preset`.
+	        Requires calibrate_encoder to have run on this host.
 
 	Returns:
-	    Path to the normalized output video if successful, or None if an error occurred.
+	    Path to the normalized output video if successful, or an exception message if an error occurred.
 
 	Logs:
 	    Logs success and failure of the normalization process, including any ffmpeg errors.
 
 	Notes:
 	    - Maintains the original aspect ratio by padding if needed.
+	    - Scale, pad, frame rate and pixel format conversions the clip does not need are left out.
 	    - Uses H.264 for video and AAC for audio encoding.
 	"""
 	width, height = resolution
 	try:
-		(
-			ffmpeg.input(clip)
-			.output(
-				output_path,
-				vcodec='libx264',
-				acodec='aac',
-				crf=crf,
-				preset=preset,
-				vf=(f'scale={width}:{height}:force_original_aspect_ratio=decrease,pad={width}:{height}:(ow-iw)/2:(oh-ih)/2'),
-				r=frame_rate,
-				audio_bitrate=audio_bitrate,
-				format='mp4',
-			)
-			.run(overwrite_output=True, quiet=True)
+		metadata = probe_media(clip)
+		duration = float(metadata['format']['duration'])
+		# The frame rate is an explicit target here (clips must match to be joined), so it is also raised.
+		vf = video_filter_string(
+			plan_video_filters(get_video_stream(metadata) or {}, width, height, frame_rate, pix_fmt='yuv420p', allow_upconversion=True)
 		)
+		video_options = {
+			'vcodec': 'libx264',
+			'crf': crf,
+			**preset_options(encode_target, width, height, duration, frame_rate, default=preset),
+			**({'vf': vf} if vf else {}),
+		}
+		audio_options = {'acodec': 'aac', 'audio_bitrate': audio_bitrate}
+		if chunked:
+			encode_chunked(clip, output_path, video_options, audio_options, output_options={'format': 'mp4'})
+		else:
+			run_ffmpeg(
+				ffmpeg.input(clip).output(output_path, **video_options, **audio_options, format='mp4'),
+				duration=duration,
+			)
 		logger.info(f'Normalized {clip} → {output_path}')
 		return output_path
 	except ffmpeg._run.Error as e:
-		logger.error(f'Error normalizing {clip}: {e.stderr.decode()}')
+		logger.error(f'Error normalizing {clip}: {e.stderr.decode() if e.stderr else e}')
 		return build_exception_message(error_type=ffmpeg._run.Error, message='Error normalizing.')
+	except OSError as e:
+		logger.error(f'Error normalizing {clip}: {e}')
+		return build_exception_message(error_type=type(e), message=f'Error normalizing {clip}.')
+
+
+def normalize_clips_to_dir(
+	input_video_clips: list[str],
+	output_dir: str,
+	resolution=(1280, 720),
+	frame_rate=30,
+	crf=23,
+	audio_bitrate='128k',
+	preset='fast',
+	chunked=False,
+	encode_target=None,
+) -> list[dict]:
+	"""
+	Normalize multiple video clips in parallel, writing `normalized_{i}.mp4` files into `output_dir`.
+	Clips that already conform are linked or remuxed instead of re-encoded (see `choose_normalization`).
+
+	Callers own `output_dir` (normally a scratch workspace), so concurrent calls never share files.
+
+	Returns:
+	    list[dict]: `input_path`, `output_path` and `method` of every successfully normalized clip, in input order.
+	"""
+	# Imported here rather than at module level: only this path needs it, and it adds to server startup.
+	from tqdm import tqdm
+
+	clips = input_video_clips
+	temp_files = [os.path.join(output_dir, f'normalized_{i}.mp4') for i in range(len(clips))]
+
+	assert len(clips) == len(temp_files), 'Clips and temp_files must be of the same length'
+
+	logger.info(f'Starting normalization with {max_workers} parallel workers...')
+
+	results = {}
+
+	with ThreadPoolExecutor(max_workers=max_workers) as executor:
+		# Each task runs in a copy of the caller's context, so progress and metrics stay attributed to the tool call.
+		futures = {
+			executor.submit(
+				contextvars.copy_context().run,
+				prepare_clip,
+				clip,
+				temp_path,
+				resolution,
+				frame_rate,
+				crf,
+				audio_bitrate,
+				preset,
+				chunked,
+				encode_target,
+			): (clip, temp_path)
+			for clip, temp_path in zip(clips, temp_files)
+		}
+
+		for future in tqdm(as_completed(futures), total=len(futures), desc='Normalizing Clips'):
+			clip, temp_path = futures[future]
+			result, method = future.result()
+			if result == temp_path:
+				results[temp_path] = {'input_path': clip, 'output_path': temp_path, 'method': method}
+
+	logger.info('All clips normalized.')
+	return [results[temp_path] for temp_path in temp_files if temp_path in results]
 
 
 def get_normalized_clips(
-	input_video_clips: list[str], resolution=(1280, 720), frame_rate=30, crf=23, audio_bitrate='128k', preset='fast'
+	input_video_clips: list[str],
+	resolution=(1280, 720),
+	frame_rate=30,
+	crf=23,
+	audio_bitrate='128k',
+	preset='fast',
+	chunked=False,
+	encode_target: str | None = None,
 ):
 	"""
 	Normalize multiple video clips in parallel by adjusting resolution, frame rate, codec, and compression parameters.
@@ -77,42 +251,41 @@ def get_normalized_clips(
 	    crf (int, optional): Constant Rate Factor for quality control (lower = better quality). Defaults to 23.
 	    audio_bitrate (str, optional): Target audio bitrate. Defaults to '128k'.
 	    preset (str, optional): Encoding speed vs. compression efficiency preset. Defaults to 'fast'.
-	    max_workers (int, optional): Number of parallel worker threads. If None, uses os.cpu_count().
+	    chunked (bool, optional): Split clips that need re-encoding at keyframes and encode the chunks
+	        in parallel processes; useful for a few long clips. Defaults to False.
+	    encode_target (str | None, optional): Speed target per re-encoded clip, used to pick the preset on this
+	        host instead of `preset`: '<N>s' to finish within N seconds or 'realtime x<K>'. Defaults to None.
+	        Requires calibrate_encoder to have run on this host.
 
 	Returns:
-	    list: Sorted list of file paths to the successfully normalized video clips.
+	    list[dict]: For every successfully normalized clip, in input order: `input_path`, `output_path`
+	    and `method` — `symlink` or `remux` when the clip already matched the target format (no
+	    re-encode), `reencode` otherwise.
 
 	Notes:
+	    - Clips that are already H.264/AAC at the target resolution, frame rate and pixel format are not re-encoded.
 	    - Runs normalization tasks in parallel using ThreadPoolExecutor.
 	    - Includes a progress bar (tqdm) to track processing status.
-	    - Automatically determines the number of workers based on CPU cores if not specified.
+	    - Automatically determines the number of workers based on CPU cores.
 	    - Skips clips that encounter errors but continues processing the rest.
+	    - Each call encodes in its own scratch workspace and publishes into its own output folder,
+	      so concurrent calls never overwrite each other.
 	"""
-	width, height = resolution
-
 	if not input_video_clips:
 		logger.error("Couldn't find videos to normalize")
-		build_exception_message(error_type=ValueError, message="Couldn't find videos to normalize")
-	clips = input_video_clips
-
-	temp_files = [os.path.join(video_clip_path, f'normalized_{i}.mp4') for i in range(len(clips))]
-
-	assert len(clips) == len(temp_files), 'Clips and temp_files must be of the same length'
-
-	logger.info(f'Starting normalization with {max_workers} parallel workers...')
-
-	results = []
-
-	with ThreadPoolExecutor(max_workers=max_workers) as executor:
-		futures = {
-			executor.submit(normalize_single_clip, clip, temp_path, resolution, frame_rate, crf, audio_bitrate, preset): temp_path
-			for clip, temp_path in zip(clips, temp_files)
-		}
-
-		for future in tqdm(as_completed(futures), total=len(futures), desc='Normalizing Clips'):
-			result = future.result()
-			if result:
-				results.append(result)
+		return build_exception_message(error_type=ValueError, message="Couldn't find videos to normalize")
+	try:
+		check_encode_target(encode_target)
+	except ValueError as e:
+		return build_exception_message(error_type=ValueError, message=str(e))
 
-	logger.info('All clips normalized.')
-	return sorted(results)
+	output_dir = os.path.join(video_clip_path, uuid4().hex)
+	with scratch_workspace('normalize') as workspace:
+		normalized = normalize_clips_to_dir(
+			input_video_clips, workspace.root, resolution, frame_rate, crf, audio_bitrate, preset, chunked, encode_target
+		)
+		for report in normalized:
+			report['output_path'] = workspace.publish(
+				report['output_path'], os.path.join(output_dir, os.path.basename(report['output_path']))
+			)
+		return normalized
@@ -1,127 +1,441 @@
+import contextvars
+import hashlib
+import json
 import logging
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
 from typing import Literal
+from uuid import uuid4
 
 import ffmpeg
 
+from ffmpeg_mcp.configs import settings
 from ffmpeg_mcp.configs.logging_config import setup_logging
 from ffmpeg_mcp.exceptions import build_exception_message
-from utils import validate_input_video_path
+from utils import (
+	file_fingerprint,
+	fingerprint_digest,
+	get_video_stream,
+	keyframe_at_or_after,
+	keyframe_at_or_before,
+	keyframe_times,
+	probe_media,
+	scratch_workspace,
+	stream_frame_rate,
+	validate_input_video_path,
+)
+from utils.encode_profiles import check_encode_target, preset_options
+from utils.ffmpeg_runner import run_ffmpeg
+from utils.gop_splice import can_splice, render_spliced
 
 setup_logging()
 logger = logging.getLogger(__name__)
 
 
-CURR_PATH = os.path.dirname(os.path.abspath(__file__))
-IMAGE_OVERLAY_PATH = os.path.join(CURR_PATH, '..', 'processed_elements', 'image_overlays')
+IMAGE_OVERLAY_PATH = os.path.join(settings.PROCESSED_ELEMENTS_DIR, 'image_overlays')
+# Pre-rendered overlay images (scaled, opacity applied), shared by every call using the same image.
+OVERLAY_ASSET_DIR = os.path.join(settings.PROCESSED_ELEMENTS_DIR, 'state', 'overlay_assets')
 
-os.makedirs(IMAGE_OVERLAY_PATH, exist_ok=True)
+
+OVERLAY_POSITIONS = {
+	'top_left': ('10', '10'),
+	'top_right': ('W-w-10', '10'),
+	'bottom_left': ('10', 'H-h-10'),
+	'bottom_right': ('W-w-10', 'H-h-10'),
+	'center': ('(W-w)/2', '(H-h)/2'),
+	'top_center': ('(W-w)/2', '10'),
+	'bottom_center': ('(W-w)/2', 'H-h-10'),
+}
+
+
+def prerender_overlay(overlay_image_path: str, scale: tuple | None, opacity: float | None, output_path: str) -> str:
+	"""
+	Render the overlay image once, scaled and with its opacity applied, as an RGBA PNG.
+
+	Args:
+	    overlay_image_path (str): Path to image file.
+	    scale (tuple | None): (width, height) to resize the image to.
+	    opacity (float | None): Transparency level (0–1). None = keep the image's own alpha.
+	    output_path (str): Where to write the PNG.
+
+	Returns:
+	    str: `output_path`.
+	"""
+	image = ffmpeg.input(overlay_image_path)
+	if scale:
+		image = image.filter('scale', scale[0], scale[1])
+	image = image.filter('format', 'rgba')
+	if opacity is not None:
+		image = image.filter('colorchannelmixer', aa=opacity)
+	run_ffmpeg(image.output(output_path, vframes=1, vcodec='png'))
+	return output_path
+
+
+def apply_image_overlay(
+	video,
+	overlay_image_path: str,
+	positioning: str,
+	scale: tuple | None,
+	opacity: float | None,
+	start_time: float,
+	duration: float | None,
+):
+	"""
+	Draw an image over a video stream of an ffmpeg-python graph.
+
+	The image is read as a single frame, so it is decoded, scaled and faded once; `overlay` keeps
+	drawing that last frame until the video ends.
+
+	Args:
+	    video: The background video stream.
+	    overlay_image_path (str): Path to image file.
+	    positioning (str): Key of `OVERLAY_POSITIONS`.
+	    scale (tuple | None): (width, height) to resize image before placing.
+	    opacity (float | None): Transparency level (0–1). None = no alpha applied.
+	    start_time (float): When to start showing overlay, in seconds of `video`'s timeline.
+	    duration (float | None): How long to show overlay (seconds). None = until end of video.
+
+	Returns:
+	    The overlaid video stream.
+	"""
+	ov_stream = ffmpeg.input(overlay_image_path)
+
+	if scale:
+		ov_stream = ffmpeg.filter(ov_stream, 'scale', scale[0], scale[1])
+
+	if opacity is not None:
+		ov_stream = ov_stream.filter('format', 'rgba').filter('colorchannelmixer', aa=opacity)
+
+	x, y = OVERLAY_POSITIONS[positioning]
+
+	if duration is None:
+		enable_expr = f'gte(t,{start_time})'
+	else:
+		end_time = start_time + duration
+		enable_expr = f'between(t,{start_time},{end_time})'
+
+	return ffmpeg.overlay(
+		video,
+		ov_stream,
+		x=x,
+		y=y,
+		enable=enable_expr,
+		eof_action='repeat',
+	)
+
+
+# Keyed by fingerprint, so an unchanged image is read and hashed only once per process.
+@lru_cache(maxsize=256)
+def _image_digest(fingerprint: tuple) -> str:
+	"""Hash the contents of the image identified by a `file_fingerprint`."""
+	digest = hashlib.sha1()
+	with open(fingerprint[0], 'rb') as f:
+		for block in iter(lambda: f.read(1 << 20), b''):
+			digest.update(block)
+	return digest.hexdigest()
+
+
+def evict_overlay_assets(max_entries: int = settings.OVERLAY_ASSET_CACHE_SIZE):
+	"""Delete the least recently used overlay assets (oldest mtime) beyond `max_entries`."""
+	assets = []
+	with os.scandir(OVERLAY_ASSET_DIR) as entries:
+		for entry in entries:
+			try:
+				assets.append((entry.stat().st_mtime_ns, entry.path))
+			except FileNotFoundError:
+				continue
+	assets.sort(reverse=True)
+	for _, path in assets[max_entries:]:
+		try:
+			os.remove(path)
+		except FileNotFoundError:
+			pass
+
+
+def overlay_asset(overlay_image_path: str, scale: tuple | None, opacity: float | None) -> str:
+	"""
+	Return the pre-rendered overlay (see `prerender_overlay`) for an image, scale and opacity,
+	rendering it on first use.
+
+	Assets are stored under `OVERLAY_ASSET_DIR`, named after a hash of the image contents, the scale
+	and the opacity, so every call and every batch that brands videos with the same logo shares one.
+	Beyond `OVERLAY_ASSET_CACHE_SIZE` assets, the least recently used are deleted.
+
+	Args:
+	    overlay_image_path (str): Path to image file.
+	    scale (tuple | None): (width, height) to resize the image to.
+	    opacity (float | None): Transparency level (0–1). None = keep the image's own alpha.
+
+	Returns:
+	    str: Path of the RGBA PNG.
+	"""
+	scale = tuple(scale) if scale else None
+	key = fingerprint_digest(_image_digest(file_fingerprint(overlay_image_path)), scale, opacity)
+	asset_path = os.path.join(OVERLAY_ASSET_DIR, f'{key}.png')
+	try:
+		# Touching the asset marks it as recently used for `evict_overlay_assets`.
+		os.utime(asset_path)
+		logger.info(f'Reusing overlay asset {asset_path}')
+		return asset_path
+	except FileNotFoundError:
+		pass
+
+	with scratch_workspace('overlay_asset') as workspace:
+		rendered = prerender_overlay(overlay_image_path, scale, opacity, workspace.path('overlay.png'))
+		workspace.publish(rendered, asset_path)
+	evict_overlay_assets()
+	logger.info(f'Rendered overlay asset {asset_path}')
+	return asset_path
+
+
+def render_overlay(
+	input_video_path: str,
+	asset_path: str,
+	output: Path,
+	positioning: str,
+	keep_audio: bool,
+	start_time: float,
+	duration: float | None,
+	encode_target: str | None,
+	window_only: bool,
+) -> str:
+	"""
+	Draw a pre-rendered overlay asset over one video; see `overlay_image` for the parameters.
+
+	Returns:
+	    str: Path to generated video.
+
+	Raises:
+	    ValueError: If the overlay window does not fit the video.
+	    ffmpeg.Error: If ffmpeg fails.
+	"""
+	probe = probe_media(input_video_path)
+	video_duration = float(probe['format']['duration'])
+
+	if start_time < 0.0:
+		logger.error('Start time negative')
+		raise ValueError('Start time must be greater than 0.0 seconds')
+	if duration is not None:
+		if duration <= 0.0:
+			logger.error('Overlay Duration value cannot be 0 or less')
+			raise ValueError('Duration for overlay must be greater than 0 seconds')
+		if start_time + duration > video_duration:
+			logger.error('Overlay duration greater than the video duration')
+			raise ValueError('Duration for overlay cannot be greater than the video duration')
+
+	video_stream = get_video_stream(probe) or {}
+	width, height, frame_rate = video_stream.get('width', 0), video_stream.get('height', 0), stream_frame_rate(video_stream)
+
+	if window_only and can_splice(probe):
+		window_end = video_duration if duration is None else start_time + duration
+		# Keyframe timestamps are absolute, the overlay window is relative to the start of the file.
+		file_start = float(probe['format'].get('start_time') or 0.0)
+		times = [keyframe - file_start for keyframe in keyframe_times(input_video_path)]
+		render_start = keyframe_at_or_before(times, start_time)
+		if not times or render_start <= times[0]:
+			# Within the first GOP, render from 0: there is nothing to copy before the first keyframe.
+			render_start = 0.0
+		render_end = min(keyframe_at_or_after(times, window_end) or video_duration, video_duration)
+		logger.info(f'Re-encoding {render_start:.3f}s → {render_end:.3f}s of {video_duration:.3f}s; copying the rest')
+
+		def draw_overlay(video, segment_start, segment_end):
+			# Segment timestamps start at 0, so the window is shifted by the segment start.
+			return apply_image_overlay(video, asset_path, positioning, None, None, start_time - segment_start, duration)
+
+		render_spliced(
+			input_video_path,
+			probe,
+			[(0.0, render_start, False), (render_start, render_end, True), (render_end, video_duration, False)],
+			str(output),
+			video_transform=draw_overlay,
+			keep_audio=keep_audio,
+			encoder_overrides=preset_options(encode_target, width, height, render_end - render_start, frame_rate),
+		)
+		logger.info(f'Overlay complete: {output}')
+		return str(output)
+
+	if window_only:
+		logger.info(f'{video_stream.get("codec_name")} cannot be spliced; re-encoding the whole video')
+
+	with scratch_workspace('image_overlay') as workspace:
+		bg_stream = ffmpeg.input(input_video_path)
+		video = apply_image_overlay(bg_stream.video, asset_path, positioning, None, None, start_time, duration)
+		presets = preset_options(encode_target, width, height, video_duration, frame_rate)
+
+		scratch_output = workspace.path(output.name)
+		if keep_audio:
+			audio = bg_stream.audio
+			out = ffmpeg.output(video, audio, scratch_output, **presets)
+		else:
+			out = ffmpeg.output(video, scratch_output, **presets)
+
+		run_ffmpeg(out, duration=video_duration)
+		workspace.publish(scratch_output, str(output))
+	logger.info(f'Overlay complete: {output}')
+
+	return str(output)
 
 
 @validate_input_video_path
 def overlay_image(
 	input_video_path: str,
 	overlay_image_path: str,
-	output_filename: str = 'output.mp4',
+	output_filename: str | None = None,
 	positioning: Literal['top_left', 'top_right', 'bottom_left', 'bottom_right', 'center', 'top_center', 'bottom_center'] = 'top_right',
 	scale: tuple | None = (100, 100),
 	keep_audio: bool = True,
 	opacity: float | None = None,
 	start_time: float = 0.0,
 	duration: float | None = None,
+	encode_target: str | None = None,
+	window_only: bool = False,
 ) -> str:
 	"""
 	Overlay an image on top of a video with timing control.
 
+	The image is scaled and faded once into a cached overlay asset (see `overlay_asset`), shared with
+	later calls using the same image, scale and opacity.
+
+	With `window_only`, only the GOPs that cover the overlay window (from the keyframe at or before
+	`start_time` to the keyframe at or after its end) are decoded and re-encoded; the rest of the video
+	is stream-copied and joined around them, so a short overlay on a long video costs about as much as
+	the window itself. This needs an H.264 source; other codecs are re-encoded entirely.
+
 	Args:
 	    input_video_path (str): Path to background video.
 	    overlay_image_path (str): Path to image file.
-	    output_filename (str): Output video filename (saved inside VIDEO_OVERLAY_PATH).
+	    output_filename (str | None): Output video filename (saved inside IMAGE_OVERLAY_PATH). None = unique generated name.
 	    positioning (Literal): Where to place overlay.
 	    scale (tuple | None): (width, height) to resize image before placing.
 	    keep_audio (bool): Whether to keep background audio.
 	    opacity (float | None): Transparency level (0–1). None = no alpha applied.
 	    start_time (float): When to start showing overlay (seconds).
 	    duration (float | None): How long to show overlay (seconds). None = until end of video.
+	    encode_target (str | None): Speed target used to pick the x264 preset on this host: '<N>s' to finish
+	        within N seconds or 'realtime x<K>' to encode at K times playback speed. None = encoder default.
+	        Requires calibrate_encoder to have run on this host.
+	    window_only (bool): Re-encode only the GOPs covering the overlay window and copy the rest. Default: False.
 
 	Returns:
 	    str: Path to generated video.
 	"""
 	input_video = Path(input_video_path)
 	overlay_image = Path(overlay_image_path)
+	output_filename = output_filename or f'{input_video.stem}_image_overlay_{uuid4()}.mp4'
 	output = Path(IMAGE_OVERLAY_PATH) / output_filename
 
 	if not overlay_image.exists():
 		return build_exception_message(error_type=FileNotFoundError, message=f'Overlay image not found at path {overlay_image_path}')
+	if positioning not in OVERLAY_POSITIONS:
+		return build_exception_message(error_type=ValueError, message=f'Invalid positioning : {positioning}')
+	try:
+		check_encode_target(encode_target)
+	except ValueError as e:
+		return build_exception_message(error_type=ValueError, message=str(e))
 
 	logger.info(f'Processing overlay: {input_video} + {overlay_image} -> {output}')
 
-	probe = ffmpeg.probe(str(input_video))
-	video_duration = float(probe['format']['duration'])
+	try:
+		asset_path = overlay_asset(str(overlay_image), scale, opacity)
+		return render_overlay(
+			str(input_video), asset_path, output, positioning, keep_audio, start_time, duration, encode_target, window_only
+		)
+	except ValueError as e:
+		return build_exception_message(error_type=ValueError, message=str(e))
 
-	if start_time < 0.0:
-		logger.error('Start time negative')
-		return build_exception_message(error_type=ValueError, message='Start time must be greater than 0.0 seconds')
-	if duration is not None:
-		if duration <= 0.0:
-			logger.error('Overlay Duration value cannot be 0 or less')
-			return build_exception_message(error_type=ValueError, message='Duration for overlay must be greater than 0 seconds')
-		if start_time + duration > video_duration:
-			logger.error('Overlay duration greater than the video duration')
-			return build_exception_message(
-				error_type=ValueError, message='Duration for overlay cannot be greater than the video duration'
-			)
 
-	bg_stream = ffmpeg.input(str(input_video))
-	ov_stream = ffmpeg.input(str(overlay_image), loop=1)
+def overlay_image_batch(
+	input_video_paths: list[str],
+	overlay_image_path: str,
+	positioning: Literal['top_left', 'top_right', 'bottom_left', 'bottom_right', 'center', 'top_center', 'bottom_center'] = 'top_right',
+	scale: tuple | None = (100, 100),
+	keep_audio: bool = True,
+	opacity: float | None = None,
+	start_time: float = 0.0,
+	duration: float | None = None,
+	encode_target: str | None = None,
+	window_only: bool = False,
+	max_workers: int | None = None,
+) -> str:
+	"""
+	Watermark many videos with the same image, in parallel.
 
-	if scale:
-		ov_stream = ffmpeg.filter(ov_stream, 'scale', scale[0], scale[1])
+	The overlay spec is validated and the overlay asset rendered once for the whole batch (see
+	`overlay_asset`); the videos are then processed by a pool of at most `max_workers` threads, whose
+	ffmpeg processes share the server's CPU budget. A video that fails is reported in its own result
+	and does not stop the others.
 
-	if opacity is not None:
-		ov_stream = ov_stream.filter('format', 'rgba').filter('colorchannelmixer', aa=opacity)
+	Args:
+	    input_video_paths (list[str]): Paths to the background videos.
+	    overlay_image_path (str): Path to image file.
+	    max_workers (int | None): Videos processed at the same time. Defaults to `OVERLAY_BATCH_WORKERS`.
+	    The remaining parameters are those of `overlay_image`, applied to every video.
 
-	positions = {
-		'top_left': ('10', '10'),
-		'top_right': ('W-w-10', '10'),
-		'bottom_left': ('10', 'H-h-10'),
-		'bottom_right': ('W-w-10', 'H-h-10'),
-		'center': ('(W-w)/2', '(H-h)/2'),
-		'top_center': ('(W-w)/2', '10'),
-		'bottom_center': ('(W-w)/2', 'H-h-10'),
-	}
-
-	if positioning not in positions:
+	Returns:
+	    str: JSON with the `overlay_asset`, the `succeeded` and `failed` counts, the total `elapsed_seconds`,
+	    and `results`: for every input, in order, its `input_path`, `status` (OK or ERROR), `elapsed_seconds`,
+	    and either `output_path` or `error_type` and `message`.
+	"""
+	if not input_video_paths:
+		return build_exception_message(error_type=ValueError, message='No input videos given')
+	if not Path(overlay_image_path).exists():
+		return build_exception_message(error_type=FileNotFoundError, message=f'Overlay image not found at path {overlay_image_path}')
+	if positioning not in OVERLAY_POSITIONS:
 		return build_exception_message(error_type=ValueError, message=f'Invalid positioning : {positioning}')
+	try:
+		check_encode_target(encode_target)
+	except ValueError as e:
+		return build_exception_message(error_type=ValueError, message=str(e))
 
-	x, y = positions[positioning]
+	started = time.perf_counter()
+	try:
+		asset_path = overlay_asset(overlay_image_path, scale, opacity)
+	except ffmpeg.Error as e:
+		return build_exception_message(error_type=ValueError, message=f'Could not render overlay image {overlay_image_path}: {e}')
 
-	if duration is None:
-		enable_expr = f'gte(t,{start_time})'
-	else:
-		end_time = start_time + duration
-		enable_expr = f'between(t,{start_time},{end_time})'
-
-	video = ffmpeg.overlay(
-		bg_stream.video,
-		ov_stream,
-		x=x,
-		y=y,
-		enable=enable_expr,
-		shortest=1,
-	)
-
-	if keep_audio:
-		audio = bg_stream.audio
-		out = ffmpeg.output(video, audio, str(output))
-	else:
-		out = ffmpeg.output(video, str(output))
+	def watermark(input_video_path: str) -> dict:
+		item_started = time.perf_counter()
+		result = {'input_path': input_video_path}
+		try:
+			if not os.path.isfile(input_video_path):
+				raise FileNotFoundError(f'File not found: {input_video_path}')
+			output = Path(IMAGE_OVERLAY_PATH) / f'{Path(input_video_path).stem}_image_overlay_{uuid4()}.mp4'
+			output_path = render_overlay(
+				input_video_path, asset_path, output, positioning, keep_audio, start_time, duration, encode_target, window_only
+			)
+			result.update(status='OK', output_path=output_path)
+		except ffmpeg.Error as e:
+			stderr = e.stderr.decode('utf-8', errors='replace').strip().splitlines() if e.stderr else []
+			result.update(status='ERROR', error_type='ffmpeg.Error', message=stderr[-1] if stderr else str(e))
+		except Exception as e:
+			result.update(status='ERROR', error_type=type(e).__name__, message=str(e))
+		if result['status'] == 'ERROR':
+			logger.error(f'Overlay failed for {input_video_path}: {result["message"]}')
+		result['elapsed_seconds'] = round(time.perf_counter() - item_started, 3)
+		return result
 
-	out.run(overwrite_output=True, quiet=True)
-	logger.info(f'Overlay complete: {output}')
+	workers = max(1, min(max_workers or settings.OVERLAY_BATCH_WORKERS, len(input_video_paths)))
+	logger.info(f'Watermarking {len(input_video_paths)} videos with {workers} parallel workers...')
+	with ThreadPoolExecutor(max_workers=workers) as executor:
+		# Each task runs in a copy of the caller's context, so progress and metrics stay attributed to the tool call.
+		futures = [executor.submit(contextvars.copy_context().run, watermark, path) for path in input_video_paths]
+		results = [future.result() for future in futures]
 
-	return str(output)
+	succeeded = sum(result['status'] == 'OK' for result in results)
+	logger.info(f'Batch overlay complete: {succeeded}/{len(results)} succeeded')
+	return json.dumps(
+		{
+			'overlay_asset': asset_path,
+			'succeeded': succeeded,
+			'failed': len(results) - succeeded,
+			'elapsed_seconds': round(time.perf_counter() - started, 3),
+			'results': results,
+		},
+		indent=2,
+	)
 
 
 # if __name__ == "__main__":
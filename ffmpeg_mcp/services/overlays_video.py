@@ -2,29 +2,32 @@ import logging
 import os
 from pathlib import Path
 from typing import Literal
+from uuid import uuid4
 
 import ffmpeg
 
+from ffmpeg_mcp.configs import settings
 from ffmpeg_mcp.configs.logging_config import setup_logging
-from utils import validate_input_video_path
+from ffmpeg_mcp.exceptions import build_exception_message
+from utils import get_video_stream, probe_media, scratch_workspace, stream_frame_rate, validate_input_video_path
+from utils.encode_profiles import check_encode_target, preset_options
+from utils.ffmpeg_runner import run_ffmpeg
 
 setup_logging()
 logger = logging.getLogger(__name__)
 
-CURR_PATH = os.path.dirname(os.path.abspath(__file__))
-VIDEO_OVERLAY_PATH = os.path.join(CURR_PATH, '..', 'processed_elements', 'video_overlays')
-
-os.makedirs(VIDEO_OVERLAY_PATH, exist_ok=True)
+VIDEO_OVERLAY_PATH = os.path.join(settings.PROCESSED_ELEMENTS_DIR, 'video_overlays')
 
 
 @validate_input_video_path
 def overlays_video(
 	input_video_path: str,
 	overlay_video_path: str,
-	output_filename: str = 'output.mp4',
+	output_filename: str | None = None,
 	positioning: Literal['top_left', 'bottom_left', 'top_right', 'bottom_right'] = 'bottom_right',
 	scale: tuple = (200, 300),
 	keep_audio: bool = True,
+	encode_target: str | None = None,
 ) -> str:
 	"""
 	Overlay a video on top of another with simple positioning.
@@ -33,10 +36,13 @@ def overlays_video(
 	Args:
 	    input_video_path (str): Path to background video.
 	    overlay_video_path (str): Path to overlay video.
-	    output_filename (str): Name of the output video file (saved inside VIDEO_OVERLAY_PATH).
+	    output_filename (str | None): Name of the output video file (saved inside VIDEO_OVERLAY_PATH). None = unique generated name.
 	    positioning (Literal): Where to place overlay.
 	    scale (tuple): (width, height) to resize overlay video before placing.
 	    keep_audio (bool): Whether to keep background audio.
+	    encode_target (str | None): Speed target used to pick the x264 preset on this host: '<N>s' to finish
+	        within N seconds or 'realtime x<K>' to encode at K times playback speed. None = encoder default.
+	        Requires calibrate_encoder to have run on this host.
 
 	Returns:
 	    str: Path to the generated video.
@@ -44,17 +50,23 @@ def overlays_video(
 
 	input_video = Path(input_video_path)
 	overlay_video = Path(overlay_video_path)
+	output_filename = output_filename or f'{input_video.stem}_video_overlay_{uuid4()}.mp4'
 	output = Path(VIDEO_OVERLAY_PATH) / output_filename
 
 	if not input_video.exists():
 		raise FileNotFoundError(f'Background video not found: {input_video}')
 	if not overlay_video.exists():
 		raise FileNotFoundError(f'Overlay video not found: {overlay_video}')
+	try:
+		check_encode_target(encode_target)
+	except ValueError as e:
+		return build_exception_message(error_type=ValueError, message=str(e))
 
 	logger.info(f'Processing overlay: {input_video} + {overlay_video} -> {output}')
 
-	bg_duration = float(ffmpeg.probe(str(input_video))['format']['duration'])
-	ov_duration = float(ffmpeg.probe(str(overlay_video))['format']['duration'])
+	bg_metadata = probe_media(str(input_video))
+	bg_duration = float(bg_metadata['format']['duration'])
+	ov_duration = float(probe_media(str(overlay_video))['format']['duration'])
 
 	loop_count = int(bg_duration // ov_duration)
 	if bg_duration % ov_duration != 0:
@@ -82,13 +94,19 @@ def overlays_video(
 
 	video = ffmpeg.overlay(bg_stream.video, ov_stream, x=x, y=y)
 
-	if keep_audio:
-		audio = bg_stream.audio
-		out = ffmpeg.output(video, audio, str(output))
-	else:
-		out = ffmpeg.output(video, str(output))
+	bg_video = get_video_stream(bg_metadata) or {}
+	presets = preset_options(encode_target, bg_video.get('width', 0), bg_video.get('height', 0), bg_duration, stream_frame_rate(bg_video))
+
+	with scratch_workspace('video_overlay') as workspace:
+		scratch_output = workspace.path(output.name)
+		if keep_audio:
+			audio = bg_stream.audio
+			out = ffmpeg.output(video, audio, scratch_output, **presets)
+		else:
+			out = ffmpeg.output(video, scratch_output, **presets)
 
-	out.run(overwrite_output=True, quiet=True)
+		run_ffmpeg(out, duration=bg_duration)
+		workspace.publish(scratch_output, str(output))
 	logger.info(f'Overlay complete: {output}')
 
 	return str(output)
@@ -1,22 +1,38 @@
 import logging
 import os
+from uuid import uuid4
 
 import ffmpeg
 
+from ffmpeg_mcp.configs import settings
 from ffmpeg_mcp.configs.logging_config import setup_logging
 from ffmpeg_mcp.exceptions import build_exception_message
-from utils import validate_input_video_path
+from utils import get_video_stream, memoize_result, probe_media, scratch_workspace, stream_frame_rate, validate_input_video_path
+from utils.chunked_encode import encode_chunked
+from utils.encode_profiles import check_encode_target, preset_options
+from utils.ffmpeg_runner import run_ffmpeg
+from utils.filter_graph import plan_video_filters, video_filter_string
 
 setup_logging()
 logger = logging.getLogger(__name__)
 
-base_dir = os.path.dirname(os.path.abspath(__file__))
-output_video_path = os.path.join(base_dir, '..', 'processed_elements', 'upscaled_video', 'final_edited_video.mp4')
-os.makedirs(os.path.dirname(output_video_path), exist_ok=True)
+upscaled_video_path = os.path.join(settings.PROCESSED_ELEMENTS_DIR, 'upscaled_video')
+
+RESOLUTIONS = {'1080p': (1920, 1080), '2k': (2560, 1440), '4k': (3840, 2160)}
+
+# Faster sources are converted down to this rate; slower ones keep theirs unless up-conversion is asked for.
+OUTPUT_FRAME_RATE = 60
 
 
 @validate_input_video_path
-def scale_video(input_video_path: str, resolution: str = '1080p') -> str:
+@memoize_result
+def scale_video(
+	input_video_path: str,
+	resolution: str = '1080p',
+	chunked: bool = False,
+	encode_target: str | None = None,
+	allow_frame_rate_upconversion: bool = False,
+) -> str:
 	"""
 	Upscales a video to 1080p, 2K, or 4K using FFmpeg while preserving aspect ratio and color accuracy.
 
@@ -24,36 +40,59 @@ def scale_video(input_video_path: str, resolution: str = '1080p') -> str:
 		input_video_path (str): Path to the input video file.
 		resolution (str, optional): Target resolution for upscaling.
 			Acceptable values are '1080p', '2k', or '4k'. Defaults to '1080p'.
+		chunked (bool, optional): Split the video at keyframes and encode the chunks in parallel
+			processes, which keeps many cores busy on long videos. Defaults to False.
+		encode_target (str | None, optional): Speed target used to pick the x264 preset on this host:
+			'<N>s' to finish within N seconds or 'realtime x<K>' to encode at K times playback speed.
+			Defaults to None (preset 'fast'). Requires calibrate_encoder to have run on this host.
+		allow_frame_rate_upconversion (bool, optional): Convert sources slower than 60 fps up to 60 fps
+			(duplicating frames). Defaults to False: they keep their own frame rate.
 
 	Returns:
 		str: Path to the upscaled video if successful.
 	"""
-	resoultions = {'1080p': (1920, 1080), '2k': (2560, 1440), '4k': (3840, 2160)}
-	target = resoultions.get(resolution)
+	target = RESOLUTIONS.get(resolution)
 	if not target:
 		logger.error('Invalid resolution, unable to use it')
-		raise ValueError(f'Invalid resolution {resoultions}')
+		raise ValueError(f'Invalid resolution {RESOLUTIONS}')
+	try:
+		check_encode_target(encode_target)
+	except ValueError as e:
+		return build_exception_message(error_type=ValueError, message=str(e))
 
 	w, h = target
+	output_video_path = os.path.join(
+		upscaled_video_path, f'{os.path.splitext(os.path.basename(input_video_path))[0]}_{resolution}_{uuid4()}.mp4'
+	)
 	try:
-		(
-			ffmpeg.input(input_video_path)
-			.output(
-				output_video_path,
-				vcodec='h264',
-				acodec='aac',
-				vf=(f'scale={w}:{h}:force_original_aspect_ratio=decrease,pad={w}:{h}:(ow-iw)/2:(oh-ih)/2'),
-				r=60,
-				audio_bitrate='128k',
-				crf=23,
-				preset='fast',
-				color_primaries='bt709',
-				colorspace='bt709',
-				color_trc='bt709',
+		with scratch_workspace('scale') as workspace:
+			scratch_output = workspace.path('scaled.mp4')
+			metadata = probe_media(input_video_path)
+			duration = float(metadata['format']['duration'])
+			video_stream = get_video_stream(metadata) or {}
+			stages = plan_video_filters(
+				video_stream, w, h, frame_rate=OUTPUT_FRAME_RATE, allow_upconversion=allow_frame_rate_upconversion
 			)
-			.overwrite_output()
-			.run(quiet=True)
-		)
+			frame_rate = OUTPUT_FRAME_RATE if any(name == 'fps' for name, _, _ in stages) else stream_frame_rate(video_stream)
+			vf = video_filter_string(stages)
+			video_options = {
+				'vcodec': 'h264',
+				**({'vf': vf} if vf else {}),
+				'crf': 23,
+				**preset_options(encode_target, w, h, duration, frame_rate, default='fast'),
+				'color_primaries': 'bt709',
+				'colorspace': 'bt709',
+				'color_trc': 'bt709',
+			}
+			audio_options = {'acodec': 'aac', 'audio_bitrate': '128k'}
+			if chunked:
+				encode_chunked(input_video_path, scratch_output, video_options, audio_options)
+			else:
+				run_ffmpeg(
+					ffmpeg.input(input_video_path).output(scratch_output, **video_options, **audio_options),
+					duration=duration,
+				)
+			workspace.publish(scratch_output, output_video_path)
 		logger.info(f'{resolution} video saved at: {output_video_path}')
 		return output_video_path
 
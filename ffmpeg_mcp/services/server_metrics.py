@@ -0,0 +1,40 @@
+import json
+import logging
+from typing import Literal
+
+from ffmpeg_mcp.configs import setup_logging
+from utils import probe_cache, result_cache
+from utils.cpu_scheduler import cpu_scheduler
+from utils.keyframes import keyframe_cache
+from utils.metrics import metrics
+
+setup_logging()
+logger = logging.getLogger(__name__)
+
+
+def get_server_metrics(format: Literal['json', 'prometheus'] = 'json') -> str:
+	"""
+	Report where the server's time goes: per-tool and per-ffmpeg/ffprobe-process metrics.
+
+	Per tool: call count, error count and a latency histogram. Per child process, aggregated by
+	program and tool: user and system CPU time, peak RSS, bytes read and written, and the final
+	encode speed; the most recent processes are also listed individually. The CPU scheduler and
+	cache statistics are included in the JSON format.
+
+	Params:
+	    format (Literal['json', 'prometheus']): `json` (default) or the Prometheus text exposition format.
+
+	Returns:
+	    str: The metrics in the requested format.
+	"""
+	if format == 'prometheus':
+		return metrics.prometheus_text()
+
+	return json.dumps(
+		{
+			**metrics.snapshot(),
+			'scheduler': cpu_scheduler.stats(),
+			'caches': {'probe': probe_cache.stats(), 'keyframes': keyframe_cache.stats(), 'results': result_cache.stats()},
+		},
+		indent=2,
+	)
@@ -7,15 +7,27 @@ from uuid import uuid4
 
 import ffmpeg
 
+from ffmpeg_mcp.configs import settings
 from ffmpeg_mcp.configs.logging_config import setup_logging
 from ffmpeg_mcp.exceptions import build_exception_message
+from utils import (
+	get_video_stream,
+	keyframe_at_or_before,
+	keyframe_times,
+	media_duration,
+	probe_media,
+	scratch_workspace,
+	stream_copy_signature,
+	stream_frame_rate,
+)
+from utils.encode_profiles import check_encode_target, preset_options
+from utils.ffmpeg_runner import run_ffmpeg
+from utils.filter_graph import apply_video_filters, plan_video_filters
 
 setup_logging()
 logger = logging.getLogger(__name__)
 
-CURR_PATH = os.path.dirname(os.path.abspath(__file__))
-PROCESSED_VIDEO_PATH = os.path.join(CURR_PATH, '..', 'processed_elements', 'trim_and_concat')
-os.makedirs(PROCESSED_VIDEO_PATH, exist_ok=True)
+PROCESSED_VIDEO_PATH = os.path.join(settings.PROCESSED_ELEMENTS_DIR, 'trim_and_concat')
 
 DEFAULT_WIDTH = 720
 DEFAULT_HEIGHT = 1280
@@ -51,6 +63,62 @@ def validate_input_video_path(func):
 	return wrapper
 
 
+def can_stream_copy(inputs: List[Dict[str, str]], width: int, height: int) -> bool:
+	"""
+	Check from probe data whether the inputs can be joined without re-encoding: every input must share
+	the same stream-copy signature (codecs, geometry, pixel format, time base, frame rate, audio layout)
+	and already be `width`x`height` yuv420p, i.e. exactly what the re-encode path would produce.
+	"""
+	try:
+		metadata = [probe_media(item['path']) for item in inputs]
+	except Exception as e:
+		logger.info(f'Stream-copy check skipped: {str(e)}')
+		return False
+
+	signatures = {stream_copy_signature(item) for item in metadata}
+	if len(signatures) != 1 or None in signatures:
+		return False
+
+	video = get_video_stream(metadata[0])
+	return (video.get('width'), video.get('height'), video.get('pix_fmt')) == (width, height, 'yuv420p')
+
+
+def stream_copy_trim_and_concat(inputs: List[Dict[str, str]], output_path: str):
+	"""
+	Trim and join compatible inputs in one stream-copy pass through the concat demuxer.
+
+	Each segment start is snapped back to the keyframe at or before the requested `start_time`,
+	since a stream copy can only begin on a keyframe; the end is cut at `end_time`.
+	"""
+	lines = []
+	total_duration = 0.0
+	for item in inputs:
+		video_path = os.path.abspath(item['path'])
+		start = item.get('start_time')
+		end = item.get('end_time')
+		escaped_path = video_path.replace("'", "'\\''")
+		lines.append(f"file '{escaped_path}'")
+
+		if start is not None and end is not None:
+			inpoint = keyframe_at_or_before(keyframe_times(video_path), float(start))
+			if inpoint != float(start):
+				logger.info(f'Snapped start of {video_path} from {start}s to keyframe at {inpoint}s')
+			lines.extend([f'inpoint {inpoint}', f'outpoint {float(end)}'])
+			total_duration += float(end) - inpoint
+		else:
+			total_duration += media_duration(probe_media(video_path))
+
+	with scratch_workspace('trim_and_concat') as workspace:
+		list_path = workspace.path('segments.txt')
+		with open(list_path, 'w', encoding='utf-8') as f:
+			f.write('\n'.join(lines) + '\n')
+
+		run_ffmpeg(
+			ffmpeg.input(list_path, f='concat', safe=0).output(output_path, c='copy', movflags='+faststart'),
+			duration=total_duration,
+		)
+
+
 @validate_input_video_path
 def trim_and_concat_operation(
 	inputs: List[Dict[str, str]],
@@ -58,6 +126,8 @@ def trim_and_concat_operation(
 	height: int = DEFAULT_HEIGHT,
 	x: int = DEFAULT_X,
 	y: int = DEFAULT_Y,
+	allow_stream_copy: bool = False,
+	encode_target: Optional[str] = None,
 ) -> Optional[str]:
 	"""
 	Trim and concatenate multiple videos (portrait orientation, normalize format).
@@ -71,6 +141,13 @@ def trim_and_concat_operation(
 	    height (int): Height to scale each video (portrait).
 	    x (int): X position for overlay (default 0).
 	    y (int): Y position for overlay (default 0).
+	    allow_stream_copy (bool): When every input already matches the output format (same codecs,
+	        `width`x`height`, yuv420p, time base), join them by stream copy instead of re-encoding.
+	        Segment starts then snap to the preceding keyframe, so cuts are only exact when they already
+	        fall on keyframes. Defaults to False (exact cuts, always re-encoded).
+	    encode_target (str, optional): Speed target used to pick the x264 preset of the re-encode on this host:
+	        '<N>s' to finish within N seconds or 'realtime x<K>' to encode at K times playback speed.
+	        Requires calibrate_encoder to have run on this host.
 
 	Returns:
 	    str: Path to the output video if successful.
@@ -78,13 +155,28 @@ def trim_and_concat_operation(
 	"""
 	v_streams = []
 	a_streams = []
+	total_duration = 0.0
 
 	if not inputs:
 		logger.error('No input videos provided')
 		raise ValueError('Provide at least one input video')
+	try:
+		check_encode_target(encode_target)
+	except ValueError as e:
+		return build_exception_message(error_type=ValueError, message=str(e))
 
 	output_file_name = f'final_edited_video_{uuid4()}.mp4'
 	output_path = Path(PROCESSED_VIDEO_PATH) / output_file_name
+	os.makedirs(PROCESSED_VIDEO_PATH, exist_ok=True)
+
+	if allow_stream_copy and can_stream_copy(inputs, width, height):
+		try:
+			logger.info('Inputs are stream-copy compatible, joining without re-encoding...')
+			stream_copy_trim_and_concat(inputs, str(output_path))
+			logger.info(f'Final concatenated video saved at: {output_path.resolve()}')
+			return str(output_path.resolve())
+		except ffmpeg._run.Error as e:
+			logger.warning(f'Stream-copy concat failed, falling back to re-encode: {e.stderr.decode("utf-8", errors="replace")[-500:]}')
 
 	try:
 		for idx, item in enumerate(inputs):
@@ -97,16 +189,18 @@ def trim_and_concat_operation(
 
 			if start is not None and end is not None:
 				inp = ffmpeg.input(video_path, ss=start, to=end)
+				total_duration += float(end) - float(start)
 				logger.info(f'Prepared segment {idx + 1}: {video_path} ({start}s → {end}s)')
 			else:
 				inp = ffmpeg.input(video_path)
+				total_duration += float(probe_media(video_path)['format']['duration'])
 				logger.info(f'Prepared full video {idx + 1}: {video_path}')
 
-			v = (
-				inp.video.filter('scale', width, height, force_original_aspect_ratio='decrease')
-				.filter('pad', width, height, x, y)
-				.filter('format', 'yuv420p')
+			# Inputs already at the output size and pixel format go to the concat filter untouched.
+			stages = plan_video_filters(
+				get_video_stream(probe_media(video_path)) or {}, width, height, pix_fmt='yuv420p', pad_x=x, pad_y=y
 			)
+			v = apply_video_filters(inp.video, stages)
 
 			v_streams.append(v)
 			a_streams.append(inp.audio)
@@ -119,7 +213,10 @@ def trim_and_concat_operation(
 		a = joined[1]
 
 		logger.info('Saving final concatenated video...')
-		(ffmpeg.output(v, a, str(output_path), vcodec='libx264', acodec='aac').overwrite_output().run(quiet=True))
+		# The concat filter outputs the frame rate of the first segment.
+		frame_rate = stream_frame_rate(get_video_stream(probe_media(inputs[0]['path'])))
+		presets = preset_options(encode_target, width, height, total_duration, frame_rate)
+		run_ffmpeg(ffmpeg.output(v, a, str(output_path), vcodec='libx264', acodec='aac', **presets), duration=total_duration)
 
 		logger.info(f'Final concatenated video saved at: {output_path.resolve()}')
 		return str(output_path.resolve())
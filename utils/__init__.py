@@ -1,4 +1,39 @@
+from utils.async_tool import async_tool
 from utils.calculate_video_offset import calculate_video_offset
+from utils.file_fingerprint import file_fingerprint, fingerprint_digest
+from utils.keyframes import keyframe_at_or_after, keyframe_at_or_before, keyframe_times
+from utils.media_info import (
+	get_audio_streams,
+	get_video_stream,
+	media_duration,
+	parse_frame_rate,
+	stream_copy_signature,
+	stream_frame_rate,
+)
+from utils.probe_cache import probe_cache, probe_media
+from utils.result_cache import memoize_result, result_cache
 from utils.validate_input_video_path import validate_input_video_path
+from utils.workspace import publish_file, scratch_workspace
 
-__all__ = ['validate_input_video_path', 'calculate_video_offset']
+__all__ = [
+	'async_tool',
+	'validate_input_video_path',
+	'calculate_video_offset',
+	'file_fingerprint',
+	'fingerprint_digest',
+	'probe_cache',
+	'probe_media',
+	'publish_file',
+	'memoize_result',
+	'result_cache',
+	'scratch_workspace',
+	'keyframe_times',
+	'keyframe_at_or_before',
+	'keyframe_at_or_after',
+	'get_video_stream',
+	'get_audio_streams',
+	'media_duration',
+	'parse_frame_rate',
+	'stream_copy_signature',
+	'stream_frame_rate',
+]
@@ -0,0 +1,93 @@
+import asyncio
+import contextvars
+import functools
+import inspect
+import json
+import logging
+import typing
+from concurrent.futures import ThreadPoolExecutor
+
+from fastmcp.server.dependencies import get_context
+
+from ffmpeg_mcp.configs import settings, setup_logging
+from utils.ffmpeg_runner import ProgressTracker, current_progress
+from utils.job_manager import job_manager
+from utils.metrics import instrument_tool
+
+setup_logging()
+logger = logging.getLogger(__name__)
+
+# Shared, bounded pool: its size is the global limit on tool calls doing ffmpeg work at once.
+tool_executor = ThreadPoolExecutor(max_workers=settings.MAX_CONCURRENT_TOOLS, thread_name_prefix='ffmpeg-mcp-tool')
+
+
+def _progress_notifier(loop: asyncio.AbstractEventLoop):
+	"""
+	Build a tracker sink that forwards progress to the client as MCP progress notifications.
+	Notifications are only sent when the percentage increases, as the protocol requires.
+	"""
+	try:
+		ctx = get_context()
+	except RuntimeError:
+		return None
+
+	last_sent = [-1.0]
+
+	def notify(summary: dict):
+		percent = summary['percent']
+		if percent is None or percent <= last_sent[0]:
+			return
+		last_sent[0] = percent
+		message = f'{summary["fps"] or 0:.1f} fps, {summary["speed"] or 0:.2f}x'
+		asyncio.run_coroutine_threadsafe(ctx.report_progress(progress=percent, total=100, message=message), loop)
+
+	return notify
+
+
+def async_tool(func, allow_background: bool = False):
+	"""
+	Turn a blocking service function into an async tool.
+
+	The wrapped call runs on the shared bounded executor so the server's event loop stays free
+	while ffmpeg works, and independent tool calls run concurrently up to `MAX_CONCURRENT_TOOLS`.
+	The caller's context variables are carried over to the worker thread, and ffmpeg progress is
+	forwarded as MCP progress notifications. Every call is timed and counted in the server metrics.
+
+	Args:
+	    func: The service function to expose.
+	    allow_background (bool): Add a `run_in_background` parameter to the tool. When set by the
+	        client, the call returns a job id immediately; see `get_job_status` / `get_job_result`.
+	        The tool's return annotation is widened to include `str` for that acknowledgement.
+	"""
+
+	instrumented = instrument_tool(func)
+
+	@functools.wraps(func)
+	async def wrapper(*args, run_in_background: bool = False, **kwargs):
+		if run_in_background:
+			job = job_manager.submit(tool_executor, instrumented, *args, **kwargs)
+			return json.dumps({'status': 'ACCEPTED', 'job_id': job.job_id, 'tool': job.tool_name}, indent=2)
+
+		loop = asyncio.get_running_loop()
+		context = contextvars.copy_context()
+		context.run(current_progress.set, ProgressTracker(sink=_progress_notifier(loop)))
+		return await loop.run_in_executor(tool_executor, functools.partial(context.run, instrumented, *args, **kwargs))
+
+	if allow_background:
+		signature = inspect.signature(func)
+		background_param = inspect.Parameter('run_in_background', inspect.Parameter.KEYWORD_ONLY, default=False, annotation=bool)
+		# A background call returns the accepted job as a JSON string, whatever the service returns, so the
+		# tool's output schema must accept a string too.
+		return_annotation = signature.return_annotation
+		if return_annotation is not inspect.Signature.empty:
+			return_annotation = typing.Union[return_annotation, str]
+		wrapper.__signature__ = signature.replace(
+			parameters=[*signature.parameters.values(), background_param], return_annotation=return_annotation
+		)
+		wrapper.__annotations__ = {**func.__annotations__, 'run_in_background': bool}
+		if return_annotation is not inspect.Signature.empty:
+			wrapper.__annotations__['return'] = return_annotation
+	else:
+		wrapper.__signature__ = inspect.signature(func)
+
+	return wrapper
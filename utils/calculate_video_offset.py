@@ -1,9 +1,8 @@
-import json
 import logging
 
 from ffmpeg_mcp.configs import setup_logging
 from ffmpeg_mcp.exceptions import build_exception_message
-from ffmpeg_mcp.services.get_video_metadata import get_video_metadata
+from utils.probe_cache import probe_media
 
 setup_logging()
 logger = logging.getLogger(__name__)
@@ -18,9 +17,8 @@ def calculate_video_offset(input_video_path: str, transition_duration: float):
 	Returns:
 	    float: offset duration of the video in Seconds(including milliseconds)
 	"""
-	metadata = get_video_metadata(input_video_path=input_video_path)
-	video_duration = json.loads(metadata)['format']['duration']
 	try:
+		video_duration = probe_media(input_video_path)['format']['duration']
 		offset_duration = max(float(video_duration) - transition_duration, 0)
 		return offset_duration
 	except Exception as e:
@@ -0,0 +1,130 @@
+import contextvars
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import ffmpeg
+
+from ffmpeg_mcp.configs import settings, setup_logging
+from utils.ffmpeg_runner import run_ffmpeg
+from utils.keyframes import keyframe_at_or_before, keyframe_times
+from utils.media_info import get_audio_streams, media_duration
+from utils.probe_cache import probe_media
+from utils.workspace import scratch_workspace
+
+setup_logging()
+logger = logging.getLogger(__name__)
+
+
+def plan_chunks(keyframes: list[float], duration: float, segments: int, min_seconds: float) -> list[tuple[float, float | None]]:
+	"""
+	Split a video into up to `segments` chunks of similar length, each starting on a keyframe.
+
+	Every boundary is the keyframe at or before an even split point, and no chunk is shorter than
+	`min_seconds`, so a file with few keyframes or a short file gets fewer (or one) chunks.
+
+	Returns:
+	    list[tuple[float, float | None]]: (start, end) of every chunk in seconds, relative to the
+	    start of the file; the last chunk's end is None (until the end of the file).
+	"""
+	boundaries = [0.0]
+	for index in range(1, segments):
+		boundary = keyframe_at_or_before(keyframes, index * duration / segments)
+		if boundary - boundaries[-1] >= min_seconds and duration - boundary >= min_seconds:
+			boundaries.append(boundary)
+	return list(zip(boundaries, [*boundaries[1:], None]))
+
+
+def _concat_list(paths: list[str]) -> str:
+	"""Build a concat demuxer script listing `paths` in order."""
+	return ''.join("file '{}'\n".format(path.replace("'", "'\\''")) for path in paths)
+
+
+def encode_chunked(
+	input_path: str,
+	output_path: str,
+	video_options: dict,
+	audio_options: dict | None = None,
+	output_options: dict | None = None,
+	segments: int | None = None,
+) -> str:
+	"""
+	Re-encode a video as several chunks encoded in parallel, then stitch them with a stream copy.
+
+	The source is split at keyframes (see `plan_chunks`); every chunk is encoded by its own ffmpeg
+	process with the same `video_options`, with the CPU budget divided between them, while the
+	first audio stream is encoded once, alongside, by another process. The chunks and the audio are
+	then concatenated into `output_path` without re-encoding. When the source is too short to split,
+	it is encoded in a single process instead.
+
+	Args:
+	    input_path (str): Path to the source video.
+	    output_path (str): Path of the encoded file.
+	    video_options (dict): ffmpeg-python output options of the video encode (codec, `vf`, `r`, ...).
+	    audio_options (dict | None): Output options of the audio encode; audio is dropped when None.
+	    output_options (dict | None): Container options of the final file (e.g. `movflags`, `format`).
+	    segments (int | None): Maximum number of chunks. Defaults to `CHUNKED_ENCODE_SEGMENTS`.
+
+	Returns:
+	    str: `output_path`.
+
+	Raises:
+	    ffmpeg.Error: If any of the ffmpeg processes fails.
+	"""
+	metadata = probe_media(input_path)
+	duration = media_duration(metadata)
+	has_audio = audio_options is not None and bool(get_audio_streams(metadata))
+	output_options = output_options or {}
+
+	# Keyframe timestamps are absolute, input seeking is relative to the start of the file.
+	start_time = float(metadata.get('format', {}).get('start_time') or 0.0)
+	keyframes = [time - start_time for time in keyframe_times(input_path)]
+	chunks = plan_chunks(keyframes, duration, segments or settings.CHUNKED_ENCODE_SEGMENTS, settings.CHUNKED_ENCODE_MIN_SECONDS)
+
+	if len(chunks) < 2:
+		logger.info(f'{input_path} is too short to split; encoding it in one process')
+		source = ffmpeg.input(input_path)
+		streams = [source['v:0'], source['a:0']] if has_audio else [source['v:0']]
+		run_ffmpeg(
+			ffmpeg.output(*streams, output_path, **video_options, **(audio_options if has_audio else {}), **output_options),
+			duration=duration,
+		)
+		return output_path
+
+	threads = max(1, settings.CPU_BUDGET // len(chunks))
+	logger.info(f'Encoding {input_path} as {len(chunks)} chunks with {threads} thread(s) each')
+
+	with scratch_workspace('chunks') as workspace:
+		chunk_paths = [workspace.path(f'chunk_{index:04d}.mp4') for index in range(len(chunks))]
+		audio_path = workspace.path('audio.m4a')
+
+		def encode_chunk(start, end, chunk_path):
+			source = ffmpeg.input(input_path, ss=start, t=end - start) if end is not None else ffmpeg.input(input_path, ss=start)
+			run_ffmpeg(
+				source['v:0'].output(chunk_path, **video_options, format='mp4'),
+				duration=(end if end is not None else duration) - start,
+				threads=threads,
+			)
+
+		def encode_audio():
+			run_ffmpeg(ffmpeg.input(input_path)['a:0'].output(audio_path, **audio_options, format='mp4'), duration=duration, threads=1)
+
+		# Each task runs in a copy of the caller's context, so progress and metrics stay attributed to the tool call.
+		with ThreadPoolExecutor(max_workers=len(chunks) + 1) as executor:
+			futures = [
+				executor.submit(contextvars.copy_context().run, encode_chunk, start, end, chunk_path)
+				for (start, end), chunk_path in zip(chunks, chunk_paths)
+			]
+			if has_audio:
+				futures.append(executor.submit(contextvars.copy_context().run, encode_audio))
+			for future in futures:
+				future.result()
+
+		list_path = workspace.path('chunks.txt')
+		with open(list_path, 'w', encoding='utf-8') as f:
+			f.write(_concat_list(chunk_paths))
+
+		video = ffmpeg.input(list_path, f='concat', safe=0)
+		streams = [video['v:0'], ffmpeg.input(audio_path)['a:0']] if has_audio else [video['v:0']]
+		run_ffmpeg(ffmpeg.output(*streams, output_path, c='copy', **output_options), duration=duration)
+
+	return output_path
@@ -0,0 +1,88 @@
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+from itertools import count
+
+from ffmpeg_mcp.configs import settings, setup_logging
+
+setup_logging()
+logger = logging.getLogger(__name__)
+
+
+class CpuScheduler:
+	"""
+	Process-wide budget of CPU cores shared by every ffmpeg process the server starts.
+
+	Each process is granted a number of threads before it starts (passed to ffmpeg as `-threads`
+	and `-filter_threads`) and returns them when it exits, so the sum of encoder threads never
+	exceeds the budget no matter how many tools, workers or clips run at once. Requests that do
+	not fit wait in FIFO order.
+	"""
+
+	def __init__(self, cpu_budget: int, threads_per_job: int):
+		self.cpu_budget = max(1, cpu_budget)
+		self.threads_per_job = max(1, min(threads_per_job, self.cpu_budget))
+		self.in_use = 0
+		self.running = 0
+		self.completed = 0
+		self._queue = deque()
+		self._tickets = count()
+		self._condition = threading.Condition()
+
+	@contextmanager
+	def allocate(self, threads: int | None = None, exclusive: bool = False):
+		"""
+		Reserve cores for one ffmpeg process, waiting while the budget is exhausted.
+
+		A job at the head of the queue is started as soon as at least one core is free, with
+		`min(threads, free cores)` threads, so the budget stays fully used under mixed load.
+
+		Args:
+		    threads (int | None): Threads wanted; defaults to `threads_per_job`.
+		    exclusive (bool): Wait until no other process runs and hold the whole budget, while
+		        still granting only `threads` (e.g. for benchmarks that must not share the machine).
+
+		Yields:
+		    int: The number of threads granted.
+		"""
+		wanted = max(1, min(threads or self.threads_per_job, self.cpu_budget))
+		ticket = next(self._tickets)
+
+		with self._condition:
+			self._queue.append(ticket)
+			limit = 1 if exclusive else self.cpu_budget
+			if self._queue[0] != ticket or self.in_use >= limit:
+				logger.info(f'Waiting for CPU budget ({len(self._queue) - 1} ahead, {self.in_use}/{self.cpu_budget} cores in use)')
+			self._condition.wait_for(lambda: self._queue[0] == ticket and self.in_use < limit)
+			self._queue.popleft()
+			granted = wanted if exclusive else min(wanted, self.cpu_budget - self.in_use)
+			reserved = self.cpu_budget if exclusive else granted
+			self.in_use += reserved
+			self.running += 1
+			self._condition.notify_all()
+
+		try:
+			yield granted
+		finally:
+			with self._condition:
+				self.in_use -= reserved
+				self.running -= 1
+				self.completed += 1
+				self._condition.notify_all()
+
+	def stats(self) -> dict:
+		"""Return the budget, its current utilization and the number of queued processes."""
+		with self._condition:
+			return {
+				'cpu_budget': self.cpu_budget,
+				'threads_per_job': self.threads_per_job,
+				'cores_in_use': self.in_use,
+				'utilization': round(self.in_use / self.cpu_budget, 3),
+				'running_processes': self.running,
+				'queue_depth': len(self._queue),
+				'completed_processes': self.completed,
+			}
+
+
+cpu_scheduler = CpuScheduler(cpu_budget=settings.CPU_BUDGET, threads_per_job=settings.THREADS_PER_JOB)
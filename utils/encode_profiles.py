@@ -0,0 +1,255 @@
+import functools
+import json
+import logging
+import math
+import os
+import platform
+import re
+import subprocess
+import threading
+import time
+
+import ffmpeg
+
+from ffmpeg_mcp.configs import settings, setup_logging
+from utils.ffmpeg_runner import run_ffmpeg
+
+setup_logging()
+logger = logging.getLogger(__name__)
+
+# libx264 presets, fastest first.
+PRESETS = ('ultrafast', 'superfast', 'veryfast', 'faster', 'fast', 'medium', 'slow', 'slower', 'veryslow')
+
+# Resolutions the calibration clip is encoded at; other sizes are estimated by pixel count.
+CALIBRATION_RESOLUTIONS = ((640, 360), (1280, 720), (1920, 1080))
+CALIBRATION_FRAME_RATE = 30
+CALIBRATION_CRF = 23
+
+# Below this encode speed, slower presets at the same resolution are not measured (they only get slower).
+MIN_CALIBRATED_FPS = 1.0
+
+# Calibration times the encoder alone; decoding and filtering in real jobs cost extra, so estimates
+# must beat the target by this factor.
+HEADROOM = 0.8
+
+_DEADLINE = re.compile(r'^(?:within\s+)?(\d+(?:\.\d+)?)\s*(?:s|sec|secs|seconds?)?$')
+_REALTIME = re.compile(r'^(?:realtime|real-time|rt)?\s*(?:x\s*(\d+(?:\.\d+)?)|(\d+(?:\.\d+)?)\s*x)?$')
+# Transcode wall time reported by `ffmpeg -benchmark`.
+_BENCHMARK_RTIME = re.compile(r'bench: .*rtime=(\d+(?:\.\d+)?)s')
+
+_profile = None
+_calibration_lock = threading.Lock()
+
+
+def parse_encode_target(encode_target: str) -> tuple[str, float]:
+	"""
+	Parse an encode target such as `'90s'`, `'within 90 seconds'`, `'realtime'`, `'realtime x2'` or `'2x'`.
+
+	Returns:
+	    tuple[str, float]: (`'deadline'`, seconds) or (`'realtime'`, speed factor).
+
+	Raises:
+	    ValueError: If the target is not understood.
+	"""
+	text = encode_target.strip().lower()
+	deadline = _DEADLINE.match(text)
+	if deadline:
+		seconds = float(deadline.group(1))
+		if seconds <= 0:
+			raise ValueError('An encode deadline must be positive')
+		return 'deadline', seconds
+	realtime = _REALTIME.match(text)
+	if text and realtime:
+		factor = float(realtime.group(1) or realtime.group(2) or 1.0)
+		if factor <= 0:
+			raise ValueError('A realtime factor must be positive')
+		return 'realtime', factor
+	raise ValueError(f"Invalid encode target '{encode_target}': use e.g. '120s' (finish within) or 'realtime x2'")
+
+
+def _ffmpeg_version() -> str:
+	try:
+		return subprocess.run(['ffmpeg', '-version'], capture_output=True, text=True).stdout.splitlines()[0]
+	except (OSError, IndexError):
+		return 'unknown'
+
+
+# Computed once per process: it runs `ffmpeg -version`, and profile lookups happen on every encode.
+@functools.cache
+def _host_key() -> dict:
+	"""What a profile was measured on; a profile from another host, ffmpeg or thread count is recalibrated."""
+	return {
+		'hostname': platform.node(),
+		'cpu_count': os.cpu_count(),
+		'threads': settings.THREADS_PER_JOB,
+		'ffmpeg': _ffmpeg_version(),
+	}
+
+
+def _profile_path() -> str:
+	return os.path.join(settings.ENCODE_PROFILE_DIR, f'{platform.node() or "host"}.json')
+
+
+def _measure_fps(width: int, height: int, preset: str, frames: int) -> float:
+	"""
+	Encode `frames` frames of a synthetic clip with libx264 and return the frames encoded per second.
+
+	The encode runs alone (holding the whole CPU budget, see `run_ffmpeg`) and is timed by ffmpeg
+	itself, so neither the wait for the budget nor other jobs count as encode time.
+	"""
+	source = ffmpeg.input(f'testsrc2=size={width}x{height}:rate={CALIBRATION_FRAME_RATE}', f='lavfi', t=frames / CALIBRATION_FRAME_RATE)
+	started = time.perf_counter()
+	_, stderr = run_ffmpeg(
+		source.output('-', format='null', vcodec='libx264', preset=preset, crf=CALIBRATION_CRF, pix_fmt='yuv420p').global_args(
+			'-benchmark'
+		),
+		threads=settings.THREADS_PER_JOB,
+		exclusive=True,
+	)
+	benchmark = _BENCHMARK_RTIME.search(stderr.decode('utf-8', errors='replace'))
+	seconds = float(benchmark.group(1)) if benchmark else time.perf_counter() - started
+	return frames / max(seconds, 1e-3)
+
+
+def calibrate(frames: int | None = None) -> dict:
+	"""
+	Measure the libx264 throughput of this host for every preset at the calibration resolutions.
+
+	Every measurement encodes a synthetic clip of `frames` frames with `THREADS_PER_JOB` threads, as a
+	real encode would get, while no other ffmpeg process runs. The profile is stored as JSON under
+	`ENCODE_PROFILE_DIR`, one file per host. Concurrent calls calibrate once.
+
+	Args:
+	    frames (int | None): Frames encoded per measurement. Defaults to `ENCODE_CALIBRATION_FRAMES`.
+
+	Returns:
+	    dict: The profile: `host`, `created_at` and `fps[preset]['WxH']` (None where too slow to measure).
+	"""
+	global _profile
+	requested_at = time.time()
+	with _calibration_lock:
+		if _profile is not None and _profile['created_at'] >= requested_at:
+			# Another call calibrated while this one waited.
+			return _profile
+
+		frames = frames or settings.ENCODE_CALIBRATION_FRAMES
+		fps = {preset: {} for preset in PRESETS}
+		logger.info(f'Calibrating encode profiles ({len(PRESETS)} presets x {len(CALIBRATION_RESOLUTIONS)} resolutions)...')
+		for width, height in CALIBRATION_RESOLUTIONS:
+			too_slow = False
+			for preset in PRESETS:
+				measured = None if too_slow else round(_measure_fps(width, height, preset, frames), 2)
+				fps[preset][f'{width}x{height}'] = measured
+				too_slow = too_slow or measured < MIN_CALIBRATED_FPS
+
+		profile = {'host': _host_key(), 'created_at': time.time(), 'frames': frames, 'fps': fps}
+		path = _profile_path()
+		temp_path = f'{path}.{os.getpid()}.tmp'
+		try:
+			os.makedirs(settings.ENCODE_PROFILE_DIR, exist_ok=True)
+			with open(temp_path, 'w', encoding='utf-8') as f:
+				json.dump(profile, f, indent=2)
+			os.replace(temp_path, path)
+		except OSError as e:
+			logger.warning(f'Could not store the encode profile: {e}')
+		_profile = profile
+		logger.info(f'Encode profile calibrated and stored at {path}')
+		return profile
+
+
+def get_profile() -> dict | None:
+	"""
+	Return this host's encode profile, or None while the host has not been calibrated.
+
+	A stored profile is used as long as it was measured on the same host, ffmpeg build and
+	`THREADS_PER_JOB`. This never calibrates: tool calls must not stall on a benchmark, so
+	calibration only runs through `calibrate` (the `calibrate_encoder` tool).
+	"""
+	global _profile
+	if _profile is not None:
+		return _profile
+	try:
+		with open(_profile_path(), encoding='utf-8') as f:
+			stored = json.load(f)
+	except (OSError, ValueError):
+		return None
+	if stored.get('host') != _host_key():
+		logger.info('Stored encode profile was measured on a different setup; run calibrate_encoder again')
+		return None
+	_profile = stored
+	return _profile
+
+
+def check_encode_target(encode_target: str | None):
+	"""
+	Check that an encode target can be applied: it is understood and this host has an encode profile.
+
+	Raises:
+	    ValueError: If the target is not understood, or `calibrate_encoder` has not run on this host.
+	"""
+	if not encode_target:
+		return
+	parse_encode_target(encode_target)
+	if get_profile() is None:
+		raise ValueError(
+			f'Cannot apply encode target {encode_target!r}: this host has no encode profile yet. '
+			'Run calibrate_encoder once, or call again without encode_target.'
+		)
+
+
+def estimate_fps(profile: dict, preset: str, width: int, height: int) -> float:
+	"""Estimate the encode speed of a preset at `width`x`height` from the calibrated resolution closest in pixel count."""
+	pixels = max(1, width * height)
+	measured = []
+	for size, fps in profile['fps'].get(preset, {}).items():
+		calibrated_width, calibrated_height = size.split('x')
+		measured.append((int(calibrated_width) * int(calibrated_height), fps))
+	if not measured:
+		return 0.0
+	calibrated_pixels, fps = min(measured, key=lambda item: abs(math.log(item[0] / pixels)))
+	# Encode time grows roughly linearly with the pixel count.
+	return (fps or 0.0) * calibrated_pixels / pixels
+
+
+def select_preset(encode_target: str, width: int, height: int, duration: float, frame_rate: float) -> str:
+	"""
+	Choose the slowest (best compressing) libx264 preset expected to meet an encode target on this host.
+
+	Args:
+	    encode_target (str): `'<N>s'` to finish within N seconds, or `'realtime'` / `'realtime x<K>'`
+	        to encode at K times the playback speed (see `parse_encode_target`).
+	    width (int): Output width.
+	    height (int): Output height.
+	    duration (float): Output duration in seconds.
+	    frame_rate (float): Output frame rate.
+
+	Returns:
+	    str: The preset; `ultrafast` when no preset is expected to meet the target.
+
+	Raises:
+	    ValueError: If the target cannot be applied (see `check_encode_target`).
+	"""
+	check_encode_target(encode_target)
+	kind, value = parse_encode_target(encode_target)
+	required_fps = duration * frame_rate / value if kind == 'deadline' else frame_rate * value
+	profile = get_profile()
+	for preset in reversed(PRESETS):
+		if estimate_fps(profile, preset, width, height) * HEADROOM >= required_fps:
+			logger.info(f'Encode target {encode_target!r} ({required_fps:.1f} fps at {width}x{height}): preset {preset}')
+			return preset
+	logger.warning(f'No preset meets encode target {encode_target!r} ({required_fps:.1f} fps at {width}x{height}); using ultrafast')
+	return PRESETS[0]
+
+
+def preset_options(
+	encode_target: str | None, width: int, height: int, duration: float, frame_rate: float, default: str | None = None
+) -> dict:
+	"""
+	ffmpeg-python output options carrying the preset for an encode: the preset chosen for
+	`encode_target` when one is given, `default` otherwise (no option at all when `default` is None).
+
+	Raises:
+	    ValueError: If the target cannot be applied (see `check_encode_target`).
+	"""
+	preset = select_preset(encode_target, width, height, duration, frame_rate) if encode_target else default
+	return {'preset': preset} if preset else {}
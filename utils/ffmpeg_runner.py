@@ -0,0 +1,275 @@
+import contextvars
+import json
+import logging
+import os
+import subprocess
+import threading
+import time
+from uuid import uuid4
+
+import ffmpeg
+from ffmpeg._run import OutputNode, get_stream_spec_nodes, topo_sort
+
+from ffmpeg_mcp.configs import setup_logging
+from utils.cpu_scheduler import cpu_scheduler
+from utils.metrics import max_rss_kb, read_process_io, record_process
+
+setup_logging()
+logger = logging.getLogger(__name__)
+
+
+class ProgressTracker:
+	"""
+	Aggregates `-progress` snapshots from every ffmpeg process started on behalf of one tool call.
+
+	Tools such as `get_normalized_clips` run several processes, so the overall percentage is the
+	encoded time of all processes seen so far over their combined probed durations.
+	"""
+
+	def __init__(self, sink=None):
+		self.sink = sink
+		self._processes = {}
+		self._lock = threading.Lock()
+
+	def update(self, process_id: str, snapshot: dict):
+		with self._lock:
+			self._processes[process_id] = snapshot
+		if self.sink:
+			self.sink(self.summary())
+
+	def summary(self) -> dict:
+		"""Return the combined progress of all processes reported so far."""
+		with self._lock:
+			snapshots = list(self._processes.values())
+
+		timed = [snapshot for snapshot in snapshots if snapshot['duration']]
+		total_duration = sum(snapshot['duration'] for snapshot in timed)
+		done_duration = sum(
+			snapshot['duration'] if snapshot['finished'] else min(snapshot['out_time'], snapshot['duration']) for snapshot in timed
+		)
+		latest = snapshots[-1] if snapshots else {}
+
+		return {
+			'percent': round(100 * done_duration / total_duration, 1) if total_duration else None,
+			'fps': latest.get('fps'),
+			'speed': latest.get('speed'),
+			'processes_started': len(snapshots),
+			'processes_finished': sum(1 for snapshot in snapshots if snapshot['finished']),
+		}
+
+
+# Set by the tool wrappers; `run_ffmpeg` feeds every process it starts into the active tracker.
+current_progress = contextvars.ContextVar('current_progress', default=None)
+
+
+def parse_progress(stats: dict, duration: float | None) -> dict:
+	"""
+	Turn one block of ffmpeg `-progress` key/value output into a progress snapshot.
+
+	Args:
+	    stats (dict): Latest value for every key ffmpeg reported.
+	    duration (float | None): Probed duration of the output in seconds, if known.
+
+	Returns:
+	    dict: out_time (s), duration (s), percent, fps, speed and whether the process finished.
+	"""
+	out_time_us = stats.get('out_time_us') or stats.get('out_time_ms') or '0'
+	out_time = int(out_time_us) / 1_000_000 if out_time_us.lstrip('-').isdigit() else 0.0
+	out_time = max(out_time, 0.0)
+
+	try:
+		fps = float(stats.get('fps', ''))
+	except ValueError:
+		fps = None
+	try:
+		speed = float(stats.get('speed', '').rstrip('x'))
+	except ValueError:
+		speed = None
+
+	finished = stats.get('progress') == 'end'
+	percent = None
+	if duration:
+		percent = 100.0 if finished else round(min(100 * out_time / duration, 100.0), 1)
+
+	return {'out_time': out_time, 'duration': duration, 'percent': percent, 'fps': fps, 'speed': speed, 'finished': finished}
+
+
+def _is_stream_copy(args: list[str]) -> bool:
+	"""True when the command only remuxes (codec `copy`, no filters), which needs a single thread."""
+	codecs = [
+		value
+		for option, value in zip(args, args[1:])
+		if option in ('-c', '-codec', '-vcodec', '-acodec') or option.startswith(('-c:', '-codec:'))
+	]
+	filtered = any(option in ('-filter_complex', '-vf', '-lavfi') for option in args)
+	return bool(codecs) and all(codec == 'copy' for codec in codecs) and not filtered
+
+
+def _output_positions(stream_spec, args: list[str]) -> list[int]:
+	"""Indices of the output URLs in the compiled `args` of a stream spec, in order."""
+	sorted_nodes, _ = topo_sort(get_stream_spec_nodes(stream_spec))
+	filenames = [str(node.kwargs['filename']) for node in sorted_nodes if isinstance(node, OutputNode)]
+	# ffmpeg-python writes each output's options followed by its URL, outputs last (before global options).
+	positions, end = [], len(args)
+	for filename in reversed(filenames):
+		end = next(index for index in range(end - 1, -1, -1) if str(args[index]) == filename)
+		positions.append(end)
+	return positions[::-1]
+
+
+def _with_thread_limits(args: list[str], threads: int, output_positions: list[int]) -> list[str]:
+	"""
+	Cap decoder, filter and encoder threads of a compiled ffmpeg command.
+
+	Every output gets its own `-threads`, splitting the grant between the encoders of a
+	multi-output command (at least one thread each).
+	"""
+	encoder_threads = str(max(1, threads // max(1, len(output_positions))))
+	outputs = set(output_positions)
+	limited = [args[0], '-filter_threads', str(threads), '-filter_complex_threads', str(threads)]
+	for index, arg in enumerate(args[1:], start=1):
+		if arg == '-i':
+			limited += ['-threads', str(threads)]
+		elif index in outputs:
+			limited += ['-threads', encoder_threads]
+		limited.append(arg)
+	return limited
+
+
+def run_ffmpeg(
+	stream_spec,
+	duration: float | None = None,
+	overwrite_output: bool = True,
+	capture_stdout: bool = False,
+	threads: int | None = None,
+	exclusive: bool = False,
+):
+	"""
+	Run an ffmpeg-python stream spec, reporting live progress to the active `ProgressTracker`.
+
+	Drop-in replacement for `stream_spec.run(quiet=True)`: output is captured and a failure raises
+	`ffmpeg.Error` carrying stderr, so existing error handling keeps working.
+
+	The process only starts once the shared `cpu_scheduler` grants it cores, and its decoder,
+	filter and encoder threads are capped to that grant (split between the outputs of a
+	multi-output command).
+
+	Args:
+	    stream_spec: The ffmpeg-python output node to run.
+	    duration (float | None): Expected output duration in seconds, used for the percentage.
+	    overwrite_output (bool): Pass `-y` to ffmpeg. Defaults to True.
+	    capture_stdout (bool): Return ffmpeg's stdout (e.g. for `pipe:` outputs). Progress is not
+	        parsed in this mode because stdout carries the media.
+	    threads (int | None): Threads to request from the scheduler. Defaults to one for pure
+	        stream copies and `THREADS_PER_JOB` otherwise.
+	    exclusive (bool): Run alone, holding the whole CPU budget (see `CpuScheduler.allocate`).
+
+	Returns:
+	    tuple[bytes, bytes]: (stdout, stderr) of the ffmpeg process.
+	"""
+	args = ffmpeg.compile(stream_spec)
+	if threads is None and _is_stream_copy(args):
+		threads = 1
+
+	with cpu_scheduler.allocate(threads, exclusive=exclusive) as granted:
+		args = _with_thread_limits(args, granted, _output_positions(stream_spec, args))
+		if overwrite_output:
+			args.append('-y')
+		return _run_process(args, duration, capture_stdout)
+
+
+def _run_process(args: list[str], duration: float | None, capture_stdout: bool):
+	"""Start the compiled command, feed its `-progress` output to the active tracker and wait for it."""
+	if not capture_stdout:
+		args = [args[0], '-nostats', '-progress', 'pipe:1', *args[1:]]
+
+	started = time.perf_counter()
+	process = subprocess.Popen(args, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+	stderr_chunks = []
+	stderr_reader = threading.Thread(target=lambda: stderr_chunks.append(process.stderr.read()), daemon=True)
+	stderr_reader.start()
+
+	stdout = b''
+	stats = {}
+	if capture_stdout:
+		stdout = process.stdout.read()
+	else:
+		tracker = current_progress.get()
+		process_id = uuid4().hex
+		for raw_line in process.stdout:
+			key, _, value = raw_line.decode('utf-8', errors='replace').strip().partition('=')
+			# ffmpeg reports N/A while a value is momentarily unknown; keep the last real one.
+			if value != 'N/A':
+				stats[key] = value
+			if key == 'progress' and tracker is not None:
+				tracker.update(process_id, parse_progress(stats, duration))
+
+	wait_and_record(process, 'ffmpeg', started, speed=parse_progress(stats, duration)['speed'] if stats else None)
+	stderr_reader.join()
+	stderr = b''.join(stderr_chunks)
+
+	if process.returncode != 0:
+		raise ffmpeg.Error('ffmpeg', stdout, stderr)
+	return stdout, stderr
+
+
+def wait_and_record(process: subprocess.Popen, program: str, started: float, speed: float | None = None):
+	"""
+	Wait for a child process and record its resource usage in the server metrics.
+
+	The exited process is inspected before it is reaped, so its `/proc/<pid>/io` counters are
+	still readable, then reaped with `wait4` for its CPU time and peak RSS. `process.returncode`
+	is set as `Popen.wait()` would. Where `waitid`/`wait4` are unavailable (Windows), the process
+	is reaped with `Popen.wait()` and its I/O, CPU time and peak RSS are recorded as None.
+	"""
+	io = None
+	if hasattr(os, 'waitid'):
+		os.waitid(os.P_PID, process.pid, os.WEXITED | os.WNOWAIT)
+		io = read_process_io(process.pid)
+
+	usage = None
+	if hasattr(os, 'wait4'):
+		_, status, usage = os.wait4(process.pid, 0)
+		process.returncode = os.waitstatus_to_exitcode(status)
+	else:
+		process.wait()
+
+	record_process(
+		{
+			'program': program,
+			'returncode': process.returncode,
+			'wall_seconds': round(time.perf_counter() - started, 4),
+			'user_cpu_seconds': round(usage.ru_utime, 4) if usage else None,
+			'system_cpu_seconds': round(usage.ru_stime, 4) if usage else None,
+			'max_rss_kb': max_rss_kb(usage) if usage else None,
+			'read_bytes': io[0] if io else None,
+			'write_bytes': io[1] if io else None,
+			'speed': speed,
+		}
+	)
+
+
+def run_ffprobe(args: list[str]) -> bytes:
+	"""
+	Run an ffprobe command line and return its stdout, recording the process in the server metrics.
+
+	Raises:
+	    ffmpeg.Error: If ffprobe exits with a non-zero status.
+	"""
+	started = time.perf_counter()
+	process = subprocess.Popen(args, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+	stderr_chunks = []
+	stderr_reader = threading.Thread(target=lambda: stderr_chunks.append(process.stderr.read()), daemon=True)
+	stderr_reader.start()
+	stdout = process.stdout.read()
+	wait_and_record(process, 'ffprobe', started)
+	stderr_reader.join()
+	stderr = b''.join(stderr_chunks)
+	if process.returncode != 0:
+		raise ffmpeg.Error('ffprobe', stdout, stderr)
+	return stdout
+
+
+def probe(input_path: str) -> dict:
+	"""Instrumented equivalent of `ffmpeg.probe`: the parsed `-show_format -show_streams` JSON of a file."""
+	return json.loads(run_ffprobe(['ffprobe', '-show_format', '-show_streams', '-of', 'json', input_path]).decode('utf-8'))
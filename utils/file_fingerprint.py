@@ -0,0 +1,31 @@
+import hashlib
+import os
+
+
+def file_fingerprint(input_path: str) -> tuple:
+	"""
+	Build a cheap identity for a file on disk without reading its contents.
+
+	Args:
+	    input_path (str): Path to the file.
+
+	Returns:
+	    tuple: (absolute path, inode, size in bytes, mtime in nanoseconds). Any rewrite of the
+	    file changes at least one of these, so the tuple is safe to use as a cache key.
+	"""
+	real_path = os.path.realpath(input_path)
+	stat = os.stat(real_path)
+	return real_path, stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+def fingerprint_digest(*parts) -> str:
+	"""
+	Hash a file fingerprint (and any extra key parts) into a short, filename-safe digest.
+
+	Args:
+	    *parts: Values to hash, typically a `file_fingerprint` tuple followed by parameters.
+
+	Returns:
+	    str: Hex digest of the parts.
+	"""
+	return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
@@ -0,0 +1,108 @@
+import logging
+from fractions import Fraction
+
+from ffmpeg_mcp.configs import setup_logging
+from utils.media_info import parse_frame_rate
+
+setup_logging()
+logger = logging.getLogger(__name__)
+
+# Frame rates closer than this (relative) are treated as equal, e.g. 29.97 vs 30000/1001 rounding.
+FRAME_RATE_TOLERANCE = Fraction(1, 200)
+
+
+def _same_rate(rate: float, target: float) -> bool:
+	return abs(Fraction(rate) - Fraction(target)) <= Fraction(target) * FRAME_RATE_TOLERANCE
+
+
+def plan_video_filters(
+	stream: dict,
+	width: int | None = None,
+	height: int | None = None,
+	frame_rate: float | None = None,
+	pix_fmt: str | None = None,
+	allow_upconversion: bool = False,
+	pad_x: str = '(ow-iw)/2',
+	pad_y: str = '(oh-ih)/2',
+) -> list[tuple[str, tuple, dict]]:
+	"""
+	Plan the scale/pad/fps/format stages that bring a video stream to a target format, leaving out
+	every stage that would not change anything for this stream.
+
+	- scale (fit inside `width`x`height`, keeping the aspect ratio) is left out when the stream
+	  already has that size;
+	- pad (to `width`x`height`) is left out when the fitted picture already fills it, i.e. the
+	  stream has the target aspect ratio;
+	- fps is left out when the stream already has the target rate, and also when the target is
+	  higher than the source rate unless `allow_upconversion` is set: duplicating frames only adds
+	  encode cost;
+	- format is left out when the stream already has the pixel format.
+
+	Args:
+	    stream (dict): The video stream of a probe result (`width`, `height`, frame rates, `pix_fmt`).
+	    width (int | None): Target width; no scale/pad when None.
+	    height (int | None): Target height; no scale/pad when None.
+	    frame_rate (float | None): Target frame rate; no fps stage when None.
+	    pix_fmt (str | None): Target pixel format; no format stage when None.
+	    allow_upconversion (bool): Raise the frame rate when the source is slower than `frame_rate`.
+	    pad_x (str): X position of the picture in the padded frame. Defaults to centered.
+	    pad_y (str): Y position of the picture in the padded frame. Defaults to centered.
+
+	Returns:
+	    list[tuple[str, tuple, dict]]: (filter name, positional args, keyword args) of each remaining stage, in order.
+	"""
+	stages, elided = [], []
+	source_width, source_height = stream.get('width'), stream.get('height')
+
+	if width and height:
+		if (source_width, source_height) == (width, height):
+			elided.append(f'scale+pad (already {width}x{height})')
+		else:
+			stages.append(('scale', (width, height), {'force_original_aspect_ratio': 'decrease'}))
+			if source_width and source_height and source_width * height == source_height * width:
+				elided.append(f'pad ({source_width}x{source_height} scales to exactly {width}x{height})')
+			else:
+				stages.append(('pad', (width, height, pad_x, pad_y), {}))
+
+	if frame_rate:
+		nominal = parse_frame_rate(stream.get('r_frame_rate'))
+		average = parse_frame_rate(stream.get('avg_frame_rate'))
+		if nominal and _same_rate(nominal, frame_rate) and (not average or _same_rate(average, frame_rate)):
+			elided.append(f'fps (already {frame_rate})')
+		elif nominal and nominal < frame_rate and not allow_upconversion:
+			elided.append(f'fps (refusing to up-convert {round(nominal, 3)} to {frame_rate} fps)')
+		else:
+			stages.append(('fps', (), {'fps': frame_rate}))
+
+	if pix_fmt:
+		if stream.get('pix_fmt') == pix_fmt:
+			elided.append(f'format (already {pix_fmt})')
+		else:
+			stages.append(('format', (pix_fmt,), {}))
+
+	if elided:
+		logger.info(f'Elided no-op filter stages: {", ".join(elided)}')
+	return stages
+
+
+def apply_video_filters(video, stages: list[tuple[str, tuple, dict]]):
+	"""Chain planned stages onto an ffmpeg-python video stream."""
+	for name, args, kwargs in stages:
+		video = video.filter(name, *args, **kwargs)
+	return video
+
+
+def video_filter_string(stages: list[tuple[str, tuple, dict]]) -> str | None:
+	"""Render planned stages as a `-vf` filter chain, or None when nothing is left to do."""
+	if not stages:
+		return None
+
+	def escape(value) -> str:
+		# Commas inside expressions (e.g. `min(iw,1280)`) would otherwise end the filter.
+		return str(value).replace(',', '\\,')
+
+	rendered = []
+	for name, args, kwargs in stages:
+		options = [escape(arg) for arg in args] + [f'{key}={escape(value)}' for key, value in kwargs.items()]
+		rendered.append(f'{name}={":".join(options)}' if options else name)
+	return ','.join(rendered)
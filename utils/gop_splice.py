@@ -0,0 +1,160 @@
+import logging
+
+import ffmpeg
+
+from ffmpeg_mcp.configs import setup_logging
+from utils.chunked_encode import _concat_list
+from utils.ffmpeg_runner import run_ffmpeg
+from utils.keyframes import keyframe_at_or_after, keyframe_at_or_before, keyframe_times
+from utils.media_info import get_audio_streams, get_video_stream, parse_frame_rate
+from utils.probe_cache import probe_media
+from utils.workspace import scratch_workspace
+
+setup_logging()
+logger = logging.getLogger(__name__)
+
+# Codecs whose partial GOPs we can re-encode with a bitstream-compatible encoder.
+SPLICE_CODECS = {'h264': 'libx264'}
+
+X264_PROFILES = {
+	'constrained baseline': 'baseline',
+	'baseline': 'baseline',
+	'main': 'main',
+	'high': 'high',
+	'high 10': 'high10',
+	'high 4:2:2': 'high422',
+	'high 4:4:4 predictive': 'high444',
+}
+
+
+def can_splice(metadata: dict) -> bool:
+	"""True when the video stream's codec can be partially re-encoded and spliced with stream-copied GOPs."""
+	video = get_video_stream(metadata)
+	return video is not None and video.get('codec_name') in SPLICE_CODECS
+
+
+def matching_encoder_options(metadata: dict) -> dict:
+	"""
+	Encoder options that reproduce the source video stream's codec, profile, level, pixel format
+	and colour description, so re-encoded GOPs can be joined with stream-copied ones.
+	"""
+	video = get_video_stream(metadata)
+	options = {'vcodec': SPLICE_CODECS[video['codec_name']], 'crf': 18, 'preset': 'medium', 'pix_fmt': video.get('pix_fmt', 'yuv420p')}
+
+	profile = X264_PROFILES.get((video.get('profile') or '').lower())
+	if profile:
+		options['profile:v'] = profile
+	if (video.get('level') or 0) > 0:
+		options['level:v'] = f'{video["level"] / 10:.1f}'
+	for probe_key, option in (
+		('color_primaries', 'color_primaries'),
+		('color_transfer', 'color_trc'),
+		('color_space', 'colorspace'),
+		('color_range', 'color_range'),
+	):
+		if video.get(probe_key) and video[probe_key] != 'unknown':
+			options[option] = video[probe_key]
+	return options
+
+
+def plan_smart_cut(input_path: str, start: float, end: float) -> list[tuple[float, float, bool]]:
+	"""
+	Split [start, end) into segments aligned on the source keyframes.
+
+	Returns:
+	    list[tuple[float, float, bool]]: (segment start, segment end, needs re-encode). Only the partial
+	    GOPs at the head (start → first keyframe) and tail (last keyframe → end) are re-encoded; whole
+	    GOPs in between are stream-copied. A range without a whole GOP is re-encoded entirely.
+	"""
+	# Keyframe timestamps are absolute, cut times (input seeking) are relative to the start of the file.
+	start_time = float(probe_media(input_path).get('format', {}).get('start_time') or 0.0)
+	times = [time - start_time for time in keyframe_times(input_path)]
+	first_keyframe = keyframe_at_or_after(times, start)
+	last_keyframe = keyframe_at_or_before(times, end)
+
+	if first_keyframe is None or first_keyframe >= last_keyframe or last_keyframe > end:
+		return [(start, end, True)]
+
+	segments = []
+	if first_keyframe > start:
+		segments.append((start, first_keyframe, True))
+	segments.append((first_keyframe, last_keyframe, False))
+	if end > last_keyframe:
+		segments.append((last_keyframe, end, True))
+	return segments
+
+
+def render_spliced(
+	input_path: str,
+	metadata: dict,
+	segments: list[tuple[float, float, bool]],
+	output_path: str,
+	video_transform=None,
+	keep_audio: bool = True,
+	encoder_overrides: dict | None = None,
+):
+	"""
+	Render contiguous source segments, re-encoding only the ones flagged for it, and join them.
+
+	Every segment is written as a video-only part (re-encoded with `matching_encoder_options`, or
+	stream-copied), the parts are joined with the concat demuxer, which carries each part's parameter
+	sets across, and the source audio for the whole range is stream-copied alongside. Nothing is decoded outside the re-encoded segments.
+
+	Args:
+	    input_path (str): Source video.
+	    metadata (dict): Probe result of the source.
+	    segments (list): (start, end, re-encode) tuples covering one contiguous range.
+	    output_path (str): Where to write the joined MP4.
+	    video_transform (callable, optional): `f(video_stream, segment_start, segment_end)` applied to the
+	        video of re-encoded segments, e.g. to draw an overlay.
+	    keep_audio (bool): Copy the source audio of the range alongside. Defaults to True.
+	    encoder_overrides (dict, optional): Encoder options replacing the defaults of `matching_encoder_options`
+	        that do not affect compatibility, e.g. `preset`.
+	"""
+	encoder_options = {**matching_encoder_options(metadata), **(encoder_overrides or {})}
+	video = get_video_stream(metadata)
+	range_start, range_end = segments[0][0], segments[-1][1]
+
+	with scratch_workspace('splice') as workspace:
+		parts = []
+		for index, (segment_start, segment_end, reencode) in enumerate(segments):
+			if segment_end - segment_start <= 1e-3:
+				continue
+			part_path = workspace.path(f'part_{index:04d}.mp4')
+			source = ffmpeg.input(input_path, ss=segment_start, t=segment_end - segment_start)
+			if reencode:
+				part_video = source.video
+				if video_transform is not None:
+					part_video = video_transform(part_video, segment_start, segment_end)
+				# Input `t` counts from the first frame, which comes after the seek point when the video starts
+				# later than the container (e.g. audio priming), so it can let through the keyframe the next part
+				# starts on; end at the segment length instead, and start the part at 0 like a copied one (setpts
+				# drops the frame rate, so the source's is set again).
+				part_video = part_video.trim(end=segment_end - segment_start - 1e-3).setpts('PTS-STARTPTS')
+				frame_rate = {'r': video['r_frame_rate']} if parse_frame_rate(video.get('r_frame_rate')) else {}
+				output = ffmpeg.output(part_video, part_path, **encoder_options, **frame_rate)
+			else:
+				# Copying up to a keyframe also lets through packets decoded before it but shown at or after it
+				# (the keyframe itself, leading B-frames); in a closed GOP nothing before the cut references them.
+				drop_after = f'noise=drop=gte(pts*tb\\,{segment_end - segment_start - 1e-3:.6f})'
+				output = ffmpeg.output(source.video, part_path, vcodec='copy', **{'bsf:v': drop_after})
+			logger.info(f'{"Re-encoding" if reencode else "Copying"} {segment_start:.3f}s → {segment_end:.3f}s of {input_path}')
+			run_ffmpeg(output, duration=segment_end - segment_start)
+			parts.append(part_path)
+
+		list_path = workspace.path('parts.txt')
+		with open(list_path, 'w', encoding='utf-8') as f:
+			f.write(_concat_list(parts))
+
+		streams = [ffmpeg.input(list_path, f='concat', safe=0).video]
+		if keep_audio and get_audio_streams(metadata):
+			streams.append(ffmpeg.input(input_path, ss=range_start, t=range_end - range_start).audio)
+
+		output_options = {'c': 'copy', 'movflags': '+faststart'}
+		time_base = (video.get('time_base') or '').split('/')
+		if len(time_base) == 2 and time_base[1].isdigit():
+			output_options['video_track_timescale'] = time_base[1]
+
+		joined_path = workspace.path('joined.mp4')
+		run_ffmpeg(ffmpeg.output(*streams, joined_path, **output_options), duration=range_end - range_start)
+		workspace.publish(joined_path, output_path)
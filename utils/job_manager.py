@@ -0,0 +1,181 @@
+import datetime
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from uuid import uuid4
+
+from ffmpeg_mcp.configs import settings, setup_logging
+from utils.ffmpeg_runner import ProgressTracker, current_progress
+from utils.metrics import is_error_result
+
+setup_logging()
+logger = logging.getLogger(__name__)
+
+
+def _now() -> str:
+	return datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+
+class Job:
+	"""A tool call running in the background, with its live progress and eventual result."""
+
+	def __init__(self, tool_name: str):
+		self.job_id = uuid4().hex
+		self.tool_name = tool_name
+		self.status = 'PENDING'
+		self.result = None
+		self.error = None
+		self.created_at = _now()
+		self.started_at = None
+		self.finished_at = None
+		self.progress = ProgressTracker()
+		# Set on jobs loaded from the job store: the progress summary as last persisted by their worker.
+		self.stored_progress = None
+
+	@classmethod
+	def from_record(cls, record: dict) -> 'Job':
+		"""Rebuild a job persisted in the job store, typically by another worker process."""
+		job = cls(record['tool'])
+		job.job_id = record['job_id']
+		job.status = record['status']
+		job.result = record.get('result')
+		job.error = record.get('error')
+		job.created_at, job.started_at, job.finished_at = record['created_at'], record['started_at'], record['finished_at']
+		job.stored_progress = record['progress']
+		return job
+
+	def to_dict(self) -> dict:
+		return {
+			'job_id': self.job_id,
+			'tool': self.tool_name,
+			'status': self.status,
+			'progress': self.stored_progress if self.stored_progress is not None else self.progress.summary(),
+			'created_at': self.created_at,
+			'started_at': self.started_at,
+			'finished_at': self.finished_at,
+		}
+
+
+class JobManager:
+	"""
+	Registry of background jobs. Jobs run on the given executor (the shared tool pool), so they
+	count against the same concurrency limit as foreground calls. Only the most recent
+	`max_jobs` jobs are retained; older finished jobs are forgotten.
+
+	When `store_dir` is set, each job's state (and, once finished, its result) is also written
+	there as JSON, on every status change and at most every `persist_interval` seconds while it
+	reports progress. Jobs unknown to this process are looked up there, so with several worker
+	processes sharing the directory a job can be queried through any of them.
+	"""
+
+	def __init__(self, max_jobs: int = 200, store_dir: str | None = None, persist_interval: float = 1.0):
+		self.max_jobs = max_jobs
+		self.store_dir = store_dir
+		self.persist_interval = persist_interval
+		self._jobs = OrderedDict()
+		self._lock = threading.Lock()
+
+	def submit(self, executor, func, *args, **kwargs) -> Job:
+		"""Schedule `func(*args, **kwargs)` on `executor` and return its job right away."""
+		job = Job(tool_name=func.__name__)
+		if self.store_dir:
+			last_persisted = [0.0]
+
+			def persist_progress(summary: dict):
+				if time.monotonic() - last_persisted[0] >= self.persist_interval:
+					last_persisted[0] = time.monotonic()
+					self._persist(job)
+
+			job.progress.sink = persist_progress
+		with self._lock:
+			self._jobs[job.job_id] = job
+			self._evict()
+		self._persist(job)
+		executor.submit(self._run, job, func, *args, **kwargs)
+		logger.info(f'Queued background job {job.job_id} for {job.tool_name}')
+		return job
+
+	def get(self, job_id: str) -> Job | None:
+		with self._lock:
+			job = self._jobs.get(job_id)
+		return job if job is not None else self._load(job_id)
+
+	def list(self) -> list[Job]:
+		with self._lock:
+			jobs = dict(self._jobs)
+		if self.store_dir and os.path.isdir(self.store_dir):
+			for file_name in os.listdir(self.store_dir):
+				job_id, extension = os.path.splitext(file_name)
+				if extension == '.json' and job_id not in jobs:
+					stored = self._load(job_id)
+					if stored is not None:
+						jobs[job_id] = stored
+		return sorted(jobs.values(), key=lambda job: job.created_at)
+
+	def _run(self, job: Job, func, *args, **kwargs):
+		job.status = 'RUNNING'
+		job.started_at = _now()
+		self._persist(job)
+		token = current_progress.set(job.progress)
+		try:
+			job.result = func(*args, **kwargs)
+			if is_error_result(job.result):
+				# Tools report most failures by returning an exception message rather than raising.
+				error = json.loads(job.result)
+				logger.error(f'Background job {job.job_id} failed: {error.get("message")}')
+				job.error = f'{error.get("error_type")}: {error.get("message")}'
+				job.status = 'FAILED'
+			else:
+				job.status = 'COMPLETED'
+		except Exception as e:
+			logger.error(f'Background job {job.job_id} failed: {e}')
+			job.error = f'{type(e).__name__}: {e}'
+			job.status = 'FAILED'
+		finally:
+			current_progress.reset(token)
+			job.finished_at = _now()
+			self._persist(job)
+
+	def _store_path(self, job_id: str) -> str:
+		return os.path.join(self.store_dir, f'{job_id}.json')
+
+	def _persist(self, job: Job):
+		if not self.store_dir:
+			return
+		record = {**job.to_dict(), 'result': job.result, 'error': job.error}
+		temp_path = f'{self._store_path(job.job_id)}.{os.getpid()}.{threading.get_ident()}.tmp'
+		try:
+			os.makedirs(self.store_dir, exist_ok=True)
+			with open(temp_path, 'w', encoding='utf-8') as f:
+				json.dump(record, f, default=str)
+			os.replace(temp_path, self._store_path(job.job_id))
+		except OSError as e:
+			logger.warning(f'Could not persist job {job.job_id}: {e}')
+
+	def _load(self, job_id: str) -> Job | None:
+		# Job ids are hex uuids; anything else cannot name a stored job (and must not escape the store).
+		if not self.store_dir or not job_id.isalnum():
+			return None
+		try:
+			with open(self._store_path(job_id), encoding='utf-8') as f:
+				return Job.from_record(json.load(f))
+		except (OSError, ValueError, KeyError):
+			return None
+
+	def _evict(self):
+		while len(self._jobs) > self.max_jobs:
+			finished = next((job_id for job_id, job in self._jobs.items() if job.status in ('COMPLETED', 'FAILED')), None)
+			if finished is None:
+				break
+			del self._jobs[finished]
+			if self.store_dir:
+				try:
+					os.remove(self._store_path(finished))
+				except OSError:
+					pass
+
+
+job_manager = JobManager(max_jobs=settings.MAX_RETAINED_JOBS, store_dir=settings.JOB_STORE_DIR)
@@ -0,0 +1,62 @@
+import bisect
+import logging
+
+from ffmpeg_mcp.configs import settings, setup_logging
+from utils.ffmpeg_runner import run_ffprobe
+from utils.probe_cache import ProbeCache
+
+setup_logging()
+logger = logging.getLogger(__name__)
+
+
+def _read_keyframe_times(input_path: str) -> list[float]:
+	"""Demux (without decoding) the first video stream and return the pts of every keyframe packet."""
+	args = [
+		'ffprobe',
+		'-v',
+		'error',
+		'-select_streams',
+		'v:0',
+		'-show_entries',
+		'packet=pts_time,flags',
+		'-of',
+		'csv=p=0',
+		input_path,
+	]
+	times = []
+	for line in run_ffprobe(args).decode('utf-8', errors='replace').splitlines():
+		pts_time, _, flags = line.partition(',')
+		if 'K' in flags and pts_time not in ('', 'N/A'):
+			times.append(float(pts_time))
+	return sorted(times)
+
+
+# Keyframe indexes are as expensive as a probe and just as stable, so they share its caching policy.
+keyframe_cache = ProbeCache(
+	max_entries=settings.PROBE_CACHE_SIZE, store_dir=settings.PROBE_CACHE_DIR, probe_fn=_read_keyframe_times, kind='keyframes'
+)
+
+
+def keyframe_times(input_path: str) -> list[float]:
+	"""
+	Return the timestamps (seconds) of every keyframe of the first video stream, cached per file.
+
+	Args:
+	    input_path (str): Path to the media file.
+
+	Returns:
+	    list[float]: Sorted keyframe timestamps.
+	"""
+	return keyframe_cache.probe(input_path)
+
+
+def keyframe_at_or_before(times: list[float], timestamp: float) -> float:
+	"""Return the last keyframe at or before `timestamp` (the first keyframe if none precedes it)."""
+	index = bisect.bisect_right(times, timestamp + 1e-6)
+	return times[index - 1] if index else (times[0] if times else 0.0)
+
+
+def keyframe_at_or_after(times: list[float], timestamp: float) -> float | None:
+	"""Return the first keyframe at or after `timestamp`, or None if there is none."""
+	index = bisect.bisect_left(times, timestamp - 1e-6)
+	return times[index] if index < len(times) else None
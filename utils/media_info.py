@@ -0,0 +1,57 @@
+from fractions import Fraction
+
+
+def get_video_stream(metadata: dict) -> dict | None:
+	"""Return the first video stream of a probe result, or None."""
+	return next((stream for stream in metadata.get('streams', []) if stream.get('codec_type') == 'video'), None)
+
+
+def get_audio_streams(metadata: dict) -> list[dict]:
+	"""Return every audio stream of a probe result, in file order."""
+	return [stream for stream in metadata.get('streams', []) if stream.get('codec_type') == 'audio']
+
+
+def parse_frame_rate(rate: str | None) -> float:
+	"""Parse an ffprobe rational such as '30000/1001' into a float (0.0 if unknown)."""
+	try:
+		return float(Fraction(rate))
+	except (TypeError, ValueError, ZeroDivisionError):
+		return 0.0
+
+
+def stream_frame_rate(stream: dict | None, default: float = 30.0) -> float:
+	"""Return a video stream's average (or else nominal) frame rate, or `default` when neither is known."""
+	stream = stream or {}
+	return parse_frame_rate(stream.get('avg_frame_rate')) or parse_frame_rate(stream.get('r_frame_rate')) or default
+
+
+def media_duration(metadata: dict) -> float:
+	"""Return the container duration in seconds, falling back to the first video stream."""
+	duration = metadata.get('format', {}).get('duration') or (get_video_stream(metadata) or {}).get('duration')
+	return float(duration or 0.0)
+
+
+def stream_copy_signature(metadata: dict) -> tuple | None:
+	"""
+	Return the stream parameters that must match for files to be joined with a stream copy:
+	codec, profile, geometry, pixel format, time base and frame rate of the video stream, plus
+	codec, sample rate and channel count of the audio stream. None if there is no video stream.
+	"""
+	video = get_video_stream(metadata)
+	if video is None:
+		return None
+	audio_streams = get_audio_streams(metadata)
+	audio = audio_streams[0] if audio_streams else {}
+	return (
+		video.get('codec_name'),
+		video.get('profile'),
+		video.get('width'),
+		video.get('height'),
+		video.get('pix_fmt'),
+		video.get('time_base'),
+		video.get('r_frame_rate'),
+		len(audio_streams),
+		audio.get('codec_name'),
+		audio.get('sample_rate'),
+		audio.get('channels'),
+	)
@@ -0,0 +1,222 @@
+import contextvars
+import functools
+import json
+import logging
+import sys
+import threading
+import time
+from collections import deque
+
+from ffmpeg_mcp.configs import setup_logging
+
+setup_logging()
+logger = logging.getLogger(__name__)
+
+# Upper bounds (seconds) of the tool latency histogram buckets; a final +Inf bucket is implied.
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+
+# Set by `instrument_tool`; child processes started during a tool call are attributed to it.
+current_tool = contextvars.ContextVar('current_tool', default=None)
+
+
+class MetricsRegistry:
+	"""
+	Process-wide counters for tool calls and the ffmpeg/ffprobe processes they start.
+
+	Tool calls are aggregated per tool (calls, errors, latency histogram). Child processes are
+	aggregated per (program, tool) with their CPU time, peak RSS, I/O and final encode speed; the
+	most recent `recent_processes` records are also kept as-is.
+	"""
+
+	def __init__(self, recent_processes: int = 50):
+		self._tools = {}
+		self._processes = {}
+		self._recent = deque(maxlen=recent_processes)
+		self._lock = threading.Lock()
+		self.started_at = time.time()
+
+	def record_tool_call(self, tool: str, seconds: float, error: bool):
+		with self._lock:
+			stats = self._tools.setdefault(
+				tool, {'calls': 0, 'errors': 0, 'latency_seconds_sum': 0.0, 'buckets': [0] * (len(LATENCY_BUCKETS) + 1)}
+			)
+			stats['calls'] += 1
+			stats['errors'] += int(error)
+			stats['latency_seconds_sum'] += seconds
+			stats['buckets'][next((i for i, bound in enumerate(LATENCY_BUCKETS) if seconds <= bound), len(LATENCY_BUCKETS))] += 1
+
+	def record_process(self, record: dict):
+		"""
+		Add one finished child process.
+
+		Args:
+		    record (dict): `program`, `tool`, `returncode`, `wall_seconds`, `user_cpu_seconds`,
+		        `system_cpu_seconds`, `max_rss_kb`, `read_bytes`, `write_bytes` and `speed`
+		        (None when the process reported none or the platform cannot measure it).
+		"""
+		with self._lock:
+			stats = self._processes.setdefault(
+				(record['program'], record['tool'] or 'none'),
+				{
+					'processes': 0,
+					'failures': 0,
+					'wall_seconds': 0.0,
+					'user_cpu_seconds': 0.0,
+					'system_cpu_seconds': 0.0,
+					'max_rss_kb': 0,
+					'read_bytes': 0,
+					'write_bytes': 0,
+					'last_speed': None,
+				},
+			)
+			stats['processes'] += 1
+			stats['failures'] += int(record['returncode'] != 0)
+			for key in ('wall_seconds', 'user_cpu_seconds', 'system_cpu_seconds', 'read_bytes', 'write_bytes'):
+				stats[key] += record[key] or 0
+			stats['max_rss_kb'] = max(stats['max_rss_kb'], record['max_rss_kb'] or 0)
+			if record['speed'] is not None:
+				stats['last_speed'] = record['speed']
+			self._recent.append(record)
+
+	def snapshot(self) -> dict:
+		"""Return every counter as plain JSON-serialisable data."""
+		with self._lock:
+			tools = {}
+			for tool, stats in sorted(self._tools.items()):
+				cumulative, buckets = 0, {}
+				for bound, count in zip([*LATENCY_BUCKETS, '+Inf'], stats['buckets']):
+					cumulative += count
+					buckets[str(bound)] = cumulative
+				tools[tool] = {
+					'calls': stats['calls'],
+					'errors': stats['errors'],
+					'latency_seconds_sum': round(stats['latency_seconds_sum'], 4),
+					'latency_seconds_avg': round(stats['latency_seconds_sum'] / stats['calls'], 4),
+					'latency_buckets': buckets,
+				}
+			processes = [
+				{
+					'program': program,
+					'tool': tool,
+					**{key: round(value, 4) if isinstance(value, float) else value for key, value in stats.items()},
+				}
+				for (program, tool), stats in sorted(self._processes.items())
+			]
+			return {
+				'uptime_seconds': round(time.time() - self.started_at, 1),
+				'tools': tools,
+				'processes': processes,
+				'recent_processes': list(self._recent),
+			}
+
+	def prometheus_text(self) -> str:
+		"""Render the counters in the Prometheus text exposition format (version 0.0.4)."""
+		snapshot = self.snapshot()
+		lines = [
+			'# HELP ffmpeg_mcp_tool_calls_total Tool invocations.',
+			'# TYPE ffmpeg_mcp_tool_calls_total counter',
+		]
+		lines += [f'ffmpeg_mcp_tool_calls_total{{tool="{tool}"}} {stats["calls"]}' for tool, stats in snapshot['tools'].items()]
+		lines += ['# HELP ffmpeg_mcp_tool_errors_total Tool invocations that failed.', '# TYPE ffmpeg_mcp_tool_errors_total counter']
+		lines += [f'ffmpeg_mcp_tool_errors_total{{tool="{tool}"}} {stats["errors"]}' for tool, stats in snapshot['tools'].items()]
+		lines += [
+			'# HELP ffmpeg_mcp_tool_latency_seconds Tool invocation latency.',
+			'# TYPE ffmpeg_mcp_tool_latency_seconds histogram',
+		]
+		for tool, stats in snapshot['tools'].items():
+			lines += [
+				f'ffmpeg_mcp_tool_latency_seconds_bucket{{tool="{tool}",le="{bound}"}} {count}'
+				for bound, count in stats['latency_buckets'].items()
+			]
+			lines.append(f'ffmpeg_mcp_tool_latency_seconds_sum{{tool="{tool}"}} {stats["latency_seconds_sum"]}')
+			lines.append(f'ffmpeg_mcp_tool_latency_seconds_count{{tool="{tool}"}} {stats["calls"]}')
+
+		process_metrics = [
+			('processes', 'ffmpeg_mcp_child_processes_total', 'counter', 'Child processes run.'),
+			('failures', 'ffmpeg_mcp_child_failures_total', 'counter', 'Child processes that exited non-zero.'),
+			('wall_seconds', 'ffmpeg_mcp_child_wall_seconds_total', 'counter', 'Wall time of child processes.'),
+			('user_cpu_seconds', 'ffmpeg_mcp_child_user_cpu_seconds_total', 'counter', 'User CPU time of child processes.'),
+			('system_cpu_seconds', 'ffmpeg_mcp_child_system_cpu_seconds_total', 'counter', 'System CPU time of child processes.'),
+			('read_bytes', 'ffmpeg_mcp_child_read_bytes_total', 'counter', 'Bytes read by child processes.'),
+			('write_bytes', 'ffmpeg_mcp_child_write_bytes_total', 'counter', 'Bytes written by child processes.'),
+			('max_rss_kb', 'ffmpeg_mcp_child_max_rss_kilobytes', 'gauge', 'Largest peak RSS of a child process.'),
+			('last_speed', 'ffmpeg_mcp_child_last_speed', 'gauge', 'Final encode speed (x realtime) of the latest process.'),
+		]
+		for key, name, kind, help_text in process_metrics:
+			lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+			lines += [
+				f'{name}{{program="{stats["program"]}",tool="{stats["tool"]}"}} {stats[key]}'
+				for stats in snapshot['processes']
+				if stats[key] is not None
+			]
+		return '\n'.join(lines) + '\n'
+
+
+def is_error_result(result) -> bool:
+	"""True for the `build_exception_message` JSON strings tools return instead of raising."""
+	if not isinstance(result, str) or not result.lstrip().startswith('{'):
+		return False
+	try:
+		return json.loads(result).get('status') == 'ERROR'
+	except ValueError:
+		return False
+
+
+def record_tool_call(tool: str, seconds: float, error: bool):
+	"""Count one tool call and log it as a structured record."""
+	metrics.record_tool_call(tool, seconds, error)
+	logger.info(json.dumps({'event': 'tool_call', 'tool': tool, 'seconds': round(seconds, 4), 'error': error}))
+
+
+def instrument_tool(func):
+	"""
+	Time every call of a (blocking) tool function and count it, with its errors, in the server metrics.
+
+	A call is an error when it raises or returns a `build_exception_message` result. Child processes
+	started during the call are attributed to the tool.
+	"""
+
+	@functools.wraps(func)
+	def wrapper(*args, **kwargs):
+		token = current_tool.set(func.__name__)
+		started = time.perf_counter()
+		error = True
+		try:
+			result = func(*args, **kwargs)
+			error = is_error_result(result)
+			return result
+		finally:
+			record_tool_call(func.__name__, time.perf_counter() - started, error)
+			current_tool.reset(token)
+
+	return wrapper
+
+
+def record_process(record: dict):
+	"""Count one finished child process and log it as a structured record."""
+	record = {**record, 'tool': record.get('tool') or current_tool.get()}
+	metrics.record_process(record)
+	logger.info(json.dumps({'event': 'child_process', **record}))
+
+
+def max_rss_kb(usage) -> int:
+	"""Peak RSS of a `getrusage`/`wait4` result in kilobytes; `ru_maxrss` is in bytes on macOS."""
+	return usage.ru_maxrss // 1024 if sys.platform == 'darwin' else usage.ru_maxrss
+
+
+def read_process_io(pid: int) -> tuple[int, int] | None:
+	"""
+	Return (bytes read, bytes written) by a running or not yet reaped process.
+
+	Uses `rchar`/`wchar` from `/proc/<pid>/io`, which count all I/O including page cache hits;
+	returns None where that file is unavailable (non-Linux, or the process is gone).
+	"""
+	try:
+		with open(f'/proc/{pid}/io', encoding='ascii') as f:
+			counters = dict(line.split(': ') for line in f.read().splitlines() if ': ' in line)
+		return int(counters['rchar']), int(counters['wchar'])
+	except (OSError, KeyError, ValueError):
+		return None
+
+
+metrics = MetricsRegistry()
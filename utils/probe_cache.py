@@ -0,0 +1,130 @@
+import copy
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+from ffmpeg_mcp.configs import settings, setup_logging
+from utils.ffmpeg_runner import probe
+from utils.file_fingerprint import file_fingerprint, fingerprint_digest
+
+setup_logging()
+logger = logging.getLogger(__name__)
+
+
+class ProbeCache:
+	"""
+	Process-wide LRU cache of ffprobe results keyed by file fingerprint (path, inode, size, mtime).
+	`probe_fn` computes a result for a path (an instrumented `ffmpeg.probe` by default); `kind` keeps the sidecars of
+	different caches sharing a `store_dir` apart.
+
+	A file that is modified or replaced gets a new fingerprint, so stale entries are never returned;
+	they simply age out of the LRU. When `store_dir` is set, every probe result is also written there
+	as a JSON sidecar and read back on a cold in-memory miss, so results survive server restarts.
+	"""
+
+	def __init__(self, max_entries: int = 256, store_dir: str | None = None, probe_fn=probe, kind: str = 'probe'):
+		self.max_entries = max_entries
+		self.store_dir = store_dir
+		self.probe_fn = probe_fn
+		self.kind = kind
+		self.hits = 0
+		self.misses = 0
+		self._entries = OrderedDict()
+		self._lock = threading.Lock()
+
+		if self.store_dir:
+			os.makedirs(self.store_dir, exist_ok=True)
+
+	def probe(self, input_path: str) -> dict:
+		"""
+		Return the ffprobe result for the given file, running ffprobe only on a cache miss.
+
+		Args:
+		    input_path (str): Path to the media file.
+
+		Returns:
+		    dict: The result of `probe_fn`, by default the parsed ffprobe output (`streams` and `format`).
+
+		Raises:
+		    ffmpeg.Error: If ffprobe fails on the file.
+		    OSError: If the file cannot be stat'ed.
+		"""
+		key = file_fingerprint(input_path)
+
+		with self._lock:
+			if key in self._entries:
+				self._entries.move_to_end(key)
+				self.hits += 1
+				return copy.deepcopy(self._entries[key])
+
+		result = self._load_sidecar(key)
+		if result is None:
+			logger.info(f'Probing {input_path} ({self.kind})')
+			result = self.probe_fn(key[0])
+			self._store_sidecar(key, result)
+
+		with self._lock:
+			self.misses += 1
+			self._entries[key] = result
+			self._entries.move_to_end(key)
+			while len(self._entries) > self.max_entries:
+				self._entries.popitem(last=False)
+
+		return copy.deepcopy(result)
+
+	def invalidate(self, input_path: str | None = None):
+		"""Drop the in-memory entry for one path, or every entry when no path is given."""
+		with self._lock:
+			if input_path is None:
+				self._entries.clear()
+				return
+			real_path = os.path.realpath(input_path)
+			for key in [key for key in self._entries if key[0] == real_path]:
+				del self._entries[key]
+
+	def stats(self) -> dict:
+		"""Return hit/miss counters and current size of the cache."""
+		with self._lock:
+			return {'entries': len(self._entries), 'max_entries': self.max_entries, 'hits': self.hits, 'misses': self.misses}
+
+	def _sidecar_path(self, key: tuple) -> str:
+		return os.path.join(self.store_dir, f'{self.kind}_{fingerprint_digest(*key)}.json')
+
+	def _load_sidecar(self, key: tuple) -> dict | None:
+		if not self.store_dir:
+			return None
+		try:
+			with open(self._sidecar_path(key), encoding='utf-8') as f:
+				return json.load(f)
+		except (OSError, ValueError):
+			return None
+
+	def _store_sidecar(self, key: tuple, result: dict):
+		if not self.store_dir:
+			return
+		sidecar_path = self._sidecar_path(key)
+		temp_path = f'{sidecar_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+		try:
+			with open(temp_path, 'w', encoding='utf-8') as f:
+				json.dump(result, f)
+			os.replace(temp_path, sidecar_path)
+		except OSError as e:
+			logger.warning(f'Could not persist probe result for {key[0]}: {e}')
+
+
+probe_cache = ProbeCache(max_entries=settings.PROBE_CACHE_SIZE, store_dir=settings.PROBE_CACHE_DIR)
+
+
+def probe_media(input_path: str) -> dict:
+	"""
+	Probe a media file through the shared process-wide cache.
+
+	Args:
+	    input_path (str): Path to the media file.
+
+	Returns:
+	    dict: The parsed ffprobe output (`streams` and `format`).
+	"""
+	return probe_cache.probe(input_path)
@@ -0,0 +1,173 @@
+import functools
+import inspect
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+from ffmpeg_mcp.configs import settings, setup_logging
+from utils.file_fingerprint import file_fingerprint, fingerprint_digest
+
+setup_logging()
+logger = logging.getLogger(__name__)
+
+
+def _normalize_param(value):
+	"""Canonicalize a parameter so equivalent calls (e.g. `5` and `5.0`, tuple and list) share a key."""
+	if isinstance(value, bool) or value is None or isinstance(value, str):
+		return value
+	if isinstance(value, (int, float)):
+		return float(value)
+	if isinstance(value, (list, tuple)):
+		return [_normalize_param(item) for item in value]
+	if isinstance(value, dict):
+		return {str(key): _normalize_param(item) for key, item in sorted(value.items())}
+	return repr(value)
+
+
+def _artifacts(result) -> list[str] | None:
+	"""Return the output files of a successful tool result, or None if it is not a cacheable success."""
+	if isinstance(result, dict) and isinstance(result.get('output_path'), str):
+		return [result['output_path']] if os.path.isfile(result['output_path']) else None
+	if isinstance(result, str):
+		return [result] if os.path.isfile(result) else None
+	if isinstance(result, list) and result and all(isinstance(item, str) for item in result):
+		return result if all(os.path.isfile(item) for item in result) else None
+	return None
+
+
+def _artifact_stamps(paths: list[str]) -> list[list]:
+	return [[path, os.path.getsize(path), os.stat(path).st_mtime_ns] for path in paths]
+
+
+def _is_intact(entry: dict) -> bool:
+	"""True when every artifact of a cached entry still exists unmodified."""
+	try:
+		return _artifact_stamps([stamp[0] for stamp in entry['artifacts']]) == entry['artifacts']
+	except (OSError, KeyError, TypeError):
+		return False
+
+
+class ResultCache:
+	"""
+	Memo of tool outputs keyed by (tool name, input file fingerprint, normalized parameters).
+
+	An entry is only served while every artifact it points to still exists with the size and
+	mtime it had when produced, so deleted or overwritten outputs are regenerated. When
+	`store_dir` is set, entries are also persisted as JSON sidecars so they survive restarts.
+	"""
+
+	def __init__(self, max_entries: int = 1024, store_dir: str | None = None):
+		self.max_entries = max_entries
+		self.store_dir = store_dir
+		self.hits = 0
+		self.misses = 0
+		self._entries = OrderedDict()
+		self._lock = threading.Lock()
+
+		if self.store_dir:
+			os.makedirs(self.store_dir, exist_ok=True)
+
+	def make_key(self, tool_name: str, input_path: str, params: dict) -> str:
+		normalized = json.dumps(_normalize_param(params), sort_keys=True)
+		return fingerprint_digest(tool_name, file_fingerprint(input_path), normalized)
+
+	def get(self, key: str):
+		"""Return the cached result for `key` if all of its artifacts are intact, else None."""
+		with self._lock:
+			entry = self._entries.get(key)
+		if entry is None:
+			entry = self._load_sidecar(key)
+
+		if entry is not None and _is_intact(entry):
+			with self._lock:
+				self.hits += 1
+				self._entries[key] = entry
+				self._entries.move_to_end(key)
+			return entry['result']
+
+		with self._lock:
+			self.misses += 1
+			self._entries.pop(key, None)
+		return None
+
+	def put(self, key: str, result):
+		"""Remember `result` if it is a successful tool output (existing file paths)."""
+		artifacts = _artifacts(result)
+		if artifacts is None:
+			return
+		entry = {'result': result, 'artifacts': _artifact_stamps(artifacts)}
+		with self._lock:
+			self._entries[key] = entry
+			self._entries.move_to_end(key)
+			while len(self._entries) > self.max_entries:
+				self._entries.popitem(last=False)
+		self._store_sidecar(key, entry)
+
+	def stats(self) -> dict:
+		"""Return hit/miss counters and current size of the cache."""
+		with self._lock:
+			return {'entries': len(self._entries), 'max_entries': self.max_entries, 'hits': self.hits, 'misses': self.misses}
+
+	def _sidecar_path(self, key: str) -> str:
+		return os.path.join(self.store_dir, f'{key}.json')
+
+	def _load_sidecar(self, key: str):
+		if not self.store_dir:
+			return None
+		try:
+			with open(self._sidecar_path(key), encoding='utf-8') as f:
+				return json.load(f)
+		except (OSError, ValueError):
+			return None
+
+	def _store_sidecar(self, key: str, entry: dict):
+		if not self.store_dir:
+			return
+		sidecar_path = self._sidecar_path(key)
+		temp_path = f'{sidecar_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+		try:
+			with open(temp_path, 'w', encoding='utf-8') as f:
+				json.dump(entry, f)
+			os.replace(temp_path, sidecar_path)
+		except OSError as e:
+			logger.warning(f'Could not persist cached result {key}: {e}')
+
+
+result_cache = ResultCache(max_entries=settings.RESULT_CACHE_SIZE, store_dir=settings.RESULT_CACHE_DIR)
+
+
+def memoize_result(func):
+	"""
+	Decorator returning the previously produced artifact for an identical call.
+
+	The key is the tool name, the fingerprint of the file passed as the first argument and the
+	normalized remaining parameters. Only successful results (paths of existing files) are cached,
+	so errors are always retried and deleted outputs are transparently regenerated. Cached dict
+	results are returned with `cached` set to True, so their timings are not mistaken for new work.
+	"""
+	signature = inspect.signature(func)
+
+	@functools.wraps(func)
+	def wrapper(*args, **kwargs):
+		bound = signature.bind(*args, **kwargs)
+		bound.apply_defaults()
+		params = dict(bound.arguments)
+		input_path = params.pop(next(iter(signature.parameters)))
+
+		try:
+			key = result_cache.make_key(func.__name__, input_path, params)
+		except OSError:
+			return func(*args, **kwargs)
+
+		cached = result_cache.get(key)
+		if cached is not None:
+			logger.info(f'{func.__name__}: returning cached result for {input_path}')
+			return {**cached, 'cached': True} if isinstance(cached, dict) else cached
+
+		result = func(*args, **kwargs)
+		result_cache.put(key, result)
+		return result
+
+	return wrapper
@@ -1,10 +1,12 @@
 import logging
 import os
-import subprocess
 from functools import wraps
 
+import ffmpeg
+
 from ffmpeg_mcp.configs import setup_logging
 from ffmpeg_mcp.exceptions import build_exception_message
+from utils.probe_cache import probe_media
 
 setup_logging()
 logger = logging.getLogger(__name__)
@@ -13,6 +15,7 @@ logger = logging.getLogger(__name__)
 def validate_input_video_path(func):
 	"""
 	Decorator to check if the video path exists, is non-empty, and is valid.
+	The validity check goes through the shared probe cache, so the wrapped tool's own probe is free.
 	"""
 
 	@wraps(func)
@@ -23,13 +26,8 @@ def validate_input_video_path(func):
 			return build_exception_message(error_type=ValueError, message=f'File is empty: {input_video_path}')
 
 		try:
-			subprocess.run(
-				['ffprobe', '-v', 'error', '-show_streams', '-select_streams', 'v', input_video_path],
-				stdout=subprocess.DEVNULL,
-				stderr=subprocess.DEVNULL,
-				check=True,
-			)
-		except subprocess.CalledProcessError:
+			probe_media(input_video_path)
+		except ffmpeg.Error:
 			return build_exception_message(error_type=ValueError, message=f'File is not a valid video: {input_video_path}')
 
 		return func(input_video_path, *args, **kwargs)
@@ -0,0 +1,77 @@
+import errno
+import logging
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+from ffmpeg_mcp.configs import settings, setup_logging
+
+setup_logging()
+logger = logging.getLogger(__name__)
+
+
+def publish_file(source_path: str, destination_path: str) -> str:
+	"""
+	Atomically move a finished file into the output store.
+
+	A plain rename is used when both paths are on the same filesystem. Otherwise (e.g. a tmpfs
+	scratch directory) the file is copied next to the destination first and then renamed, so
+	readers never observe a partially written output.
+
+	Args:
+	    source_path (str): The finished file, usually inside a scratch workspace.
+	    destination_path (str): Final location of the file.
+
+	Returns:
+	    str: Absolute path of the published file.
+	"""
+	destination_path = os.path.abspath(destination_path)
+	os.makedirs(os.path.dirname(destination_path), exist_ok=True)
+	try:
+		os.replace(source_path, destination_path)
+	except OSError as e:
+		if e.errno != errno.EXDEV:
+			raise
+		staging_path = f'{destination_path}.{os.getpid()}.partial'
+		shutil.copyfile(source_path, staging_path)
+		os.replace(staging_path, destination_path)
+		os.remove(source_path)
+	return destination_path
+
+
+class Workspace:
+	"""A private scratch directory owned by a single tool invocation."""
+
+	def __init__(self, root: str):
+		self.root = root
+
+	def path(self, *parts: str) -> str:
+		"""Return a path inside the workspace."""
+		return os.path.join(self.root, *parts)
+
+	def publish(self, source_path: str, destination_path: str) -> str:
+		"""Atomically move a file out of the workspace into the output store."""
+		return publish_file(source_path, destination_path)
+
+
+@contextmanager
+def scratch_workspace(prefix: str = 'job'):
+	"""
+	Context manager giving the caller its own scratch directory under `SCRATCH_DIR`.
+
+	Concurrent calls of the same tool never share intermediate files, and the directory (with
+	anything not published) is removed when the block exits, whether it succeeded or not.
+
+	Args:
+	    prefix (str): Prefix of the directory name, usually the tool name.
+
+	Yields:
+	    Workspace: The scratch workspace.
+	"""
+	os.makedirs(settings.SCRATCH_DIR, exist_ok=True)
+	root = tempfile.mkdtemp(prefix=f'{prefix}_', dir=settings.SCRATCH_DIR)
+	try:
+		yield Workspace(root)
+	finally:
+		shutil.rmtree(root, ignore_errors=True)